@@ -0,0 +1,107 @@
+"""
+Benchmark do serviço de legendas em micro-lotes.
+
+Mede a vazão (imagens/segundo) do CaptionService para diferentes
+tamanhos de lote, usando o modelo BLIP real ou um pipeline simulado.
+
+Uso:
+    python -m benchmarks.bench_captioning --images 64 --batch-sizes 1,2,4,8,16
+    python -m benchmarks.bench_captioning --stub   # sem baixar o modelo
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+from image_analyzer.captioning import CaptionService
+from image_analyzer.models import create_captioner
+
+
+class StubCaptioner:
+    """
+    Pipeline simulado: custo fixo por chamada mais custo por imagem.
+
+    Reproduz o comportamento da inferência em lote, em que o custo fixo
+    é diluído entre as imagens do lote.
+    """
+
+    def __init__(self, call_overhead=0.05, per_image=0.01):
+        self.call_overhead = call_overhead
+        self.per_image = per_image
+
+    def __call__(self, images, batch_size=None):
+        single = not isinstance(images, list)
+        if single:
+            images = [images]
+        time.sleep(self.call_overhead + self.per_image * len(images))
+        results = [[{'generated_text': f"imagem {image.size[0]}x{image.size[1]}"}] for image in images]
+        # Como o pipeline real: uma imagem avulsa devolve a lista de legendas dela
+        return results[0] if single else results
+
+
+def make_images(count, size=384, seed=0):
+    """Gera imagens RGB aleatórias e determinísticas"""
+    rng = np.random.default_rng(seed)
+    return [
+        Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8))
+        for _ in range(count)
+    ]
+
+
+def run(captioner, images, batch_size, max_wait):
+    """Envia todas as imagens ao serviço e mede o tempo até a última legenda"""
+    service = CaptionService(captioner, max_batch_size=batch_size, max_wait=max_wait).start()
+    try:
+        start = time.perf_counter()
+        futures = [service.submit(image) for image in images]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    finally:
+        service.close()
+    return {
+        'batch_size': batch_size,
+        'images': len(images),
+        'batches': service.batches,
+        'seconds': elapsed,
+        'images_per_second': len(images) / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vazão do CaptionService por tamanho de lote")
+    parser.add_argument("--images", type=int, default=32, help="Número de imagens por rodada")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16",
+                        help="Tamanhos de lote separados por vírgula")
+    parser.add_argument("--max-wait", type=float, default=0.05,
+                        help="Espera máxima (segundos) para completar um lote")
+    parser.add_argument("--stub", action="store_true",
+                        help="Usa um pipeline simulado em vez do modelo BLIP")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo JSON")
+    args = parser.parse_args(argv)
+
+    captioner = StubCaptioner() if args.stub else create_captioner()
+    images = make_images(args.images)
+
+    # Aquecimento: a primeira inferência inclui inicializações preguiçosas
+    captioner(images[:1], batch_size=1)
+
+    results = []
+    print(f"{'lote':>6} {'lotes':>6} {'segundos':>10} {'imagens/s':>10}")
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        result = run(captioner, images, batch_size, args.max_wait)
+        results.append(result)
+        print(f"{result['batch_size']:>6} {result['batches']:>6} "
+              f"{result['seconds']:>10.3f} {result['images_per_second']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'stub': args.stub, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Comparação do modo rápido para CPU com o modelo de legenda em fp32.
+
+Para cada configuração (fp32, int8 e, opcionalmente, outro runtime)
+mede o tempo de carregamento, a latência por imagem (lote de 1), a
+vazão em lotes e a concordância das legendas com as do fp32 (igualdade
+exata e similaridade de Jaccard entre as palavras).
+
+Imagens sintéticas só servem para medir tempo; para avaliar a
+concordância, use fotos reais com --dir.
+
+Uso:
+    python -m benchmarks.bench_fast_cpu --dir ~/fotos --images 32 --threads 4
+    python -m benchmarks.bench_fast_cpu --runtime onnx --json fast_cpu.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+from image_analyzer.batch import iter_image_files
+from image_analyzer.context import ImageContext
+from image_analyzer.engine import CAPTION_INPUT_SIZE
+from image_analyzer.models import RUNTIMES, configure_threads, create_captioner
+
+from .bench_captioning import make_images
+
+
+def load_images(directory, count):
+    """Primeiras count imagens do diretório, já reduzidas como na etapa de legenda"""
+    images = []
+    for path in iter_image_files(directory):
+        try:
+            images.append(ImageContext(path).reduced(CAPTION_INPUT_SIZE))
+        except Exception as e:
+            print(f"Ignorando {path}: {e}", file=sys.stderr)
+        if len(images) >= count:
+            break
+    return images
+
+
+def _caption(output):
+    return output[0]['generated_text']
+
+
+def _words(text):
+    return set(text.lower().split())
+
+
+def agreement(reference, captions):
+    """
+    Concordância com as legendas de referência.
+
+    Returns:
+        Dicionário com a fração de legendas idênticas e a média da
+        similaridade de Jaccard entre os conjuntos de palavras
+    """
+    exact = sum(a == b for a, b in zip(reference, captions))
+    jaccard = []
+    for a, b in zip(reference, captions):
+        words_a, words_b = _words(a), _words(b)
+        union = words_a | words_b
+        jaccard.append(len(words_a & words_b) / len(union) if union else 1.0)
+    return {
+        'exact': exact / len(reference),
+        'jaccard': statistics.mean(jaccard),
+    }
+
+
+def bench(name, images, batch_size, **options):
+    """Carrega uma configuração e mede latência, vazão e legendas"""
+    start = time.perf_counter()
+    captioner = create_captioner(**options)
+    load_seconds = time.perf_counter() - start
+
+    # Aquecimento: a primeira inferência inclui inicializações preguiçosas
+    captioner(images[0])
+
+    latencies = []
+    captions = []
+    for image in images:
+        start = time.perf_counter()
+        captions.append(_caption(captioner(image)))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    captioner(images, batch_size=batch_size)
+    batch_seconds = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'name': name,
+        'load_seconds': load_seconds,
+        'latency_median': statistics.median(latencies),
+        'latency_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'images_per_second': len(images) / batch_seconds,
+        'batch_size': batch_size,
+        'captions': captions,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modo rápido para CPU vs. fp32")
+    parser.add_argument("--dir", help="Diretório com fotos reais (padrão: imagens sintéticas)")
+    parser.add_argument("--images", type=int, default=16, help="Número de imagens")
+    parser.add_argument("--batch-size", type=int, default=8, help="Tamanho do lote na medição de vazão")
+    parser.add_argument("--threads", type=int, default=None, help="Threads intra-op do PyTorch")
+    parser.add_argument("--interop-threads", type=int, default=None, help="Threads inter-op do PyTorch")
+    parser.add_argument("--runtime", choices=RUNTIMES, default=None,
+                        help="Inclui a exportação para outro runtime na comparação")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo JSON")
+    args = parser.parse_args(argv)
+
+    if args.dir:
+        images = load_images(os.path.expanduser(args.dir), args.images)
+        if not images:
+            print(f"Nenhuma imagem em {args.dir}", file=sys.stderr)
+            return 2
+    else:
+        images = make_images(args.images)
+
+    # As mesmas threads para todas as configurações (valem para o processo inteiro)
+    configure_threads(args.threads, args.interop_threads)
+
+    configurations = [('fp32', {}), ('int8', {'fast': True})]
+    if args.runtime:
+        configurations.append((args.runtime, {'runtime': args.runtime}))
+
+    results = [bench(name, images, args.batch_size, **options) for name, options in configurations]
+    reference = results[0]['captions']
+
+    print(f"{'modo':<6} {'carga':>8} {'lat. mediana':>13} {'lat. p95':>10} {'imagens/s':>10} "
+          f"{'iguais':>7} {'jaccard':>8}")
+    for result in results:
+        result['agreement'] = agreement(reference, result['captions'])
+        print(f"{result['name']:<6} {result['load_seconds']:>7.1f}s "
+              f"{result['latency_median'] * 1000:>10.0f} ms {result['latency_p95'] * 1000:>7.0f} ms "
+              f"{result['images_per_second']:>10.2f} {result['agreement']['exact']:>7.0%} "
+              f"{result['agreement']['jaccard']:>8.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                'images': len(images),
+                'synthetic': not args.dir,
+                'threads': args.threads,
+                'interop_threads': args.interop_threads,
+                'results': results,
+            }, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Benchmark das etapas de análise sobre o corpus sintético.
+
+Cada arquivo do corpus é analisado várias vezes com analyze_file (com
+um captioner simulado, sem baixar o modelo); a mediana dos tempos de
+cada etapa (ver image_analyzer.timing) é registrada por arquivo. Em
+seguida mede a vazão de ponta a ponta da análise completa e da
+varredura de metadados sobre o corpus inteiro.
+
+Os resultados são gravados em JSON e podem ser comparados entre versões
+com benchmarks.compare.
+
+Uso:
+    python -m benchmarks.bench_pipeline /tmp/corpus --profile standard --json atual.json
+    python -m benchmarks.compare base.json atual.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+import numpy as np
+import PIL
+
+from image_analyzer import engine
+from image_analyzer.context import ImageContext
+from image_analyzer.scan import iter_scan
+
+from .bench_captioning import StubCaptioner
+from .corpus import PROFILES, build_corpus, corpus_digest
+
+
+def _median_stages(runs):
+    """Mediana (e mínimo) do tempo de relógio de cada etapa entre as repetições"""
+    stages = {}
+    for name in runs[0]:
+        walls = [run[name]['wall'] for run in runs if name in run]
+        cpus = [run[name]['cpu'] for run in runs if name in run]
+        stages[name] = {
+            'wall': statistics.median(walls),
+            'wall_min': min(walls),
+            'cpu': statistics.median(cpus),
+        }
+    return stages
+
+
+def bench_file(path, captioner, repeat):
+    """Analisa um arquivo repeat vezes (mais um aquecimento) e resume os tempos"""
+    runs = []
+    errors = {}
+    for index in range(repeat + 1):
+        # analyze_file não libera contextos recebidos prontos
+        ctx = ImageContext(path)
+        try:
+            result = engine.analyze_file(ctx, captioner=captioner)
+        finally:
+            ctx.release()
+        errors = result['errors']
+        # A primeira rodada só aquece o cache de páginas e as importações
+        if index > 0:
+            runs.append(result['timings'])
+    return {'stages': _median_stages(runs), 'errors': errors}
+
+
+def bench_throughput(paths, captioner, megapixels):
+    """Vazão de ponta a ponta: análise completa e varredura de metadados"""
+    start = time.perf_counter()
+    for path in paths:
+        engine.analyze_file(path, captioner=captioner)
+    analyze_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in iter_scan(paths):
+        pass
+    scan_seconds = time.perf_counter() - start
+
+    return {
+        'analyze': {
+            'seconds': analyze_seconds,
+            'files_per_second': len(paths) / analyze_seconds,
+            'megapixels_per_second': megapixels / analyze_seconds,
+        },
+        'scan': {
+            'seconds': scan_seconds,
+            'files_per_second': len(paths) / scan_seconds,
+        },
+    }
+
+
+def run(directory, profile='standard', seed=0, repeat=3, caption=True):
+    """
+    Gera o corpus (se necessário) e executa o benchmark completo.
+
+    Returns:
+        Dicionário com o ambiente, o digest do corpus, os tempos por
+        arquivo e etapa e a vazão de ponta a ponta
+    """
+    manifest = build_corpus(directory, profile, seed)
+    captioner = StubCaptioner(call_overhead=0, per_image=0) if caption else None
+
+    files = {}
+    for entry in manifest['files']:
+        path = os.path.join(directory, entry['name'])
+        files[entry['name']] = dict(
+            bench_file(path, captioner, repeat),
+            kind=entry['kind'],
+            megapixels=entry['width'] * entry['height'] / 1e6,
+            bytes=entry['bytes'],
+        )
+        total = files[entry['name']]['stages']['total']['wall']
+        print(f"{entry['name']:<36} {total * 1000:>10.1f} ms", file=sys.stderr)
+
+    paths = [os.path.join(directory, entry['name']) for entry in manifest['files']]
+    megapixels = sum(file['megapixels'] for file in files.values())
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'pillow': PIL.__version__,
+            'numpy': np.__version__,
+            'analyzer_version': engine.ANALYZER_VERSION,
+        },
+        'corpus': {
+            'profile': profile,
+            'seed': seed,
+            'digest': corpus_digest(manifest),
+        },
+        'repeat': repeat,
+        'caption': caption,
+        'files': files,
+        'throughput': bench_throughput(paths, captioner, megapixels),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempos por etapa sobre o corpus sintético")
+    parser.add_argument("directory", help="Diretório do corpus (gerado se necessário)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="standard",
+                        help="Conjunto de resoluções do corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições por arquivo")
+    parser.add_argument("--no-caption", action="store_true",
+                        help="Não chama o captioner simulado")
+    parser.add_argument("--json", help="Grava os resultados neste arquivo JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.directory, args.profile, args.seed, args.repeat, not args.no_caption)
+
+    throughput = results['throughput']
+    print(f"análise completa: {throughput['analyze']['files_per_second']:.2f} arquivos/s, "
+          f"{throughput['analyze']['megapixels_per_second']:.1f} MP/s")
+    print(f"varredura de metadados: {throughput['scan']['files_per_second']:.1f} arquivos/s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
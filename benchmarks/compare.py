@@ -0,0 +1,84 @@
+"""
+Comparação de dois resultados de benchmarks.bench_pipeline.
+
+Lista, por arquivo e etapa, a variação da mediana do tempo de relógio
+e sinaliza as regressões acima do limiar. O código de saída é 1 quando
+há regressões, para uso em integração contínua.
+
+Uso:
+    python -m benchmarks.compare base.json atual.json --threshold 0.10
+"""
+import sys
+import json
+import argparse
+
+# Etapas mais rápidas que isso (em ambas as rodadas) são dominadas por ruído
+MIN_SECONDS = 0.002
+
+
+def compare(base, current, threshold=0.10, min_seconds=MIN_SECONDS):
+    """
+    Compara duas rodadas.
+
+    Returns:
+        Lista de tuplas (arquivo, etapa, tempo base, tempo atual,
+        variação relativa, regressão)
+    """
+    rows = []
+    for name, file in current['files'].items():
+        base_file = base['files'].get(name)
+        if base_file is None:
+            continue
+        for stage, timing in file['stages'].items():
+            base_timing = base_file['stages'].get(stage)
+            if base_timing is None:
+                continue
+            before = base_timing['wall']
+            after = timing['wall']
+            if max(before, after) < min_seconds:
+                continue
+            change = (after - before) / before if before else float('inf')
+            rows.append((name, stage, before, after, change, change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dois resultados do bench_pipeline")
+    parser.add_argument("base", help="JSON da rodada de referência")
+    parser.add_argument("current", help="JSON da rodada atual")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Aumento relativo a partir do qual uma etapa é regressão")
+    parser.add_argument("--all", action="store_true",
+                        help="Lista todas as etapas, não só as que mudaram além do limiar")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    if base['corpus']['digest'] != current['corpus']['digest']:
+        print("Aviso: os corpora são diferentes (perfil, semente ou versão das bibliotecas); "
+              "a comparação é aproximada.", file=sys.stderr)
+
+    rows = compare(base, current, args.threshold)
+    regressions = 0
+    print(f"{'arquivo':<36} {'etapa':<14} {'base':>10} {'atual':>10} {'variação':>9}")
+    for name, stage, before, after, change, regression in rows:
+        regressions += regression
+        if args.all or abs(change) > args.threshold:
+            mark = "  REGRESSÃO" if regression else ""
+            print(f"{name:<36} {stage:<14} {before * 1000:>8.1f}ms {after * 1000:>8.1f}ms "
+                  f"{change:>+8.1%}{mark}")
+
+    for kind in ('analyze', 'scan'):
+        before = base['throughput'][kind]['files_per_second']
+        after = current['throughput'][kind]['files_per_second']
+        print(f"vazão {kind}: {before:.2f} -> {after:.2f} arquivos/s ({(after - before) / before:+.1%})")
+
+    print(f"{regressions} regressões acima de {args.threshold:.0%}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
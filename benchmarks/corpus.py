@@ -0,0 +1,224 @@
+"""
+Corpus sintético e determinístico para os benchmarks.
+
+As imagens são geradas a partir de uma semente fixa (gradientes com
+ruído, que comprimem de forma parecida com fotos), cobrindo JPEG com e
+sem EXIF, PNG com transparência, TIFF de várias páginas, GIF animado e
+uma faixa de resoluções. O perfil 'full' inclui imagens muito grandes,
+acima do limite da análise em faixas.
+
+Um manifesto (manifest.json) registra os parâmetros, as versões das
+bibliotecas e o SHA-256 de cada arquivo; o corpus só é regerado quando
+os parâmetros mudam.
+
+Uso:
+    python -m benchmarks.corpus /tmp/corpus --profile standard
+"""
+import os
+import sys
+import json
+import zlib
+import hashlib
+import argparse
+import platform
+
+import numpy as np
+import PIL
+from PIL import Image
+
+CORPUS_VERSION = 1
+
+# Resoluções (largura, altura) de cada perfil
+PROFILES = {
+    'small': [(640, 480), (1920, 1080)],
+    'standard': [(640, 480), (1920, 1080), (4000, 3000)],
+    'full': [(640, 480), (1920, 1080), (4000, 3000), (8000, 6000)],
+}
+# Perfil 'full': TIFF sem compressão acima de 100 MP (análise em faixas)
+LARGE_TIFF_SIZE = (11000, 10000)
+
+EXIF_TAGS = {
+    0x010F: "BenchCam",                 # Make
+    0x0110: "Synthetic 1",              # Model
+    0x0131: "image_analyzer benchmarks",  # Software
+}
+EXIF_IFD_TAGS = {
+    0x9003: "2024:01:01 12:00:00",      # DateTimeOriginal
+    0x829A: 1 / 125,                    # ExposureTime
+    0x8827: 200,                        # ISOSpeedRatings
+}
+GPS_TAGS = {
+    1: "S",                             # GPSLatitudeRef
+    2: (23.0, 33.0, 1.0),               # GPSLatitude
+    3: "W",                             # GPSLongitudeRef
+    4: (46.0, 37.0, 59.0),              # GPSLongitude
+}
+
+
+def synthetic_pixels(width, height, channels, rng):
+    """
+    Pixels uint8 determinísticos: gradientes distintos por canal mais ruído.
+
+    Cada canal é montado separadamente para limitar a memória temporária
+    em resoluções grandes.
+    """
+    pixels = np.empty((height, width, channels), dtype=np.uint8)
+    x = np.linspace(0, 1, width, dtype=np.float32)[np.newaxis, :]
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, np.newaxis]
+    for channel in range(channels):
+        angle = channel * 2.1
+        gradient = (np.cos(angle) * x + np.sin(angle) * y) * 0.5 + 0.5
+        plane = gradient * 200 + 20
+        plane += rng.integers(0, 36, (height, width), dtype=np.uint8)
+        np.clip(plane, 0, 255, out=plane)
+        pixels[:, :, channel] = plane.astype(np.uint8)
+    return pixels
+
+
+def _exif():
+    """Bloco EXIF com tags principais, IFD Exif e GPS"""
+    exif = Image.Exif()
+    exif.update(EXIF_TAGS)
+    exif.get_ifd(0x8769).update(EXIF_IFD_TAGS)
+    exif.get_ifd(0x8825).update(GPS_TAGS)
+    return exif
+
+
+def _frames(width, height, count, mode, rng):
+    """Quadros diferentes entre si (para TIFF de várias páginas e GIF)"""
+    frames = [Image.fromarray(synthetic_pixels(width, height, 3, rng), 'RGB') for _ in range(count)]
+    if mode != 'RGB':
+        frames = [frame.convert(mode) for frame in frames]
+    return frames
+
+
+def corpus_spec(profile):
+    """
+    Lista os arquivos do perfil.
+
+    Returns:
+        Lista de tuplas (nome, tipo, largura, altura)
+    """
+    spec = []
+    for width, height in PROFILES[profile]:
+        suffix = f"{width}x{height}"
+        spec.append((f"jpeg_exif_{suffix}.jpg", 'jpeg_exif', width, height))
+        spec.append((f"jpeg_plain_{suffix}.jpg", 'jpeg_plain', width, height))
+        spec.append((f"png_alpha_{suffix}.png", 'png_alpha', width, height))
+        # Formatos de vários quadros só nas resoluções menores
+        if width * height <= 2_100_000:
+            spec.append((f"tiff_pages_{suffix}.tif", 'tiff_pages', width, height))
+            spec.append((f"gif_anim_{suffix}.gif", 'gif_anim', width, height))
+    if profile == 'full':
+        width, height = LARGE_TIFF_SIZE
+        spec.append((f"tiff_large_{width}x{height}.tif", 'tiff_large', width, height))
+    return spec
+
+
+def write_image(path, kind, width, height, rng):
+    """Gera e grava um arquivo do corpus"""
+    if kind in ('jpeg_exif', 'jpeg_plain'):
+        image = Image.fromarray(synthetic_pixels(width, height, 3, rng), 'RGB')
+        options = {'quality': 90}
+        if kind == 'jpeg_exif':
+            options['exif'] = _exif()
+        image.save(path, 'JPEG', **options)
+    elif kind == 'png_alpha':
+        image = Image.fromarray(synthetic_pixels(width, height, 4, rng), 'RGBA')
+        image.save(path, 'PNG', exif=_exif())
+    elif kind == 'tiff_pages':
+        frames = _frames(width, height, 3, 'RGB', rng)
+        frames[0].save(path, 'TIFF', save_all=True, append_images=frames[1:],
+                       compression='tiff_deflate')
+    elif kind == 'gif_anim':
+        frames = _frames(width, height, 4, 'P', rng)
+        frames[0].save(path, 'GIF', save_all=True, append_images=frames[1:],
+                       duration=100, loop=0)
+    elif kind == 'tiff_large':
+        image = Image.fromarray(synthetic_pixels(width, height, 1, rng)[:, :, 0], 'L')
+        image.save(path, 'TIFF')
+    else:
+        raise ValueError(f"Tipo de arquivo desconhecido: {kind}")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_corpus(directory, profile='standard', seed=0, force=False):
+    """
+    Gera (ou reaproveita) o corpus do perfil em directory.
+
+    Returns:
+        Manifesto: parâmetros, versões e a lista de arquivos com tipo,
+        dimensões, tamanho e SHA-256
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, "manifest.json")
+    params = {
+        'corpus_version': CORPUS_VERSION,
+        'profile': profile,
+        'seed': seed,
+        'pillow': PIL.__version__,
+        'numpy': np.__version__,
+    }
+
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get('params') == params and all(
+            os.path.exists(os.path.join(directory, entry['name'])) for entry in manifest['files']
+        ):
+            return manifest
+
+    # Uma semente derivada por arquivo: o conteúdo não depende da ordem nem do perfil
+    files = []
+    for name, kind, width, height in corpus_spec(profile):
+        path = os.path.join(directory, name)
+        rng = np.random.default_rng([seed, width, height, zlib.crc32(kind.encode())])
+        write_image(path, kind, width, height, rng)
+        files.append({
+            'name': name,
+            'kind': kind,
+            'width': width,
+            'height': height,
+            'bytes': os.path.getsize(path),
+            'sha256': _sha256(path),
+        })
+
+    manifest = {'params': params, 'platform': platform.platform(), 'files': files}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def corpus_digest(manifest):
+    """Digest que identifica o conteúdo do corpus (para comparar rodadas)"""
+    digest = hashlib.sha256()
+    for entry in manifest['files']:
+        digest.update(f"{entry['name']}:{entry['sha256']}\n".encode())
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera o corpus sintético dos benchmarks")
+    parser.add_argument("directory", help="Diretório do corpus")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="standard",
+                        help="Conjunto de resoluções")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do gerador")
+    parser.add_argument("--force", action="store_true", help="Regera mesmo se já existir")
+    args = parser.parse_args(argv)
+
+    manifest = build_corpus(args.directory, args.profile, args.seed, args.force)
+    total = sum(entry['bytes'] for entry in manifest['files'])
+    print(f"{len(manifest['files'])} arquivos, {total / 1024 ** 2:.1f} MB, "
+          f"digest {corpus_digest(manifest)[:16]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
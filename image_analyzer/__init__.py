@@ -0,0 +1,24 @@
+"""
+Pacote de análise de imagens sem interface gráfica.
+
+Reúne o motor de análise usado pela aplicação Tkinter (main.py)
+e pelo modo em lote (python -m image_analyzer.batch), além da
+varredura de metadados (python -m image_analyzer.scan).
+"""
+from .engine import (
+    analyze_initial,
+    analyze_basic_info,
+    analyze_advanced_tags,
+    analyze_metadata,
+    analyze_file,
+    scan_metadata,
+)
+
+__all__ = [
+    'analyze_initial',
+    'analyze_basic_info',
+    'analyze_advanced_tags',
+    'analyze_metadata',
+    'analyze_file',
+    'scan_metadata',
+]
@@ -0,0 +1,205 @@
+"""
+Admissão de análises por orçamento de memória de pixels.
+
+Várias análises simultâneas (pedidos do servidor, processos do modo em
+lote) podem decodificar imagens enormes ao mesmo tempo e esgotar a
+memória. Antes de decodificar os pixels, cada análise estima pelo
+cabeçalho (dimensões e modo) quantos bytes a decodificação vai ocupar
+e reserva esse valor em um PixelBudget; enquanto a soma das reservas
+não cabe no orçamento, a análise espera.
+
+Imagens pequenas passam à frente das grandes que estão esperando, o
+que mantém os workers ocupados. Para que um fluxo contínuo de imagens
+pequenas não adie uma grande para sempre, a grande que espera há mais
+de max_wait segundos reserva o espaço de que precisa: a partir daí as
+pequenas só entram se couberem no que sobra. Uma imagem maior que o
+próprio orçamento é admitida sozinha.
+"""
+import time
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+# Bytes por pixel de trabalho da análise além do raster decodificado:
+# a matriz NumPy RGB, a versão em tons de cinza e os temporários por bloco
+ANALYSIS_BYTES_PER_PIXEL = 6
+# Bytes por pixel do raster do Pillow nos modos de uma banda (os de
+# várias bandas ocupam 4 bytes por pixel)
+_SINGLE_BAND_BYTES = {'I': 4, 'F': 4, 'I;16': 2, 'I;16L': 2, 'I;16B': 2, 'I;16N': 2}
+
+# Espera a partir da qual uma imagem grande reserva o espaço de que precisa
+DEFAULT_MAX_WAIT = 2.0
+# Fração do orçamento até a qual uma imagem é considerada pequena
+SMALL_FRACTION = 8
+
+# Posições do estado compartilhado
+_USED, _ACTIVE, _WAITING_SMALL, _WAITING_LARGE, _RESERVED_TICKET, _RESERVED_COST, \
+    _NEXT_TICKET = range(7)
+
+
+class AdmissionTimeout(TimeoutError):
+    """O prazo acabou antes de haver memória disponível para a decodificação"""
+
+
+def raster_bytes(mode, width, height):
+    """Bytes ocupados pelo raster do Pillow em um modo e dimensões"""
+    if mode in _SINGLE_BAND_BYTES:
+        per_pixel = _SINGLE_BAND_BYTES[mode]
+    elif mode.startswith('I;'):
+        per_pixel = 2
+    elif len(mode) > 1:
+        per_pixel = 4
+    else:
+        per_pixel = 1
+    return width * height * per_pixel
+
+
+def estimate_decode_bytes(image):
+    """
+    Estima, pelo cabeçalho, a memória de pico da decodificação e das
+    estatísticas de pixels de uma imagem.
+
+    Em imagens animadas e de várias páginas, os quadros são analisados
+    um de cada vez, então o custo é o de um quadro.
+
+    Args:
+        image: Imagem PIL apenas com o cabeçalho lido
+
+    Returns:
+        Estimativa em bytes
+    """
+    width, height = image.size
+    cost = raster_bytes(image.mode, width, height)
+    if image.mode != 'RGB':
+        # ImageContext.decoded converte para RGB, que coexiste com o original
+        cost += raster_bytes('RGB', width, height)
+    return cost + width * height * ANALYSIS_BYTES_PER_PIXEL
+
+
+class PixelBudget:
+    """
+    Orçamento de memória compartilhado pelas análises em andamento.
+
+    Com shared=True o estado fica em memória compartilhada e o objeto
+    pode ser passado a processos filhos na criação (por exemplo, em
+    initargs de multiprocessing.Pool); caso contrário, vale entre as
+    threads do processo.
+    """
+
+    def __init__(self, budget_bytes, small_bytes=None, max_wait=DEFAULT_MAX_WAIT, shared=False):
+        """
+        Args:
+            budget_bytes: Soma máxima dos custos admitidos ao mesmo tempo
+            small_bytes: Custo até o qual a imagem passa à frente das
+                grandes (padrão: 1/8 do orçamento)
+            max_wait: Espera (segundos) a partir da qual uma imagem
+                grande reserva o espaço de que precisa
+            shared: Se True, o orçamento vale entre processos
+        """
+        self.budget_bytes = int(budget_bytes)
+        self.small_bytes = int(small_bytes) if small_bytes is not None else self.budget_bytes // SMALL_FRACTION
+        self.max_wait = max_wait
+        if shared:
+            self._cond = multiprocessing.Condition()
+            self._state = multiprocessing.RawArray('q', 7)
+        else:
+            self._cond = threading.Condition()
+            self._state = [0] * 7
+
+    def _free_for(self, ticket):
+        """Espaço livre para um pedido, descontada a reserva de outro pedido"""
+        state = self._state
+        free = self.budget_bytes - state[_USED]
+        if state[_RESERVED_TICKET] and state[_RESERVED_TICKET] != ticket:
+            free -= state[_RESERVED_COST]
+        return free
+
+    def acquire(self, cost, timeout=None):
+        """
+        Espera até o custo caber no orçamento e o reserva.
+
+        Args:
+            cost: Custo estimado (bytes); custos acima do orçamento são
+                limitados a ele, ou seja, a imagem roda sozinha
+            timeout: Espera máxima em segundos (None: sem limite)
+
+        Returns:
+            O custo efetivamente reservado (a ser passado a release), ou
+            None se o prazo acabar antes
+        """
+        cost = max(0, min(int(cost), self.budget_bytes))
+        small = cost <= self.small_bytes
+        waiting = _WAITING_SMALL if small else _WAITING_LARGE
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        state = self._state
+        with self._cond:
+            state[_NEXT_TICKET] += 1
+            ticket = state[_NEXT_TICKET]
+            state[waiting] += 1
+            try:
+                while True:
+                    reserved = state[_RESERVED_TICKET] == ticket
+                    # As grandes cedem a vez às pequenas, exceto a que já reservou espaço
+                    if cost <= self._free_for(ticket) and (small or reserved or not state[_WAITING_SMALL]):
+                        state[_USED] += cost
+                        state[_ACTIVE] += 1
+                        return cost
+
+                    now = time.monotonic()
+                    if not small and not state[_RESERVED_TICKET] and now - start >= self.max_wait:
+                        state[_RESERVED_TICKET] = ticket
+                        state[_RESERVED_COST] = cost
+                        continue
+                    if deadline is not None and now >= deadline:
+                        return None
+
+                    wait = None if deadline is None else deadline - now
+                    if not small and not state[_RESERVED_TICKET]:
+                        # Acorda a tempo de reservar espaço
+                        age = max(0.0, start + self.max_wait - now)
+                        wait = age if wait is None else min(wait, age)
+                    self._cond.wait(wait)
+            finally:
+                state[waiting] -= 1
+                if state[_RESERVED_TICKET] == ticket:
+                    state[_RESERVED_TICKET] = 0
+                    state[_RESERVED_COST] = 0
+                # O estado mudou (fila ou reserva): os demais reavaliam
+                self._cond.notify_all()
+
+    def release(self, cost):
+        """Devolve ao orçamento um custo reservado por acquire"""
+        with self._cond:
+            self._state[_USED] -= cost
+            self._state[_ACTIVE] -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, cost, timeout=None):
+        """
+        Reserva o custo enquanto o bloco executa.
+
+        Raises:
+            AdmissionTimeout: se o prazo acabar antes de haver espaço
+        """
+        reserved = self.acquire(cost, timeout)
+        if reserved is None:
+            raise AdmissionTimeout("Tempo esgotado aguardando memória para decodificar a imagem")
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+    def snapshot(self):
+        """Estado atual do orçamento (para monitoramento)"""
+        with self._cond:
+            state = list(self._state)
+        return {
+            'budget_bytes': self.budget_bytes,
+            'used_bytes': state[_USED],
+            'active': state[_ACTIVE],
+            'waiting_small': state[_WAITING_SMALL],
+            'waiting_large': state[_WAITING_LARGE],
+            'reserved_bytes': state[_RESERVED_COST],
+        }
@@ -0,0 +1,371 @@
+"""
+Análise em lote de diretórios inteiros.
+
+Percorre uma árvore de diretórios, distribui os arquivos de imagem
+entre um pool de processos e grava um resultado JSON por linha
+(JSON Lines).
+
+Uso:
+    python -m image_analyzer.batch /caminho/das/imagens -o resultados.jsonl -w 8
+"""
+import os
+import sys
+import json
+import argparse
+import itertools
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from . import engine
+from .admission import PixelBudget
+from .context import ImageContext
+from .models import RUNTIMES, CaptionModelLoader, captioner_id
+from .captioning import CaptionService
+from .cache import ResultCache, analyze_file_cached, result_options
+from .phash_index import PerceptualHashIndex
+from .timing import MetricsCollector
+
+try:
+    from .columnar import ColumnStore
+except ImportError:
+    ColumnStore = None
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif', '.webp')
+# Resultados acumulados antes de gravar uma parte no armazenamento colunar
+STORE_FLUSH_ROWS = 10000
+
+# Serviço de legendas e cache de cada processo do pool (criados no initializer)
+_captioner = None
+_loader = None
+_cache = None
+_context_options = {}
+# Se o tempo de carregamento do modelo já foi informado por este processo
+_model_load_reported = False
+
+
+def iter_image_files(root, extensions=IMAGE_EXTENSIONS):
+    """
+    Percorre a árvore de diretórios e gera os caminhos das imagens.
+
+    Usa os.scandir com uma pilha explícita para não montar a lista
+    inteira de arquivos em memória antes de começar a análise.
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(extensions):
+                        yield entry.path
+        except OSError as e:
+            print(f"Erro ao ler diretório {current}: {e}", file=sys.stderr)
+
+
+def iter_chunks(iterable, size):
+    """Agrupa um iterável em listas de até size elementos"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(caption, caption_batch_size, caption_max_wait, cache_options, context_options,
+                 trace_memory=False, caption_options=None):
+    """Inicializa um processo do pool, aquecendo o modelo em segundo plano se necessário"""
+    global _captioner, _loader, _cache, _context_options
+    _context_options = context_options
+    caption_options = caption_options or {}
+    if trace_memory:
+        tracemalloc.start()
+    if caption:
+        _loader = CaptionModelLoader(options=caption_options)
+        _loader.start()
+        _captioner = CaptionService(_loader, caption_batch_size, caption_max_wait)
+    if cache_options is not None:
+        model = captioner_id(fast=caption_options.get('fast', False),
+                             runtime=caption_options.get('runtime')) if caption else None
+        _cache = ResultCache(model=model, **cache_options)
+
+
+def _analyze_path(image_path):
+    """Analisa um arquivo dentro de um processo do pool"""
+    global _model_load_reported
+    ctx = ImageContext(image_path, **_context_options)
+    try:
+        if _cache is not None:
+            result = analyze_file_cached(ctx, _cache, captioner=_captioner)
+        else:
+            result = engine.analyze_file(ctx, captioner=_captioner)
+        # O carregamento do modelo entra uma vez por processo, no primeiro
+        # resultado depois que ele termina
+        if _loader is not None and _loader.load_seconds is not None and not _model_load_reported:
+            _model_load_reported = True
+            result['timings']['model_load'] = {
+                'calls': 1, 'wall': _loader.load_seconds, 'cpu': 0.0,
+                'rss_growth': None, 'peak_traced': None,
+            }
+        return result
+    except Exception as e:
+        return {'path': image_path, 'errors': {'file': str(e)}}
+    finally:
+        ctx.release()
+
+
+def _analyze_chunk(paths):
+    """
+    Analisa um grupo de arquivos dentro de um processo do pool.
+
+    Com legendas ativas, os arquivos são analisados em threads para que
+    os pedidos ao CaptionService cheguem juntos e formem lotes.
+    """
+    if _captioner is None:
+        return [_analyze_path(path) for path in paths]
+    with ThreadPoolExecutor(_captioner.max_batch_size) as executor:
+        return list(executor.map(_analyze_path, paths))
+
+
+def _perceptual_hash(result):
+    """Extrai o hash perceptual de um resultado, se houver"""
+    initial = result.get('initial')
+    if initial:
+        return initial['hashes']['perceptual_hash']
+    return None
+
+
+def create_pool(workers=None, caption=False, caption_batch_size=8, caption_max_wait=0.05,
+                cache_options=None, context_options=None, trace_memory=False,
+                caption_options=None):
+    """
+    Cria o pool de processos de análise (ver run_batch para os argumentos).
+
+    Os grupos de caminhos são analisados com pool.imap_unordered(_analyze_chunk, ...).
+    """
+    caption_options = dict(caption_options or {})
+    if caption and not caption_options.get('threads'):
+        # Sem limite, cada processo usaria todas as CPUs na inferência
+        caption_options['threads'] = max(1, (os.cpu_count() or 1) // (workers or os.cpu_count() or 1))
+    initargs = (caption, caption_batch_size, caption_max_wait, cache_options,
+                context_options or {}, trace_memory, caption_options)
+    return multiprocessing.Pool(workers, initializer=_init_worker, initargs=initargs)
+
+
+def run_batch(root, output, workers=None, caption=False, chunksize=16,
+              caption_batch_size=8, caption_max_wait=0.05, cache_options=None,
+              phash_index=None, context_options=None, metrics=None, trace_memory=False,
+              caption_options=None, store=None):
+    """
+    Analisa todas as imagens de um diretório e grava os resultados.
+
+    Args:
+        root: Diretório raiz a ser percorrido
+        output: Arquivo de texto aberto onde cada resultado é gravado
+        workers: Número de processos (padrão: número de CPUs)
+        caption: Se True, cada processo carrega o modelo de legenda
+        chunksize: Quantidade de arquivos enviada a cada processo por vez
+        caption_batch_size: Número máximo de imagens por lote de legendas
+        caption_max_wait: Espera máxima (segundos) para completar um lote
+        cache_options: Argumentos de ResultCache (path, max_entries, max_bytes,
+            options), ou None para não usar cache
+        phash_index: PerceptualHashIndex onde os hashes perceptuais são inseridos
+        context_options: Argumentos de ImageContext (memory_limit, large_threshold,
+            digest_algorithms, frame_sampling, budget); um budget deve ser
+            criado com shared=True para valer entre os processos
+        metrics: MetricsCollector onde os tempos por etapa são agregados
+        trace_memory: Se True, os processos medem a memória alocada com o tracemalloc
+        caption_options: Opções do modelo de legenda (fast, threads, interop_threads,
+            runtime); sem threads, cada processo usa CPUs / workers threads do PyTorch
+        store: ColumnStore onde os resultados também são gravados, em partes
+            de STORE_FLUSH_ROWS linhas
+
+    Returns:
+        Tupla (total de arquivos, arquivos com erro)
+    """
+    total = 0
+    failed = 0
+    pending_hashes = []
+    pending_rows = []
+    pool = create_pool(workers, caption, caption_batch_size, caption_max_wait, cache_options,
+                       context_options, trace_memory, caption_options)
+    with pool:
+        chunks = iter_chunks(iter_image_files(root), chunksize)
+        for results in pool.imap_unordered(_analyze_chunk, chunks):
+            for result in results:
+                total += 1
+                if result['errors']:
+                    failed += 1
+                if metrics is not None:
+                    metrics.add(result.get('timings'), bool(result['errors']))
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                if store is not None:
+                    pending_rows.append(result)
+
+                phash = _perceptual_hash(result)
+                if phash_index is not None and phash is not None:
+                    pending_hashes.append((result['path'], phash))
+            # Inserções em bloco: uma transação por grupo de resultados
+            if len(pending_hashes) >= 1000:
+                phash_index.add_many(pending_hashes)
+                pending_hashes = []
+            if len(pending_rows) >= STORE_FLUSH_ROWS:
+                store.append(pending_rows)
+                pending_rows = []
+    if pending_hashes:
+        phash_index.add_many(pending_hashes)
+    if pending_rows:
+        store.append(pending_rows)
+    return total, failed
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.batch",
+        description="Analisa todas as imagens de um diretório e grava os resultados em JSON Lines."
+    )
+    parser.add_argument("root", help="Diretório com as imagens")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Arquivo de saída JSON Lines (padrão: saída padrão)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Número de processos (padrão: número de CPUs)")
+    parser.add_argument("--chunksize", type=int, default=16,
+                        help="Arquivos enviados a cada processo por vez")
+    parser.add_argument("--caption", action="store_true",
+                        help="Gera legendas com o modelo de IA (carregado em cada processo)")
+    parser.add_argument("--caption-batch-size", type=int, default=8,
+                        help="Número máximo de imagens por lote de legendas")
+    parser.add_argument("--caption-max-wait", type=float, default=0.05,
+                        help="Espera máxima (segundos) para completar um lote de legendas")
+    parser.add_argument("--fast-cpu", action="store_true",
+                        help="Modelo de legenda quantizado em int8 (mais rápido em CPU)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="Threads do PyTorch por processo (padrão: CPUs / workers)")
+    parser.add_argument("--caption-runtime", choices=RUNTIMES, default=None,
+                        help="Exporta o modelo de legenda para outro runtime, se instalado")
+    parser.add_argument("--memory-limit", type=float, default=None,
+                        help="Teto de memória (MB) por imagem; imagens maiores são lidas em faixas")
+    parser.add_argument("--large-threshold", type=float, default=None,
+                        help="Megapixels a partir dos quais a análise em faixas é usada")
+    parser.add_argument("--frame-stride", type=int, default=None,
+                        help="Em TIFF de várias páginas e imagens animadas, analisa um quadro a cada N")
+    parser.add_argument("--frame-sample", type=int, default=None,
+                        help="Analisa no máximo N quadros espaçados igualmente")
+    parser.add_argument("--max-frames", type=int, default=None,
+                        help="Número máximo de quadros analisados por arquivo (padrão: 1000)")
+    parser.add_argument("--keyframes", action="store_true",
+                        help="Analisa só os quadros que redesenham a imagem inteira")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="Memória (MB) para pixels decodificados ao mesmo tempo por todos os "
+                             "processos; imagens que não cabem esperam (pequenas passam à frente)")
+    parser.add_argument("--digests", default=None,
+                        help="Digests calculados na mesma leitura, separados por vírgula "
+                             "(padrão: md5,sha256,blake2b)")
+    parser.add_argument("--metrics-json",
+                        help="Arquivo JSON com os tempos por etapa agregados")
+    parser.add_argument("--metrics-prom",
+                        help="Arquivo no formato de texto do Prometheus com os tempos por etapa")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Mede o pico de memória alocada em cada etapa (mais lento)")
+    parser.add_argument("--phash-index",
+                        help="Banco SQLite onde os hashes perceptuais são indexados")
+    parser.add_argument("--store",
+                        help="Diretório do armazenamento colunar onde os resultados também são gravados")
+    parser.add_argument("--cache", help="Banco SQLite usado como cache de resultados")
+    parser.add_argument("--cache-max-entries", type=int, default=None,
+                        help="Número máximo de resultados mantidos no cache")
+    parser.add_argument("--cache-max-mb", type=float, default=None,
+                        help="Tamanho máximo (MB) dos resultados mantidos no cache")
+    return parser
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"Diretório não encontrado: {args.root}", file=sys.stderr)
+        return 2
+
+    frame_sampling = {}
+    if args.frame_stride:
+        frame_sampling['stride'] = args.frame_stride
+    if args.frame_sample:
+        frame_sampling['sample'] = args.frame_sample
+    if args.max_frames:
+        frame_sampling['max_frames'] = args.max_frames
+    if args.keyframes:
+        frame_sampling['keyframes'] = True
+
+    context_options = {}
+    if frame_sampling:
+        context_options['frame_sampling'] = frame_sampling
+    if args.memory_limit:
+        context_options['memory_limit'] = int(args.memory_limit * 1024 * 1024)
+    if args.large_threshold:
+        context_options['large_threshold'] = int(args.large_threshold * 1_000_000)
+    if args.memory_budget:
+        context_options['budget'] = PixelBudget(int(args.memory_budget * 1024 * 1024), shared=True)
+    if args.digests:
+        context_options['digest_algorithms'] = tuple(
+            name.strip() for name in args.digests.split(',') if name.strip()
+        )
+
+    cache_options = None
+    if args.cache:
+        cache_options = {
+            'path': args.cache,
+            'max_entries': args.cache_max_entries,
+            'max_bytes': int(args.cache_max_mb * 1024 * 1024) if args.cache_max_mb else None,
+            # Resultados com outros digests ou limites de memória não são reaproveitados
+            'options': result_options(context_options) or None,
+        }
+
+    options = dict(
+        workers=args.workers,
+        caption=args.caption,
+        chunksize=args.chunksize,
+        caption_batch_size=args.caption_batch_size,
+        caption_max_wait=args.caption_max_wait,
+        cache_options=cache_options,
+        context_options=context_options,
+        trace_memory=args.trace_memory,
+        caption_options={
+            'fast': args.fast_cpu,
+            'threads': args.torch_threads,
+            'runtime': args.caption_runtime,
+        },
+    )
+    metrics = MetricsCollector() if args.metrics_json or args.metrics_prom else None
+    if args.store:
+        if ColumnStore is None:
+            print("NumPy não instalado: armazenamento colunar indisponível", file=sys.stderr)
+            return 2
+        options['store'] = ColumnStore(args.store)
+    phash_index = PerceptualHashIndex(args.phash_index) if args.phash_index else None
+    try:
+        if args.output == "-":
+            total, failed = run_batch(args.root, sys.stdout, phash_index=phash_index,
+                                      metrics=metrics, **options)
+        else:
+            with open(args.output, "w", encoding="utf-8") as output:
+                total, failed = run_batch(args.root, output, phash_index=phash_index,
+                                          metrics=metrics, **options)
+    finally:
+        if phash_index is not None:
+            phash_index.close()
+
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+    print(f"{total} imagens analisadas, {failed} com erros.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
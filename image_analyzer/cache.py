@@ -0,0 +1,272 @@
+"""
+Cache persistente de resultados endereçado pelo conteúdo do arquivo.
+
+Os resultados de todas as etapas são gravados em um banco SQLite,
+indexados pelo digest MD5 do arquivo e pela versão do analisador e do
+modelo de IA. Antes de calcular o digest, uma verificação barata por
+caminho, tamanho e data de modificação permite reaproveitar o resultado
+sem sequer ler o arquivo.
+"""
+import json
+import time
+import sqlite3
+import threading
+
+from . import engine, hashing
+from .context import DEFAULT_MEMORY_LIMIT, ImageContext
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    digest TEXT NOT NULL,
+    version TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (digest, version)
+);
+CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access);
+CREATE TABLE IF NOT EXISTS paths (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS paths_digest ON paths (digest);
+-- Totais mantidos pelos gatilhos: verificar os limites não percorre a tabela
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, entries, bytes)
+    SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM results
+    WHERE NOT EXISTS (SELECT 1 FROM totals);
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results BEGIN
+    UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+
+def cache_version(model=None, options=None):
+    """
+    Monta a versão usada na chave do cache.
+
+    Args:
+        model: Identificador do modelo de legendas, ou None se não houver legendas
+        options: Opções de análise que mudam o resultado (ver
+            result_options), ou None para as opções padrão
+    """
+    version = f"{engine.ANALYZER_VERSION}/{model or '-'}"
+    if options:
+        version += "/" + ",".join(f"{key}={options[key]}" for key in sorted(options))
+    return version
+
+
+def result_options(context_options):
+    """
+    Opções de ImageContext que mudam o resultado, no formato de
+    cache_version: amostragem de quadros, digests calculados e os
+    limites da análise em faixas (estatísticas exatas ou por faixas).
+
+    Args:
+        context_options: Argumentos de ImageContext
+
+    Returns:
+        Dicionário (vazio com as opções padrão)
+    """
+    options = dict(context_options.get('frame_sampling') or {})
+    digests = context_options.get('digest_algorithms')
+    if digests is not None and tuple(digests) != hashing.DEFAULT_ALGORITHMS:
+        options['digests'] = '+'.join(sorted(digests))
+    memory_limit = context_options.get('memory_limit')
+    if memory_limit is not None and memory_limit != DEFAULT_MEMORY_LIMIT:
+        options['memory_limit'] = memory_limit
+    if context_options.get('large_threshold') is not None:
+        options['large_threshold'] = context_options['large_threshold']
+    return options
+
+
+class ResultCache:
+    """
+    Cache SQLite de resultados com política de remoção LRU.
+
+    Pode ser compartilhado por várias threads; processos diferentes
+    devem abrir suas próprias instâncias sobre o mesmo arquivo.
+    """
+
+    def __init__(self, path, model=None, max_entries=None, max_bytes=None, options=None):
+        """
+        Args:
+            path: Arquivo do banco SQLite
+            model: Identificador do modelo de legendas (faz parte da chave)
+            max_entries: Número máximo de resultados mantidos
+            max_bytes: Tamanho máximo (em bytes de JSON) dos resultados mantidos
+            options: Opções de análise que mudam o resultado (fazem parte da chave)
+        """
+        self.path = path
+        self.version = cache_version(model, options)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup_path(self, path, stats):
+        """
+        Verificação barata: retorna o digest conhecido para o caminho se o
+        tamanho e a data de modificação não mudaram, senão None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM paths WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, stats.st_size, stats.st_mtime_ns)
+            ).fetchone()
+        return row[0] if row else None
+
+    def remember_path(self, path, stats, digest):
+        """Associa o caminho (com tamanho e data de modificação) ao digest do conteúdo"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO paths (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                (path, stats.st_size, stats.st_mtime_ns, digest)
+            )
+
+    def get(self, digest):
+        """Retorna o resultado armazenado para o digest, ou None"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT payload FROM results WHERE digest = ? AND version = ?",
+                (digest, self.version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE results SET last_access = ? WHERE digest = ? AND version = ?",
+                (time.time(), digest, self.version)
+            )
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, digest, result):
+        """Armazena o resultado e aplica a política de remoção"""
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock, self._conn:
+            # Upsert em vez de REPLACE: a remoção implícita do REPLACE não
+            # dispara o gatilho que mantém os totais
+            self._conn.execute(
+                "INSERT INTO results (digest, version, payload, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (digest, version) DO UPDATE SET "
+                "payload = excluded.payload, size = excluded.size, last_access = excluded.last_access",
+                (digest, self.version, payload, len(payload), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        """Remove os resultados acessados há mais tempo até respeitar os limites"""
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        entries, total = self._conn.execute("SELECT entries, bytes FROM totals").fetchone()
+        max_entries = self.max_entries if self.max_entries is not None else entries
+        max_bytes = self.max_bytes if self.max_bytes is not None else total
+        if entries <= max_entries and total <= max_bytes:
+            return
+
+        doomed = []
+        rows = self._conn.execute(
+            "SELECT rowid, digest, size FROM results ORDER BY last_access ASC"
+        )
+        for rowid, digest, size in rows:
+            if entries <= max_entries and total <= max_bytes:
+                break
+            doomed.append((rowid, digest))
+            entries -= 1
+            total -= size
+        rows.close()
+        self._conn.executemany("DELETE FROM results WHERE rowid = ?",
+                               ((rowid,) for rowid, _ in doomed))
+        # Caminhos que apontavam para os resultados removidos não servem mais
+        # (o mesmo conteúdo pode continuar armazenado em outra versão)
+        self._conn.executemany(
+            "DELETE FROM paths WHERE digest = ? "
+            "AND NOT EXISTS (SELECT 1 FROM results WHERE digest = ?)",
+            ((digest, digest) for digest in {digest for _, digest in doomed})
+        )
+
+    def stats(self):
+        """Retorna o número de resultados e o tamanho total armazenado"""
+        with self._lock:
+            count, size = self._conn.execute("SELECT entries, bytes FROM totals").fetchone()
+        return {'entries': count, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
+
+
+def is_cacheable(result, captioned):
+    """Resultados com erros (possivelmente transitórios) não são armazenados"""
+    if result['errors']:
+        return False
+    if captioned and result['initial']['caption_error'] is not None:
+        return False
+    return True
+
+
+def analyze_file_cached(source, cache, captioner=None):
+    """
+    Executa analyze_file consultando o cache antes.
+
+    A chave 'cache' do resultado indica como ele foi obtido:
+    'path' (verificação por caminho/tamanho/data), 'digest' (mesmo
+    conteúdo já analisado) ou None (análise completa).
+    """
+    owned = not isinstance(source, ImageContext)
+    ctx = ImageContext.of(source)
+    try:
+        stats = ctx.stat
+
+        # Verificação barata: nem o digest precisa ser calculado
+        with ctx.timings.measure('cache'):
+            digest = cache.lookup_path(ctx.path, stats)
+            result = cache.get(digest) if digest is not None else None
+        if result is not None:
+            result['cache'] = 'path'
+            result['timings'] = ctx.timings.as_dict()
+            return engine.update_file_fields(result, ctx)
+
+        digest = ctx.digest('md5')
+        with ctx.timings.measure('cache'):
+            result = cache.get(digest)
+        if result is not None:
+            cache.remember_path(ctx.path, stats, digest)
+            result['cache'] = 'digest'
+            result['timings'] = ctx.timings.as_dict()
+            return engine.update_file_fields(result, ctx)
+
+        result = engine.analyze_file(ctx, captioner)
+        if is_cacheable(result, captioner is not None):
+            cache.put(digest, result)
+            cache.remember_path(ctx.path, stats, digest)
+        result['cache'] = None
+        return result
+    finally:
+        if owned:
+            ctx.release()
@@ -0,0 +1,142 @@
+"""
+Serviço de legendas com micro-lotes para o pipeline image-to-text.
+
+As imagens enviadas por várias threads são acumuladas em uma fila e
+repassadas ao pipeline em lotes, aproveitando as multiplicações de
+matrizes em lote na inferência em CPU. Cada chamador recebe um Future
+resolvido com a sua própria legenda.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Marcador usado para encerrar a thread do serviço
+_STOP = object()
+
+
+class CaptionService:
+    """
+    Agrupa pedidos de legenda em lotes antes de chamar o pipeline.
+
+    Um lote é enviado quando atinge max_batch_size imagens ou quando
+    a imagem mais antiga já esperou max_wait segundos. A instância pode
+    ser usada diretamente como captioner pelo motor de análise.
+    """
+
+    def __init__(self, captioner, max_batch_size=8, max_wait=0.05):
+        """
+        Args:
+            captioner: Pipeline image-to-text ou CaptionModelLoader
+            max_batch_size: Número máximo de imagens por lote
+            max_wait: Tempo máximo (segundos) que um pedido espera o lote encher
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size deve ser pelo menos 1")
+        self.captioner = captioner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.images = 0
+
+    def start(self):
+        """Inicia a thread que monta e executa os lotes"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="caption-service")
+                self._thread.daemon = True
+                self._thread.start()
+        return self
+
+    def submit(self, image):
+        """
+        Enfileira uma imagem para legenda.
+
+        Returns:
+            Future resolvido com a saída do pipeline para a imagem
+            (lista de dicionários com 'generated_text')
+        """
+        if self._closed:
+            raise RuntimeError("Serviço de legendas encerrado")
+        self.start()
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def __call__(self, image):
+        """Gera a legenda de uma imagem, esperando o lote ser processado"""
+        return self.submit(image).result()
+
+    def close(self, wait=True):
+        """Encerra o serviço depois de processar os pedidos já enfileirados"""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            if wait:
+                self._thread.join()
+
+    def _resolve_pipeline(self):
+        """Obtém o pipeline, esperando o carregamento se for um CaptionModelLoader"""
+        if hasattr(self.captioner, 'get'):
+            return self.captioner.get()
+        return self.captioner
+
+    def _collect(self, first):
+        """Monta um lote a partir do primeiro pedido, respeitando tamanho e espera máximos"""
+        batch = [first]
+        stop = False
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _worker(self):
+        """Laço principal: coleta lotes e executa o pipeline"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch, stop = self._collect(item)
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch):
+        """Executa o pipeline sobre um lote e resolve os futures de cada chamador"""
+        # Descarta pedidos cancelados antes de gastar inferência com eles
+        batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            pipeline = self._resolve_pipeline()
+            images = [image for image, _ in batch]
+            outputs = list(pipeline(images, batch_size=len(images)))
+        except BaseException as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.images += min(len(outputs), len(batch))
+        for (_, future), output in zip(batch, outputs):
+            future.set_result(output)
+        if len(outputs) != len(batch):
+            # Sem resposta, os chamadores restantes esperariam para sempre
+            error = RuntimeError(
+                f"O modelo devolveu {len(outputs)} legendas para um lote de {len(batch)} imagens")
+            for _, future in batch[len(outputs):]:
+                future.set_exception(error)
@@ -0,0 +1,645 @@
+"""
+Armazenamento colunar compacto dos resultados de análise.
+
+Cada resultado (ver engine.analyze_file) é reduzido a uma linha com
+tipos fixos: dimensões em int32, tamanhos em int64, hashes em inteiros
+de 64 bits (o MD5 em duas colunas), médias e estatísticas em float32,
+formato e modo em bytes de tamanho fixo. Apenas o caminho e a legenda
+têm tamanho variável.
+
+As linhas são gravadas em partes (uma por chamada a append); com o
+pyarrow instalado, cada parte é um arquivo Parquet, senão um diretório
+com um .npy por coluna, lido com memory-mapping. Assim as consultas
+carregam só as colunas que usam e são avaliadas de forma vetorizada,
+sem criar objetos Python por linha; os textos só são decodificados
+para as linhas selecionadas.
+
+Cada caminho tem uma única linha válida, a última gravada: as partes
+não são reescritas, mas as linhas substituídas (identificadas pela
+coluna path_key, um hash de 64 bits do caminho) ficam fora das
+consultas e de len(), e compact as descarta. Reanalisar a mesma pasta
+não duplica o catálogo.
+
+Uso:
+    python -m image_analyzer.columnar catalogo/ import resultados.jsonl
+    python -m image_analyzer.columnar catalogo/ query --format JPEG --min-megapixels 20 \\
+        --orientation landscape --exif no
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+STORE_VERSION = 2
+BACKENDS = ('parquet', 'numpy')
+
+# Colunas de tamanho fixo (nome, dtype)
+COLUMNS = (
+    ('path_key', '<u8'),
+    ('format', 'S8'),
+    ('mode', 'S8'),
+    ('width', '<i4'),
+    ('height', '<i4'),
+    ('megapixels', '<f4'),
+    ('file_size', '<i8'),
+    ('modified', '<f8'),
+    ('analyzed_at', '<f8'),
+    ('exif_tags', '<i2'),
+    ('has_gps', '?'),
+    ('md5_hi', '<u8'),
+    ('md5_lo', '<u8'),
+    ('ahash', '<u8'),
+    ('dhash', '<u8'),
+    ('phash', '<u8'),
+    ('whash', '<u8'),
+    ('colorhash', '<u8'),
+    ('mean_r', '<f4'),
+    ('mean_g', '<f4'),
+    ('mean_b', '<f4'),
+    ('luminance', '<f4'),
+    ('entropy', '<f4'),
+    ('sharpness', '<f4'),
+    ('errors', 'u1'),
+)
+# Colunas de texto (UTF-8, tamanho variável)
+STRING_COLUMNS = ('path', 'caption')
+
+DTYPES = dict(COLUMNS)
+# Bits da coluna errors: etapas que falharam ('frames' é a análise
+# quadro a quadro de arquivos animados e de várias páginas)
+ERROR_BITS = {
+    'initial': 1,
+    'basic_info': 2,
+    'advanced_tags': 4,
+    'metadata': 8,
+    'file': 16,
+    'frames': 32,
+}
+PERCEPTUAL_COLUMNS = ('ahash', 'dhash', 'phash', 'whash', 'colorhash')
+ORIENTATIONS = ('landscape', 'portrait', 'square')
+
+
+def _hex_to_int(value):
+    return int(value, 16) if value else 0
+
+
+def path_key(path):
+    """Hash de 64 bits do caminho, que identifica as linhas de um mesmo arquivo"""
+    digest = hashlib.blake2b(path.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def result_row(result):
+    """
+    Converte um resultado de analyze_file em uma linha do esquema.
+
+    Valores ausentes viram 0 (inteiros e hashes), NaN (números reais) ou
+    texto vazio; a coluna errors indica quais etapas falharam, um bit
+    por etapa (ver ERROR_BITS, incluindo 'frames').
+    """
+    row = {name: 0 for name, _ in COLUMNS}
+    for name in ('modified', 'analyzed_at', 'mean_r', 'mean_g', 'mean_b',
+                 'luminance', 'entropy', 'sharpness'):
+        row[name] = np.nan
+    row['format'] = row['mode'] = b''
+    row['has_gps'] = False
+    row['path'] = result.get('path', '')
+    row['path_key'] = path_key(row['path'])
+    row['caption'] = ''
+
+    for stage in result.get('errors') or {}:
+        row['errors'] |= ERROR_BITS.get(stage, 0)
+
+    basic = result.get('basic_info')
+    if basic:
+        row['width'], row['height'] = basic['size']
+        row['megapixels'] = row['width'] * row['height'] / 1e6
+        row['format'] = (basic['format'] or '').encode()[:8]
+        row['mode'] = (basic['mode'] or '').encode()[:8]
+        row['file_size'] = basic['file_size']
+
+    initial = result.get('initial')
+    if initial:
+        row['caption'] = initial.get('caption') or ''
+        row['analyzed_at'] = datetime.fromisoformat(initial['analyzed_at']).timestamp()
+        row['modified'] = initial['file']['modified']
+        hashes = initial['hashes']
+        md5 = _hex_to_int(hashes.get('md5'))
+        row['md5_hi'], row['md5_lo'] = md5 >> 64, md5 & ((1 << 64) - 1)
+        for name, value in (hashes.get('perceptual') or {}).items():
+            if name in PERCEPTUAL_COLUMNS:
+                row[name] = _hex_to_int(value)
+
+    tags = result.get('advanced_tags')
+    if tags:
+        row['exif_tags'] = min(len(tags['exif']), np.iinfo(np.int16).max)
+        row['has_gps'] = 'GPSInfo' in tags['exif']
+
+    metadata = result.get('metadata')
+    if metadata:
+        if not basic:
+            row['file_size'] = metadata['file']['size']
+        pixel_stats = metadata.get('pixel_stats')
+        if pixel_stats:
+            channels = pixel_stats['channels']
+            for name, channel in (('mean_r', 'R'), ('mean_g', 'G'), ('mean_b', 'B')):
+                if channel in channels:
+                    row[name] = channels[channel]['mean']
+            row['luminance'] = pixel_stats['luminance']['mean']
+            row['entropy'] = pixel_stats['entropy']
+            row['sharpness'] = pixel_stats['sharpness']
+    return row
+
+
+def rows_to_columns(rows):
+    """Agrupa linhas (dicionários de result_row) em arrays tipados por coluna"""
+    columns = {name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in COLUMNS}
+    for name in STRING_COLUMNS:
+        columns[name] = [row[name] for row in rows]
+    return columns
+
+
+class _NumpyParts:
+    """Partes como diretórios com um .npy por coluna e textos em blob + offsets"""
+
+    extension = ''
+
+    @staticmethod
+    def write(path, columns):
+        os.makedirs(path)
+        for name, _ in COLUMNS:
+            np.save(os.path.join(path, f"{name}.npy"), columns[name])
+        for name in STRING_COLUMNS:
+            encoded = [value.encode('utf-8') for value in columns[name]]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            np.save(os.path.join(path, f"{name}.offsets.npy"), offsets)
+            with open(os.path.join(path, f"{name}.bin"), 'wb') as f:
+                f.write(b''.join(encoded))
+
+    @staticmethod
+    def column(path, name):
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+    @staticmethod
+    def strings(path, name, rows):
+        offsets = np.load(os.path.join(path, f"{name}.offsets.npy"), mmap_mode='r')
+        blob = np.memmap(os.path.join(path, f"{name}.bin"), dtype=np.uint8, mode='r') \
+            if offsets[-1] else np.zeros(0, dtype=np.uint8)
+        return [bytes(blob[offsets[i]:offsets[i + 1]]).decode('utf-8') for i in rows]
+
+
+class _ParquetParts:
+    """Partes como arquivos Parquet (requer pyarrow)"""
+
+    extension = '.parquet'
+
+    @staticmethod
+    def write(path, columns):
+        table = pa.table({name: pa.array(columns[name]) for name in columns})
+        pq.write_table(table, path)
+
+    @staticmethod
+    def column(path, name):
+        values = pq.read_table(path, columns=[name], memory_map=True).column(name)
+        values = values.to_numpy()
+        dtype = DTYPES[name]
+        return values.astype(dtype) if values.dtype != np.dtype(dtype) else values
+
+    @staticmethod
+    def strings(path, name, rows):
+        values = pq.read_table(path, columns=[name], memory_map=True).column(name)
+        return values.take(pa.array(rows, type=pa.int64())).to_pylist()
+
+
+class Columns:
+    """
+    Acesso preguiçoso às colunas de um ColumnStore.
+
+    Cada coluna é lida na primeira vez em que é usada; além das colunas
+    do esquema, oferece 'orientation' (0 paisagem, 1 retrato, 2 quadrada)
+    calculada de forma vetorizada.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._cache = {}
+
+    def __len__(self):
+        # Todas as linhas gravadas, inclusive as substituídas (ver ColumnStore.live)
+        return self._store.rows
+
+    def __getitem__(self, name):
+        if name not in self._cache:
+            if name == 'orientation':
+                width, height = self['width'], self['height']
+                value = np.where(width > height, 0, np.where(width < height, 1, 2)).astype(np.int8)
+            else:
+                value = self._store.column(name)
+            self._cache[name] = value
+        return self._cache[name]
+
+
+class ColumnStore:
+    """
+    Armazenamento colunar em um diretório, com partes somente de acréscimo.
+
+    O arquivo store.json lista as partes concluídas; ele é substituído
+    atomicamente depois que uma parte é gravada, então uma gravação
+    interrompida não corrompe o armazenamento. Vale a última linha
+    gravada de cada caminho (ver live).
+    """
+
+    def __init__(self, path, backend=None):
+        """
+        Args:
+            path: Diretório do armazenamento (criado se não existir)
+            backend: 'parquet' ou 'numpy' para um armazenamento novo (padrão:
+                parquet se o pyarrow estiver instalado); um existente mantém o seu
+        """
+        self.path = path
+        self._manifest_path = os.path.join(path, "store.json")
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            if self.manifest['version'] == 1:
+                # Partes anteriores à coluna path_key: calculada a partir dos caminhos
+                for part in self.manifest['parts']:
+                    part['path_key'] = False
+                self.manifest['version'] = STORE_VERSION
+                self._save_manifest()
+            if self.manifest['version'] != STORE_VERSION:
+                raise ValueError(f"Versão do armazenamento não suportada: {self.manifest['version']}")
+        else:
+            backend = backend or ('parquet' if pa is not None else 'numpy')
+            if backend not in BACKENDS:
+                raise ValueError(f"Formato desconhecido: {backend}")
+            os.makedirs(path, exist_ok=True)
+            self.manifest = {'version': STORE_VERSION, 'backend': backend, 'parts': []}
+            self._save_manifest()
+        if self.backend == 'parquet' and pa is None:
+            raise RuntimeError("pyarrow não instalado: não é possível ler um armazenamento Parquet")
+        self._parts = _ParquetParts if self.backend == 'parquet' else _NumpyParts
+        self._live = None
+
+    @property
+    def backend(self):
+        return self.manifest['backend']
+
+    @property
+    def rows(self):
+        """Linhas gravadas em todas as partes, inclusive as substituídas"""
+        return sum(part['rows'] for part in self.manifest['parts'])
+
+    def __len__(self):
+        """Número de arquivos: uma linha válida por caminho"""
+        return int(np.count_nonzero(self.live()))
+
+    def live(self):
+        """
+        Máscara das linhas válidas: a última gravada de cada caminho.
+
+        Returns:
+            Array booleano com uma posição por linha gravada
+        """
+        if self._live is None:
+            keys = self.column('path_key')
+            live = np.zeros(len(keys), dtype=bool)
+            if len(keys):
+                # Primeira ocorrência na ordem inversa = última gravada
+                _, first = np.unique(keys[::-1], return_index=True)
+                live[len(keys) - 1 - first] = True
+            self._live = live
+        return self._live
+
+    def count(self, where=None):
+        """Número de linhas válidas que atendem ao filtro (ver select)"""
+        live = self.live()
+        if where is None:
+            return int(np.count_nonzero(live))
+        return int(np.count_nonzero(where(Columns(self)) & live))
+
+    def _save_manifest(self):
+        temp = self._manifest_path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp, self._manifest_path)
+
+    def _part_path(self, part):
+        return os.path.join(self.path, part['name'])
+
+    def append(self, results):
+        """
+        Grava um grupo de resultados como uma nova parte.
+
+        As linhas gravadas substituem as anteriores do mesmo caminho.
+        Resultados vindos do cache (result['cache']) cujo caminho já está
+        no armazenamento com o mesmo MD5 são iguais à linha existente e
+        não são gravados de novo.
+
+        Args:
+            results: Resultados de analyze_file (dicionários)
+
+        Returns:
+            Número de linhas gravadas
+        """
+        rows = [result_row(result) for result in results]
+        cached = [index for index, result in enumerate(results) if result.get('cache')]
+        if cached and self.rows:
+            unchanged = self._unchanged([rows[index] for index in cached])
+            skip = {index for index, same in zip(cached, unchanged) if same}
+            rows = [row for index, row in enumerate(rows) if index not in skip]
+        if not rows:
+            return 0
+        index = len(self.manifest['parts'])
+        name = f"part-{index:05d}{self._parts.extension}"
+        while os.path.exists(os.path.join(self.path, name)):
+            # Restos de uma gravação interrompida
+            index += 1
+            name = f"part-{index:05d}{self._parts.extension}"
+        self._parts.write(os.path.join(self.path, name), rows_to_columns(rows))
+        self.manifest['parts'].append({'name': name, 'rows': len(rows)})
+        self._save_manifest()
+        self._live = None
+        return len(rows)
+
+    def _unchanged(self, rows):
+        """Para cada linha, se a linha válida do mesmo caminho tem o mesmo MD5"""
+        live = np.flatnonzero(self.live())
+        keys = self.column('path_key')[live]
+        order = np.argsort(keys)
+        keys = keys[order]
+        live = live[order]
+        md5_hi = self.column('md5_hi')
+        md5_lo = self.column('md5_lo')
+        unchanged = []
+        for row in rows:
+            position = int(np.searchsorted(keys, row['path_key']))
+            if position < len(keys) and keys[position] == row['path_key']:
+                stored = live[position]
+                unchanged.append(bool(md5_hi[stored] == row['md5_hi'] and md5_lo[stored] == row['md5_lo']))
+            else:
+                unchanged.append(False)
+        return unchanged
+
+    def _part_column(self, part, name):
+        """Coluna de uma parte"""
+        if name == 'path_key' and not part.get('path_key', True):
+            paths = self._parts.strings(self._part_path(part), 'path', range(part['rows']))
+            return np.array([path_key(path) for path in paths], dtype=DTYPES[name])
+        return self._parts.column(self._part_path(part), name)
+
+    def column(self, name):
+        """Coluna inteira (todas as partes); colunas de texto viram listas de str"""
+        parts = self.manifest['parts']
+        if name in STRING_COLUMNS:
+            values = []
+            for part in parts:
+                values.extend(self._parts.strings(self._part_path(part), name, range(part['rows'])))
+            return np.array(values, dtype=object)
+        if name not in DTYPES:
+            raise KeyError(name)
+        if not parts:
+            return np.zeros(0, dtype=DTYPES[name])
+        arrays = [self._part_column(part, name) for part in parts]
+        # Com uma única parte (ver compact), a coluna continua mapeada do disco
+        return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+
+    def strings(self, name, rows):
+        """Textos da coluna name apenas nas linhas (índices globais, crescentes) pedidas"""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = []
+        start = 0
+        for part in self.manifest['parts']:
+            end = start + part['rows']
+            local = rows[(rows >= start) & (rows < end)] - start
+            if len(local):
+                values.extend(self._parts.strings(self._part_path(part), name, local.tolist()))
+            start = end
+        return values
+
+    def select(self, where=None, columns=('path',), limit=None):
+        """
+        Seleciona linhas de forma vetorizada.
+
+        Args:
+            where: Função que recebe um Columns e devolve uma máscara
+                booleana (por exemplo, lambda c: c['width'] > 4000); None
+                seleciona tudo
+            columns: Colunas devolvidas (do esquema, de texto ou derivadas)
+            limit: Número máximo de linhas
+
+        Returns:
+            Array estruturado com as colunas pedidas (só as linhas
+            válidas), na ordem de gravação
+        """
+        cols = Columns(self)
+        if where is None:
+            rows = np.flatnonzero(self.live())
+        else:
+            rows = np.flatnonzero(where(cols) & self.live())
+        if limit is not None:
+            rows = rows[:limit]
+
+        fields = []
+        values = []
+        for name in columns:
+            if name in STRING_COLUMNS:
+                fields.append((name, object))
+                values.append(self.strings(name, rows))
+            else:
+                column = cols[name]
+                fields.append((name, column.dtype))
+                values.append(column[rows])
+        selected = np.empty(len(rows), dtype=fields)
+        for (name, _), value in zip(fields, values):
+            selected[name] = value
+        return selected
+
+    def compact(self):
+        """
+        Junta todas as partes em uma só (consultas com menos arquivos
+        abertos), descartando as linhas substituídas.
+        """
+        parts = self.manifest['parts']
+        live = self.live()
+        if len(parts) <= 1 and live.all() and all(part.get('path_key', True) for part in parts):
+            return
+        rows = np.flatnonzero(live)
+        columns = {name: np.ascontiguousarray(self.column(name)[rows]) for name, _ in COLUMNS}
+        for name in STRING_COLUMNS:
+            columns[name] = self.strings(name, rows)
+        name = f"compact-{int(time.time() * 1000)}{self._parts.extension}"
+        self._parts.write(os.path.join(self.path, name), columns)
+        old = [self._part_path(part) for part in parts]
+        self.manifest['parts'] = [{'name': name, 'rows': len(rows)}]
+        self._save_manifest()
+        self._live = None
+        for path in old:
+            _remove(path)
+
+
+def _remove(path):
+    """Remove uma parte (arquivo ou diretório)"""
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
+    else:
+        os.remove(path)
+
+
+def equals_bytes(column, value):
+    """
+    Compara uma coluna de bytes de tamanho fixo com um valor.
+
+    Colunas de 8 bytes são comparadas como inteiros de 64 bits, bem mais
+    rápido que a comparação de strings do NumPy.
+    """
+    value = value[:column.dtype.itemsize].ljust(column.dtype.itemsize, b'\0')
+    if column.dtype.itemsize == 8 and column.flags['C_CONTIGUOUS']:
+        return column.view('<u8') == np.frombuffer(value, dtype='<u8')[0]
+    return column == value
+
+
+def build_filter(format=None, min_megapixels=None, max_megapixels=None, orientation=None,
+                 exif=None, gps=None, errors=None):
+    """
+    Monta a função where de ColumnStore.select a partir de critérios simples.
+
+    Args:
+        format: Formato PIL (por exemplo, 'JPEG')
+        min_megapixels, max_megapixels: Limites de resolução
+        orientation: 'landscape', 'portrait' ou 'square'
+        exif: True (com EXIF) ou False (sem EXIF)
+        gps: True (com GPS) ou False (sem GPS)
+        errors: True (com erros) ou False (sem erros)
+    """
+    def where(cols):
+        mask = np.ones(len(cols), dtype=bool)
+        if format is not None:
+            mask &= equals_bytes(cols['format'], format.upper().encode())
+        if min_megapixels is not None:
+            mask &= cols['megapixels'] >= min_megapixels
+        if max_megapixels is not None:
+            mask &= cols['megapixels'] <= max_megapixels
+        if orientation == 'landscape':
+            mask &= cols['width'] > cols['height']
+        elif orientation == 'portrait':
+            mask &= cols['width'] < cols['height']
+        elif orientation == 'square':
+            mask &= cols['width'] == cols['height']
+        if exif is not None:
+            mask &= (cols['exif_tags'] > 0) == exif
+        if gps is not None:
+            mask &= cols['has_gps'] == gps
+        if errors is not None:
+            mask &= (cols['errors'] != 0) == errors
+        return mask
+    return where
+
+
+def import_jsonl(store, path, chunk_rows=10000):
+    """Importa um arquivo JSON Lines (modo em lote ou watch export) em partes de chunk_rows linhas"""
+    total = 0
+    pending = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                pending.append(json.loads(line))
+            if len(pending) >= chunk_rows:
+                total += store.append(pending)
+                pending = []
+    total += store.append(pending)
+    return total
+
+
+def _optional_bool(value):
+    return {'yes': True, 'no': False}[value]
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.columnar",
+        description="Armazenamento colunar dos resultados e consultas sobre ele."
+    )
+    parser.add_argument("store", help="Diretório do armazenamento")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Formato de um armazenamento novo (padrão: parquet se disponível)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_command = commands.add_parser("import", help="Importa resultados em JSON Lines")
+    import_command.add_argument("inputs", nargs="+", help="Arquivos JSON Lines")
+
+    query = commands.add_parser("query", help="Lista os arquivos que atendem aos critérios")
+    query.add_argument("--format", help="Formato (JPEG, PNG, TIFF...)")
+    query.add_argument("--min-megapixels", type=float, default=None)
+    query.add_argument("--max-megapixels", type=float, default=None)
+    query.add_argument("--orientation", choices=ORIENTATIONS, default=None)
+    query.add_argument("--exif", choices=("yes", "no"), default=None, help="Com ou sem EXIF")
+    query.add_argument("--gps", choices=("yes", "no"), default=None, help="Com ou sem GPS")
+    query.add_argument("--errors", choices=("yes", "no"), default=None, help="Com ou sem erros")
+    query.add_argument("--limit", type=int, default=None, help="Número máximo de resultados")
+    query.add_argument("--count", action="store_true", help="Mostra só a quantidade")
+
+    commands.add_parser("info", help="Mostra o formato, as partes e o número de linhas")
+    commands.add_parser("compact", help="Junta todas as partes em uma só")
+    return parser
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+    store = ColumnStore(args.store, backend=args.backend)
+
+    if args.command == "import":
+        for path in args.inputs:
+            count = import_jsonl(store, path)
+            print(f"{count} resultados importados de {path}", file=sys.stderr)
+    elif args.command == "query":
+        where = build_filter(
+            format=args.format,
+            min_megapixels=args.min_megapixels,
+            max_megapixels=args.max_megapixels,
+            orientation=args.orientation,
+            exif=_optional_bool(args.exif) if args.exif else None,
+            gps=_optional_bool(args.gps) if args.gps else None,
+            errors=_optional_bool(args.errors) if args.errors else None,
+        )
+        start = time.perf_counter()
+        if args.count:
+            count = store.count(where)
+            print(count)
+        else:
+            selected = store.select(where, columns=('path', 'width', 'height'), limit=args.limit)
+            count = len(selected)
+            for row in selected:
+                print(f"{row['width']}x{row['height']}\t{row['path']}")
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{count} de {len(store)} arquivos em {elapsed:.1f} ms", file=sys.stderr)
+    elif args.command == "compact":
+        store.compact()
+        print(f"{len(store)} linhas em uma parte", file=sys.stderr)
+    else:
+        print(f"formato: {store.backend}")
+        print(f"partes: {len(store.manifest['parts'])}")
+        print(f"arquivos: {len(store)}")
+        print(f"linhas: {store.rows}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""
+Contexto compartilhado por todas as etapas de uma análise.
+
+O arquivo é lido do disco uma única vez e os pixels são decodificados
+no máximo uma vez; cabeçalho, EXIF, matriz de pixels e resultado de
+os.stat ficam disponíveis para todas as etapas.
+"""
+import io
+import os
+import threading
+
+from PIL import Image
+
+try:
+    import magic
+except ImportError:
+    magic = None
+
+from . import admission, hashing
+from .timing import StageTimings
+
+try:
+    import numpy as np
+    from . import tiling
+except ImportError:
+    np = None
+    tiling = None
+
+# Teto de memória padrão (ver tiling.DEFAULT_MEMORY_LIMIT)
+DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+# Bloco de leitura usado quando o arquivo não é mantido inteiro em memória
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Modos em que Image.reduce funciona sem conversão prévia
+REDUCIBLE_MODES = ('RGB', 'RGBA', 'L', 'LA', 'CMYK')
+
+# Detector de MIME de cada thread, reutilizado entre análises (uma
+# instância de magic.Magic só atende uma chamada por vez)
+_mime_local = threading.local()
+
+
+def _detect_mime(data):
+    """Detecta o tipo MIME a partir dos bytes já lidos"""
+    if magic is None:
+        return None
+    detector = getattr(_mime_local, 'detector', None)
+    if detector is None:
+        detector = _mime_local.detector = magic.Magic(mime=True)
+    return detector.from_buffer(data)
+
+
+class ImageContext:
+    """
+    Reúne os dados de uma imagem carregados sob demanda.
+
+    Cada atributo é calculado na primeira vez em que é acessado e
+    reaproveitado pelas etapas seguintes. O acesso é protegido por
+    locks, então o mesmo contexto pode ser usado por várias threads, e
+    etapas independentes podem rodar em paralelo.
+    """
+
+    def __init__(self, path, memory_limit=DEFAULT_MEMORY_LIMIT, large_threshold=None,
+                 digest_algorithms=hashing.DEFAULT_ALGORITHMS, preload=True, timings=None,
+                 frame_sampling=None, budget=None, admission_timeout=None):
+        """
+        Args:
+            path: Caminho do arquivo de imagem
+            memory_limit: Teto de memória (bytes) para manter o arquivo e
+                decodificar pixels; imagens maiores são analisadas em faixas
+            large_threshold: Número de pixels declarado a partir do qual a
+                análise em faixas é usada (padrão: tiling.LARGE_IMAGE_PIXELS)
+            digest_algorithms: Algoritmos do hashlib calculados juntos, na
+                mesma leitura, quando o primeiro digest é pedido
+            preload: Se False, o arquivo nunca é lido inteiro para a memória;
+                cabeçalho e MIME são lidos direto do disco (varredura de metadados)
+            timings: StageTimings onde os tempos das etapas são registrados
+                (padrão: um novo, disponível em self.timings)
+            frame_sampling: Argumentos de frames.analyze_frames (stride,
+                sample, max_frames, keyframes) usados em arquivos com
+                vários quadros (padrão: todos os quadros, até o limite)
+            budget: admission.PixelBudget compartilhado pelas análises
+                simultâneas; antes de decodificar os pixels, o custo
+                estimado pelo cabeçalho é reservado nele até release()
+            admission_timeout: Espera máxima (segundos) por espaço no
+                orçamento; depois disso a decodificação levanta
+                admission.AdmissionTimeout
+        """
+        self.path = path
+        self.memory_limit = memory_limit
+        self.large_threshold = large_threshold
+        self.digest_algorithms = tuple(digest_algorithms)
+        self.preload = preload
+        self.timings = timings if timings is not None else StageTimings()
+        self.frame_sampling = dict(frame_sampling or {})
+        self.budget = budget
+        self.admission_timeout = admission_timeout
+        # Um lock para os atributos baratos (cabeçalho, EXIF, MIME, bytes) e
+        # um para cada trabalho pesado, para que uma decodificação não
+        # bloqueie as etapas que só precisam do cabeçalho. Ordem de
+        # aquisição: reduce -> tiled/decode -> admit -> digest -> _lock
+        self._lock = threading.RLock()
+        self._digest_lock = threading.RLock()
+        self._tiled_lock = threading.RLock()
+        self._decode_lock = threading.RLock()
+        self._reduce_lock = threading.RLock()
+        self._admit_lock = threading.RLock()
+        self._stat = None
+        self._data = None
+        self._image = None
+        self._exif = None
+        self._exif_loaded = False
+        self._decoded = None
+        self._pixels = None
+        self._mime_type = None
+        self._mime_loaded = False
+        self._digests = {}
+        self._reduced = {}
+        self._tiled = None
+        self._admitted = None
+
+    @classmethod
+    def of(cls, source):
+        """Retorna source se já for um contexto, senão cria um para o caminho"""
+        if isinstance(source, cls):
+            return source
+        return cls(source)
+
+    @property
+    def filename(self):
+        """Nome do arquivo sem o diretório"""
+        return os.path.basename(self.path)
+
+    @property
+    def stat(self):
+        """Resultado de os.stat, obtido uma única vez"""
+        with self._lock:
+            if self._stat is None:
+                self._stat = os.stat(self.path)
+            return self._stat
+
+    @property
+    def data(self):
+        """Conteúdo completo do arquivo, lido do disco uma única vez"""
+        with self._lock:
+            if self._data is None:
+                with self.timings.measure('read'), open(self.path, 'rb') as f:
+                    self._data = f.read()
+            return self._data
+
+    @property
+    def buffered(self):
+        """Indica se o arquivo é (ou pode ser) mantido inteiro em memória"""
+        if self._data is not None:
+            return True
+        return self.preload and self.stat.st_size <= self.memory_limit // 2
+
+    def digest(self, algorithm='md5'):
+        """Digest hexadecimal do conteúdo do arquivo, calculado uma única vez por algoritmo"""
+        return self.digests((algorithm,))[algorithm]
+
+    def digests(self, algorithms=None):
+        """
+        Digests hexadecimais do conteúdo do arquivo.
+
+        Os algoritmos que faltam (junto com os de digest_algorithms) são
+        calculados em uma única leitura; os bytes lidos ficam em memória
+        para a decodificação quando o arquivo cabe no teto de memória.
+
+        Returns:
+            Dicionário algoritmo -> digest hexadecimal
+        """
+        if algorithms is None:
+            algorithms = self.digest_algorithms
+        with self._digest_lock:
+            missing = [name for name in algorithms if name not in self._digests]
+            if missing:
+                missing += [name for name in self.digest_algorithms
+                            if name not in self._digests and name not in missing]
+                if self.buffered:
+                    data = self.data
+                    with self.timings.measure('digest'):
+                        self._digests.update(hashing.digest_bytes(data, missing))
+                else:
+                    # Arquivo grande demais para a memória: leitura em blocos
+                    with self.timings.measure('digest'):
+                        self._digests.update(hashing.digest_file(self.path, missing))
+            return {name: self._digests[name] for name in algorithms}
+
+    def open(self):
+        """
+        Abre uma nova instância PIL, sobre os bytes em memória quando o
+        arquivo cabe no teto de memória, ou sobre o caminho caso contrário.
+        """
+        if self.buffered:
+            return Image.open(io.BytesIO(self.data))
+        return Image.open(self.path)
+
+    @property
+    def image(self):
+        """Imagem PIL apenas com o cabeçalho lido (formato, modo, dimensões e info)"""
+        with self._lock:
+            if self._image is None:
+                with self.timings.measure('header'):
+                    self._image = self.open()
+            return self._image
+
+    @property
+    def exif(self):
+        """Dicionário EXIF bruto da imagem, ou None se não houver"""
+        with self._lock:
+            if not self._exif_loaded:
+                image = self.image
+                if hasattr(image, '_getexif'):
+                    with self.timings.measure('exif'):
+                        self._exif = image._getexif()
+                self._exif_loaded = True
+            return self._exif
+
+    @property
+    def mime_type(self):
+        """Tipo MIME detectado pelo python-magic, ou None se indisponível"""
+        with self._lock:
+            if not self._mime_loaded:
+                if self.buffered:
+                    head = self.data
+                else:
+                    with open(self.path, 'rb') as f:
+                        head = f.read(READ_CHUNK_SIZE)
+                with self.timings.measure('mime'):
+                    self._mime_type = _detect_mime(head)
+                self._mime_loaded = True
+            return self._mime_type
+
+    @property
+    def is_large(self):
+        """Indica se a imagem deve ser analisada em faixas (pixels declarados no cabeçalho)"""
+        if tiling is None:
+            return False
+        threshold = self.large_threshold or tiling.LARGE_IMAGE_PIXELS
+        return tiling.needs_tiling(self.image, threshold)
+
+    @property
+    def decode_cost(self):
+        """
+        Memória estimada (bytes) para decodificar e analisar os pixels,
+        a partir do cabeçalho; imagens grandes que podem ser lidas em
+        faixas (ver tiling.can_stream) ficam limitadas ao teto de memória.
+
+        Em arquivos com vários quadros, a análise quadro a quadro
+        decodifica um quadro de cada vez enquanto o primeiro ainda está
+        em memória, então o custo de um quadro (estimado pelo primeiro)
+        é somado.
+        """
+        if self.is_large and tiling.can_stream(self.image, self.memory_limit):
+            cost = self.memory_limit
+        else:
+            cost = admission.estimate_decode_bytes(self.image)
+        if tiling is not None:
+            # Instância própria: verificar os quadros move o cabeçalho compartilhado
+            with self.open() as image:
+                if getattr(image, 'is_animated', False):
+                    cost *= 2
+        return cost
+
+    def admit(self):
+        """
+        Reserva decode_cost no orçamento de memória, uma única vez.
+
+        Chamado antes de qualquer decodificação de pixels; sem orçamento,
+        não faz nada. A reserva é devolvida em release().
+
+        Raises:
+            admission.AdmissionTimeout: se admission_timeout acabar antes
+        """
+        if self.budget is None:
+            return
+        with self._admit_lock:
+            if self._admitted is None:
+                cost = self.decode_cost
+                with self.timings.measure('admission'):
+                    reserved = self.budget.acquire(cost, self.admission_timeout)
+                if reserved is None:
+                    raise admission.AdmissionTimeout(
+                        "Tempo esgotado aguardando memória para decodificar a imagem")
+                self._admitted = reserved
+
+    @property
+    def tiled(self):
+        """
+        Estatísticas e miniatura agregadas em faixas.
+
+        A memória fica limitada a memory_limit só nos formatos que podem
+        ser lidos em faixas (ver tiling.can_stream); nos demais a imagem é
+        decodificada por inteiro e o resultado traz bounded=False. Ver
+        tiling.analyze_strips.
+        """
+        with self._tiled_lock:
+            if self._tiled is None:
+                if tiling is None:
+                    raise RuntimeError("NumPy não instalado")
+                self.admit()
+                with self.timings.measure('tiling'):
+                    self._tiled = tiling.analyze_strips(self.path, self.memory_limit)
+            return self._tiled
+
+    @property
+    def decoded(self):
+        """
+        Imagem RGB totalmente decodificada, compartilhada entre as etapas.
+
+        Deve ser tratada como somente leitura.
+        """
+        with self._decode_lock:
+            if self._decoded is None:
+                self.admit()
+                image = self.open()
+                with self.timings.measure('decode'):
+                    image.load()
+                    if image.mode != 'RGB':
+                        image = image.convert('RGB')
+                self._decoded = image
+            return self._decoded
+
+    @property
+    def pixels(self):
+        """Matriz NumPy (altura x largura x 3, RGB) dos pixels decodificados"""
+        with self._decode_lock:
+            if self._pixels is None:
+                if np is None:
+                    raise RuntimeError("NumPy não instalado")
+                self._pixels = np.asarray(self.decoded)
+            return self._pixels
+
+    def reduced(self, size):
+        """
+        Imagem RGB decodificada em resolução reduzida, com o menor lado
+        igual ou pouco maior que size (sem ampliar imagens menores).
+
+        Para JPEG usa o modo draft, que decodifica direto em 1/2, 1/4 ou
+        1/8 da resolução; para os demais formatos, Image.reduce. Se a
+        imagem completa (ou uma redução maior) já tiver sido decodificada,
+        ela é reaproveitada.
+        """
+        with self._reduce_lock:
+            if size in self._reduced:
+                return self._reduced[size]
+
+            larger = [key for key in self._reduced if key > size]
+            if larger:
+                image = self._reduced[min(larger)]
+            elif self._decoded is not None:
+                image = self._decoded
+            elif self.is_large and self.image.format != 'JPEG':
+                # Sem decodificar o raster inteiro: miniatura agregada em faixas
+                image = self.tiled['thumbnail']
+            else:
+                self.admit()
+                image = self.open()
+                # Só tem efeito em JPEG: a escala é escolhida no carregamento
+                image.draft('RGB', (size, size))
+
+            with self.timings.measure('reduce'):
+                if image.mode not in REDUCIBLE_MODES:
+                    image = image.convert('RGB')
+                factor = min(image.width // size, image.height // size)
+                if factor >= 2:
+                    image = image.reduce(factor)
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                image.load()
+
+            self._reduced[size] = image
+            return image
+
+    def release(self):
+        """Libera os bytes e pixels mantidos em memória"""
+        with self._reduce_lock, self._tiled_lock, self._decode_lock, self._admit_lock, \
+                self._digest_lock, self._lock:
+            if self._image is not None:
+                self._image.close()
+            self._data = None
+            self._image = None
+            self._decoded = None
+            self._pixels = None
+            self._reduced = {}
+            self._tiled = None
+            if self._admitted is not None:
+                self.budget.release(self._admitted)
+                self._admitted = None
@@ -0,0 +1,438 @@
+"""
+Motor de análise de imagens independente da interface gráfica.
+
+Cada função de análise recebe o caminho de uma imagem (ou um
+ImageContext já criado) e devolve um dicionário com resultados
+estruturados, prontos para serem formatados pela interface Tkinter
+ou serializados em JSON pelo modo em lote.
+
+Quando as etapas recebem o mesmo ImageContext, o arquivo é lido
+uma única vez e os pixels decodificados no máximo uma vez.
+"""
+import sys
+from datetime import datetime
+from numbers import Rational
+
+from PIL import Image
+from PIL.ExifTags import TAGS, GPSTAGS, IFD
+
+from . import context
+from .context import ImageContext
+
+# Importações opcionais com tratamento de erro
+if context.magic is None:
+    print("python-magic não instalado. Algumas funcionalidades podem estar indisponíveis.",
+          file=sys.stderr)
+
+if context.np is None:
+    print("NumPy não instalado. Algumas análises avançadas e os hashes perceptuais "
+          "estarão indisponíveis.", file=sys.stderr)
+    stats = None
+    perceptual = None
+    frames = None
+else:
+    from . import stats
+    from . import perceptual
+    from . import frames
+
+# Versão do formato dos resultados; deve ser incrementada sempre que a
+# saída de alguma etapa mudar, pois faz parte da chave do cache
+ANALYZER_VERSION = 9
+
+# O BLIP redimensiona a entrada para 384x384; não adianta decodificar mais que isso
+CAPTION_INPUT_SIZE = 384
+# Os hashes perceptuais usam miniaturas de até 64x64; 64 pixels no menor lado bastam
+PHASH_INPUT_SIZE = 64
+
+# Formatos em que getexif decodifica a imagem se o EXIF não vier antes dos pixels
+EXIF_AFTER_PIXELS = ('PNG',)
+
+# Tipo NumPy das amostras de cada modo do Pillow (os demais modos usam uint8)
+MODE_DTYPES = {
+    '1': 'bool',
+    'I': 'int32',
+    'F': 'float32',
+    'I;16': 'uint16',
+    'I;16L': 'uint16',
+    'I;16B': 'uint16',
+    'I;16N': 'uint16',
+}
+
+
+def mode_layout(mode):
+    """Número de canais e tipo NumPy das amostras de um modo do Pillow"""
+    return Image.getmodebands(mode), MODE_DTYPES.get(mode, 'uint8')
+
+
+def to_json_safe(value):
+    """
+    Converte valores vindos do Pillow (EXIF, image.info) em tipos serializáveis.
+
+    Bytes viram hexadecimal, racionais viram float e tuplas viram listas,
+    seguindo a mesma convenção usada na exibição das abas.
+    """
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, Rational):
+        try:
+            return float(value)
+        except (ZeroDivisionError, ValueError):
+            return None
+    if isinstance(value, dict):
+        return {str(k): to_json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(v) for v in value]
+    return str(value)
+
+
+def file_info(stats):
+    """Extrai as informações do sistema de arquivos de um resultado de os.stat"""
+    return {
+        'size': stats.st_size,
+        'created': stats.st_ctime,
+        'modified': stats.st_mtime,
+        'accessed': stats.st_atime,
+    }
+
+
+def format_specific_info(image):
+    """Retorna as informações específicas dos formatos JPEG e PNG"""
+    if image.format == 'JPEG':
+        return {
+            'subsampling': to_json_safe(image.info.get('subsampling')),
+            'quality': to_json_safe(image.info.get('quality')),
+        }
+    if image.format == 'PNG':
+        return {
+            'compression': to_json_safe(image.info.get('compression')),
+            'transparency': 'transparency' in image.info,
+        }
+    return {}
+
+
+def analyze_image_content(source, captioner):
+    """Analisa o conteúdo da imagem usando IA"""
+    if captioner is None:
+        raise RuntimeError("Modelo de IA não carregado")
+    ctx = ImageContext.of(source)
+    image = ctx.reduced(CAPTION_INPUT_SIZE)
+    with ctx.timings.measure('caption'):
+        result = captioner(image)
+    return result[0]['generated_text']
+
+
+def calculate_hashes(source):
+    """
+    Calcula diferentes tipos de hashes da imagem.
+
+    O MD5 e os demais digests configurados no contexto
+    (ImageContext.digest_algorithms) saem de uma única leitura do arquivo.
+    Os hashes perceptuais (ver perceptual.ALGORITHMS) saem todos da mesma
+    redução da imagem; 'perceptual_hash' é o hash médio, usado pelo
+    índice de quase-duplicatas.
+    """
+    ctx = ImageContext.of(source)
+    algorithms = ('md5',) + tuple(name for name in ctx.digest_algorithms if name != 'md5')
+    hashes = dict.fromkeys(algorithms)
+    hashes['perceptual_hash'] = None
+    hashes['perceptual'] = None
+
+    # Digests criptográficos
+    try:
+        hashes.update(ctx.digests(algorithms))
+    except Exception as e:
+        print(f"Erro ao calcular digests: {e}", file=sys.stderr)
+
+    # Hashes perceptuais
+    if perceptual:
+        try:
+            image = ctx.reduced(PHASH_INPUT_SIZE)
+            with ctx.timings.measure('phash'):
+                hashes['perceptual'] = perceptual.hash_image(image)
+            hashes['perceptual_hash'] = hashes['perceptual']['ahash']
+        except Exception as e:
+            print(f"Erro ao calcular hash perceptual: {e}", file=sys.stderr)
+
+    return hashes
+
+
+def get_image_description(source):
+    """Gera as características gerais da imagem (tipo, formato, proporção...)"""
+    ctx = ImageContext.of(source)
+    img = ctx.image
+
+    width, height = img.size
+    if width > height:
+        orientation = 'landscape'
+    elif width < height:
+        orientation = 'portrait'
+    else:
+        orientation = 'square'
+
+    return {
+        'mime_type': ctx.mime_type,
+        'format': img.format,
+        'mode': img.mode,
+        'width': width,
+        'height': height,
+        'ratio': width / height,
+        'orientation': orientation,
+    }
+
+
+def analyze_initial(source, captioner=None, defer_caption=False):
+    """
+    Realiza a análise inicial da imagem.
+
+    Args:
+        source: Caminho da imagem ou ImageContext
+        captioner: Pipeline image-to-text (ou CaptionModelLoader) usado para
+            descrever o conteúdo. Quando None, a legenda é registrada como erro.
+        defer_caption: Se True, a legenda fica pendente (caption e
+            caption_error None) para ser gerada depois com
+            analyze_image_content, sem atrasar o restante da análise
+    """
+    ctx = ImageContext.of(source)
+    result = {
+        'filename': ctx.filename,
+        'analyzed_at': datetime.now().isoformat(timespec='seconds'),
+        'caption': None,
+        'caption_error': None,
+        'description': None,
+        'description_error': None,
+    }
+
+    # Descrição da imagem
+    try:
+        result['description'] = get_image_description(ctx)
+    except Exception as e:
+        result['description_error'] = str(e)
+
+    # Com legenda, a redução maior é decodificada primeiro para que o
+    # hash perceptual seja derivado dela, sem uma segunda decodificação
+    if captioner is not None or defer_caption:
+        try:
+            ctx.reduced(CAPTION_INPUT_SIZE)
+        except Exception:
+            pass
+
+    result['hashes'] = calculate_hashes(ctx)
+    result['file'] = file_info(ctx.stat)
+
+    if defer_caption:
+        return result
+
+    # Análise de conteúdo com IA (por último: pode esperar o modelo carregar)
+    try:
+        result['caption'] = analyze_image_content(ctx, captioner)
+    except Exception as e:
+        result['caption_error'] = str(e)
+
+    return result
+
+
+def analyze_basic_info(source):
+    """Analisa as informações básicas da imagem"""
+    ctx = ImageContext.of(source)
+    image = ctx.image
+    return {
+        'filename': ctx.filename,
+        'size': list(image.size),
+        'format': image.format,
+        'mode': image.mode,
+        'file_size': ctx.stat.st_size,
+        'format_info': format_specific_info(image),
+    }
+
+
+def analyze_advanced_tags(source):
+    """Analisa as tags avançadas (EXIF) da imagem"""
+    ctx = ImageContext.of(source)
+    result = {'exif_supported': hasattr(ctx.image, '_getexif'), 'exif': {}}
+
+    exif = ctx.exif
+    if exif:
+        for tag_id, data in exif.items():
+            tag = TAGS.get(tag_id, tag_id)
+            result['exif'][str(tag)] = to_json_safe(data)
+    return result
+
+
+def analyze_metadata(source):
+    """Analisa os metadados detalhados da imagem"""
+    ctx = ImageContext.of(source)
+    image = ctx.image
+
+    result = {
+        'file': file_info(ctx.stat),
+        'image': {
+            'format_description': getattr(image, 'format_description', image.format),
+            'mode': image.mode,
+            'palette': bool(image.palette),
+            'size': list(image.size),
+        },
+        'format_info': {str(k): to_json_safe(v) for k, v in image.info.items()},
+        'pixels': None,
+        'pixels_error': None,
+        'pixel_stats': None,
+        'tiled': None,
+    }
+
+    # Informações dos pixels decodificados (se NumPy disponível)
+    if stats is not None:
+        try:
+            if ctx.is_large:
+                # Imagem gigante: estatísticas agregadas em faixas, com teto de memória
+                tiled = ctx.tiled
+                pixel_stats = tiled['stats']
+                result['tiled'] = {
+                    key: tiled[key] for key in ('method', 'scale', 'bounded', 'strip_rows')
+                }
+            else:
+                pixels = ctx.pixels
+                with ctx.timings.measure('pixel_stats'):
+                    gray = context.np.asarray(ctx.decoded.convert('L'))
+                    pixel_stats = stats.compute_pixel_stats(pixels, gray)
+
+            # Canais e tipo do arquivo, não da cópia RGB usada nas estatísticas
+            channel_count, dtype = mode_layout(image.mode)
+            channels = pixel_stats['channels']
+            result['pixels'] = {
+                'channels': channel_count,
+                'dtype': dtype,
+                'shape': [image.height, image.width],
+                # Análise de cores (na ordem BGR, como no OpenCV)
+                'mean_bgr': [channels[name]['mean'] for name in ('B', 'G', 'R')]
+                if 'B' in channels else None,
+            }
+            result['pixel_stats'] = pixel_stats
+        except Exception as px_err:
+            result['pixels_error'] = str(px_err)
+
+    return result
+
+
+def analyze_frames(source):
+    """
+    Analisa os quadros de TIFF de várias páginas e de imagens animadas.
+
+    A amostragem vem de ImageContext.frame_sampling; ver
+    frames.analyze_frames.
+
+    Returns:
+        Resumo por quadro e agregado do arquivo, ou None se a imagem
+        tiver um único quadro ou se o NumPy não estiver disponível
+    """
+    if frames is None:
+        return None
+    ctx = ImageContext.of(source)
+    return frames.analyze_frames(ctx, **ctx.frame_sampling)
+
+
+def header_exif(image):
+    """
+    EXIF disponível sem decodificar os pixels, via getexif.
+
+    Inclui as tags do IFD Exif (como _getexif) e as de GPS agrupadas em
+    'GPSInfo'. Para PNG, só o EXIF que aparece antes dos dados de imagem.
+    """
+    if image.format in EXIF_AFTER_PIXELS and 'exif' not in image.info:
+        return {}
+    exif = image.getexif()
+    tags = {str(TAGS.get(tag_id, tag_id)): to_json_safe(value) for tag_id, value in exif.items()}
+    for tag_id, value in exif.get_ifd(IFD.Exif).items():
+        tags[str(TAGS.get(tag_id, tag_id))] = to_json_safe(value)
+    gps = exif.get_ifd(IFD.GPSInfo)
+    if gps:
+        tags['GPSInfo'] = {str(GPSTAGS.get(tag_id, tag_id)): to_json_safe(value)
+                           for tag_id, value in gps.items()}
+    return tags
+
+
+def scan_metadata(source):
+    """
+    Varredura rápida de metadados: lê apenas o cabeçalho, nunca os pixels.
+
+    Args:
+        source: Caminho da imagem ou ImageContext. Para um caminho, o
+            arquivo não é carregado inteiro em memória.
+
+    Returns:
+        Dicionário com formato, modo, dimensões, image.info (sem o EXIF
+        bruto, já decodificado em 'exif'), EXIF, tipo MIME e dados do arquivo
+    """
+    owned = not isinstance(source, ImageContext)
+    ctx = source if not owned else ImageContext(source, preload=False)
+    try:
+        image = ctx.image
+        return {
+            'path': ctx.path,
+            'filename': ctx.filename,
+            'file': file_info(ctx.stat),
+            'mime_type': ctx.mime_type,
+            'format': image.format,
+            'format_description': getattr(image, 'format_description', image.format),
+            'mode': image.mode,
+            'size': list(image.size),
+            'info': {str(k): to_json_safe(v) for k, v in image.info.items() if k != 'exif'},
+            'exif': header_exif(image),
+        }
+    finally:
+        if owned:
+            ctx.release()
+
+
+def analyze_file(source, captioner=None):
+    """
+    Executa todas as análises sobre um arquivo, compartilhando um único contexto.
+
+    Erros de uma etapa não interrompem as demais; são registrados
+    na chave 'errors' do resultado, indexados pelo nome da etapa. Os
+    tempos de cada etapa (ver timing.StageTimings) ficam em 'timings'.
+    """
+    owned = not isinstance(source, ImageContext)
+    ctx = ImageContext.of(source)
+    result = {'path': ctx.path, 'errors': {}}
+    stages = (
+        ('initial', lambda: analyze_initial(ctx, captioner)),
+        ('basic_info', lambda: analyze_basic_info(ctx)),
+        ('advanced_tags', lambda: analyze_advanced_tags(ctx)),
+        ('metadata', lambda: analyze_metadata(ctx)),
+        ('frames', lambda: analyze_frames(ctx)),
+    )
+    try:
+        with ctx.timings.measure('total'):
+            for name, stage in stages:
+                try:
+                    with ctx.timings.measure(name):
+                        result[name] = stage()
+                except Exception as e:
+                    result[name] = None
+                    result['errors'][name] = str(e)
+        result['timings'] = ctx.timings.as_dict()
+    finally:
+        if owned:
+            ctx.release()
+    return result
+
+
+def update_file_fields(result, source):
+    """
+    Atualiza num resultado as informações que dependem do caminho do arquivo.
+
+    Usado quando um resultado é reaproveitado (por exemplo, do cache) para
+    um arquivo com o mesmo conteúdo, mas outro nome ou outras datas.
+    """
+    ctx = ImageContext.of(source)
+    stats = file_info(ctx.stat)
+    result['path'] = ctx.path
+    if result.get('initial'):
+        result['initial']['filename'] = ctx.filename
+        result['initial']['file'] = stats
+    if result.get('basic_info'):
+        result['basic_info']['filename'] = ctx.filename
+    if result.get('metadata'):
+        result['metadata']['file'] = stats
+    return result
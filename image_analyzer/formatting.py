@@ -0,0 +1,235 @@
+"""
+Formatação dos resultados do motor de análise para exibição nas abas.
+
+Recebe os dicionários produzidos por image_analyzer.engine e monta
+os textos exibidos nos ScrolledText da interface.
+"""
+from datetime import datetime
+
+ORIENTATIONS = {
+    'landscape': "Paisagem",
+    'portrait': "Retrato",
+    'square': "Quadrada",
+}
+
+
+def _format_file_info(info, file_stats, labels):
+    """Adiciona as linhas de tamanho e datas do arquivo"""
+    info.append(f"Tamanho: {file_stats['size']/1024:.2f} KB")
+    for key, label in labels:
+        info.append(f"{label}: {datetime.fromtimestamp(file_stats[key])}")
+
+
+def format_description(description):
+    """Formata as características gerais da imagem"""
+    mime_type = description['mime_type'] or "Não disponível"
+    lines = [
+        f"Tipo de arquivo: {mime_type}",
+        f"Formato: {description['format']}",
+        f"Modo de cor: {description['mode']}",
+        f"Dimensões: {description['width']}x{description['height']} pixels",
+        f"Proporção: {description['ratio']:.2f}",
+        f"Orientação: {ORIENTATIONS[description['orientation']]}",
+    ]
+    return "\n".join(lines)
+
+
+def format_initial(result):
+    """Formata o resultado da análise inicial"""
+    info = []
+    info.append("=== ANÁLISE INICIAL ===\n")
+
+    # Data e hora da análise
+    analyzed_at = datetime.fromisoformat(result['analyzed_at'])
+    info.append(f"Data/Hora da análise: {analyzed_at.strftime('%d/%m/%Y %H:%M:%S')}\n")
+
+    # Nome do arquivo
+    info.append(f"Nome do arquivo: {result['filename']}\n")
+
+    # Análise de conteúdo com IA
+    info.append("CONTEÚDO DA IMAGEM:")
+    if result['caption_error'] is not None:
+        info.append(f"Erro na análise de conteúdo: {result['caption_error']}\n")
+    elif result['caption'] is None:
+        info.append("Gerando legenda...\n")
+    else:
+        info.append(f"{result['caption']}\n")
+
+    # Descrição da imagem
+    info.append("CARACTERÍSTICAS DA IMAGEM:")
+    if result['description_error'] is not None:
+        info.append(f"Erro ao gerar descrição: {result['description_error']}\n")
+    else:
+        info.append(f"{format_description(result['description'])}\n")
+
+    # Hashes
+    hashes = result['hashes']
+    info.append("HASHES:")
+    info.append(f"MD5: {hashes['md5']}")
+    for name, value in hashes.items():
+        if name not in ('md5', 'perceptual_hash', 'perceptual'):
+            info.append(f"{name.upper()}: {value}")
+    info.append(f"Hash Perceptual: {hashes['perceptual_hash']}")
+    for name, value in (hashes.get('perceptual') or {}).items():
+        info.append(f"  {name}: {value}")
+    info.append("")
+
+    # Informações do sistema de arquivos
+    info.append("INFORMAÇÕES DO ARQUIVO:")
+    _format_file_info(info, result['file'], (
+        ('created', "Criado em"),
+        ('modified', "Modificado em"),
+        ('accessed', "Último acesso"),
+    ))
+
+    return "\n".join(info)
+
+
+def format_basic_info(result):
+    """Formata as informações básicas da imagem"""
+    info = []
+    info.append("=== INFORMAÇÕES BÁSICAS ===\n")
+    info.append(f"Nome do arquivo: {result['filename']}")
+    info.append(f"Dimensões: {tuple(result['size'])}")
+    info.append(f"Formato: {result['format']}")
+    info.append(f"Modo: {result['mode']}")
+    info.append(f"Tamanho do arquivo: {result['file_size']/1024:.2f} KB")
+
+    # Informações específicas do formato
+    format_info = result['format_info']
+    if result['format'] == 'JPEG':
+        info.append("\nInformações específicas JPEG:")
+        info.append(f"Subsampling: {format_info['subsampling'] if format_info['subsampling'] is not None else 'N/A'}")
+        info.append(f"Qualidade: {format_info['quality'] if format_info['quality'] is not None else 'N/A'}")
+
+    elif result['format'] == 'PNG':
+        info.append("\nInformações específicas PNG:")
+        info.append(f"Compressão: {format_info['compression'] if format_info['compression'] is not None else 'N/A'}")
+        info.append(f"Transparência: {'Sim' if format_info['transparency'] else 'Não'}")
+
+    return "\n".join(info)
+
+
+def format_advanced_tags(result):
+    """Formata as tags avançadas (EXIF) da imagem"""
+    info = []
+    info.append("=== TAGS AVANÇADAS ===\n")
+
+    if not result['exif_supported']:
+        info.append("Imagem não contém dados EXIF.")
+    elif not result['exif']:
+        info.append("Nenhuma tag EXIF encontrada.")
+    else:
+        for tag, data in result['exif'].items():
+            info.append(f"{tag}: {data}")
+
+    return "\n".join(info)
+
+
+def format_pixel_stats(pixel_stats):
+    """Formata as estatísticas de qualidade dos pixels"""
+    info = []
+    info.append("ESTATÍSTICAS DOS PIXELS:")
+    info.append(f"{'Canal':<6}{'Mín':>5}{'Máx':>5}{'Média':>9}{'Desvio':>9}{'Entropia':>10}")
+    for name, channel in pixel_stats['channels'].items():
+        info.append(
+            f"{name:<6}{channel['min']:>5}{channel['max']:>5}"
+            f"{channel['mean']:>9.2f}{channel['std']:>9.2f}{channel['entropy']:>10.3f}"
+        )
+    info.append("")
+    info.append(f"Entropia (luminância): {pixel_stats['entropy']:.3f} bits")
+    info.append(f"Nitidez (variância do Laplaciano): {pixel_stats['sharpness']:.2f}")
+    info.append(f"Sombras recortadas: {pixel_stats['clipping']['shadows']:.2f}%")
+    info.append(f"Altas luzes recortadas: {pixel_stats['clipping']['highlights']:.2f}%")
+    return "\n".join(info)
+
+
+def format_metadata(result):
+    """Formata os metadados detalhados da imagem"""
+    info = []
+    info.append("=== METADADOS DETALHADOS ===\n")
+
+    # Informações do sistema de arquivos
+    info.append("INFORMAÇÕES DO SISTEMA DE ARQUIVOS:")
+    _format_file_info(info, result['file'], (
+        ('created', "Data de criação"),
+        ('modified', "Última modificação"),
+        ('accessed', "Último acesso"),
+    ))
+    info.append("")
+
+    # Informações da imagem
+    image = result['image']
+    info.append("INFORMAÇÕES DA IMAGEM:")
+    info.append(f"Formato: {image['format_description']}")
+    info.append(f"Modo de cor: {image['mode']}")
+    info.append(f"Paleta: {'Sim' if image['palette'] else 'Não'}")
+    info.append(f"Dimensões: {tuple(image['size'])}")
+    info.append("")
+
+    # Informações específicas do formato
+    info.append("INFORMAÇÕES ESPECÍFICAS DO FORMATO:")
+    for key, value in result['format_info'].items():
+        info.append(f"{key}: {value}")
+
+    # Informações dos pixels decodificados (se disponível)
+    pixels = result['pixels']
+    if pixels is not None:
+        info.append("\nINFORMAÇÕES DOS PIXELS:")
+        info.append(f"Canais: {pixels['channels']}")
+        info.append(f"Profundidade: {pixels['dtype']}")
+        info.append(f"Dimensões (altura x largura): {tuple(pixels['shape'])}")
+
+        # Análise de cores
+        if pixels['mean_bgr'] is not None:
+            blue, green, red = pixels['mean_bgr']
+            info.append("\nMédia de cores (BGR):")
+            info.append(f"Azul: {blue:.2f}")
+            info.append(f"Verde: {green:.2f}")
+            info.append(f"Vermelho: {red:.2f}")
+
+        tiled = result.get('tiled')
+        if tiled is not None:
+            info.append("")
+            info.append(f"Análise em faixas: {tiled['strip_rows']} linhas por faixa ({tiled['method']})")
+            if tiled['scale'] != 1:
+                info.append(f"Estatísticas aproximadas em escala {tiled['scale']:.3f}")
+            if not tiled['bounded']:
+                info.append("Aviso: formato sem leitura em faixas; a decodificação excedeu o teto de memória")
+
+        pixel_stats = result.get('pixel_stats')
+        if pixel_stats is not None:
+            info.append("")
+            info.append(format_pixel_stats(pixel_stats))
+    elif result['pixels_error'] is not None:
+        info.append(f"\nErro ao obter informações dos pixels: {result['pixels_error']}")
+
+    return "\n".join(info)
+
+
+def format_timings(timings, model_load=None):
+    """
+    Formata os tempos por etapa (ver timing.StageTimings).
+
+    Args:
+        timings: Dicionário etapa -> medições
+        model_load: Tempo (segundos) de carregamento do modelo de IA, se conhecido
+    """
+    info = []
+    info.append("=== DESEMPENHO DA ANÁLISE ===\n")
+    if model_load is not None:
+        info.append(f"Carregamento do modelo de IA: {model_load * 1000:.1f} ms\n")
+
+    info.append(f"{'Etapa':<16}{'Relógio':>12}{'CPU':>12}{'Aumento RSS':>12}{'Pico alocado':>14}")
+    for name, stage in sorted(timings.items(), key=lambda item: -item[1]['wall']):
+        rss = stage.get('rss_growth')
+        traced = stage.get('peak_traced')
+        rss = f"{rss / 1024 ** 2:.1f} MB" if rss is not None else "-"
+        traced = f"{traced / 1024 ** 2:.1f} MB" if traced is not None else "-"
+        label = name if stage['calls'] == 1 else f"{name} ({stage['calls']}x)"
+        info.append(
+            f"{label:<16}{stage['wall'] * 1000:>9.1f} ms{stage['cpu'] * 1000:>9.1f} ms"
+            f"{rss:>12}{traced:>14}"
+        )
+    info.append("\nMemória (do processo) só é medida em etapas sem outras concorrentes; \"-\" indica ausente")
+    return "\n".join(info)
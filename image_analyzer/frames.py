@@ -0,0 +1,251 @@
+"""
+Análise quadro a quadro de TIFF de várias páginas e GIF/WebP/PNG animados.
+
+As demais etapas enxergam só o primeiro quadro. Aqui os quadros são
+percorridos sob demanda, um de cada vez, em uma instância PIL própria
+(o cabeçalho compartilhado do ImageContext não é movido): cada quadro
+é decodificado, resumido (hashes perceptuais e estatísticas de pixels)
+e descartado antes do próximo, então a memória fica limitada a um
+quadro mesmo com centenas de páginas. Quadros grandes (ver
+ImageContext.is_large) que podem ser lidos em faixas, como as páginas
+TIFF sem compressão, são percorridos com tiling.StripSource e nem um
+quadro inteiro chega a ser decodificado.
+
+A amostragem escolhe quais quadros analisar: a cada stride quadros,
+sample quadros espaçados igualmente, apenas os quadros-chave (que
+redesenham a tela inteira) e um máximo de max_frames quadros.
+"""
+import numpy as np
+
+from . import perceptual, stats, tiling
+from .context import ImageContext
+
+# Amostragem padrão: todos os quadros, até este limite
+DEFAULT_MAX_FRAMES = 1000
+# Lado menor da redução usada nos hashes perceptuais de cada quadro
+FRAME_HASH_SIZE = 64
+# Maior lado da miniatura usada nos hashes dos quadros lidos em faixas
+FRAME_THUMBNAIL_SIZE = 2 * FRAME_HASH_SIZE
+# Desvio padrão da luminância abaixo do qual o quadro é considerado em branco
+BLANK_STD = 2.0
+
+
+def frame_count(image):
+    """Número de quadros (páginas) declarado pela imagem"""
+    return getattr(image, 'n_frames', 1)
+
+
+def sampling_indexes(count, stride=1, sample=None, max_frames=None):
+    """
+    Índices dos quadros a analisar, em ordem crescente.
+
+    Args:
+        count: Número de quadros do arquivo
+        stride: Analisa um quadro a cada stride
+        sample: Se informado, escolhe até sample quadros espaçados
+            igualmente entre os selecionados pelo stride
+        max_frames: Número máximo de índices (os primeiros)
+    """
+    indexes = np.arange(0, count, max(1, stride))
+    if sample is not None and sample < len(indexes):
+        positions = np.linspace(0, len(indexes) - 1, max(1, sample)).round().astype(int)
+        indexes = indexes[np.unique(positions)]
+    if max_frames is not None:
+        indexes = indexes[:max_frames]
+    return indexes.tolist()
+
+
+def is_keyframe(image, index):
+    """
+    Indica se o quadro atual redesenha a tela inteira.
+
+    Em GIF e PNG animado, quadros intermediários costumam atualizar só
+    uma região; as páginas de TIFF e os quadros de WebP (entregues já
+    compostos pelo decodificador) são sempre completos.
+    """
+    if index == 0 or not image.tile:
+        return True
+    extent = image.tile[0][1]
+    return tuple(extent) == (0, 0) + image.size
+
+
+def _select(image, stride, sample, max_frames, keyframes):
+    """Posiciona a instância PIL em cada quadro selecionado e gera o seu índice"""
+    indexes = sampling_indexes(frame_count(image), stride, sample,
+                               None if keyframes else max_frames)
+    yielded = 0
+    for index in indexes:
+        # A busca é sequencial em GIF (o Pillow compõe os quadros
+        # intermediários), mas só o quadro atual fica em memória
+        image.seek(index)
+        if keyframes and not is_keyframe(image, index):
+            continue
+        yield index
+        yielded += 1
+        if keyframes and max_frames is not None and yielded >= max_frames:
+            break
+
+
+def _frames(image, timings, stride, sample, max_frames, keyframes):
+    """Gera os quadros selecionados de uma instância PIL já aberta (ver iter_frames)"""
+    for index in _select(image, stride, sample, max_frames, keyframes):
+        with timings.measure('frame_decode'):
+            frame = image.convert('RGB')
+        yield index, frame, image.info.get('duration')
+
+
+def iter_frames(source, stride=1, sample=None, max_frames=DEFAULT_MAX_FRAMES, keyframes=False):
+    """
+    Gera os quadros selecionados, um de cada vez.
+
+    Cada quadro é entregue como uma imagem RGB independente, que pode
+    ser descartada antes de pedir o próximo.
+
+    Args:
+        source: Caminho da imagem ou ImageContext
+        stride, sample, max_frames: Amostragem (ver sampling_indexes)
+        keyframes: Se True, ignora os quadros que não são quadros-chave
+
+    Yields:
+        Tuplas (índice, imagem RGB do quadro, duração em ms ou None)
+    """
+    ctx = ImageContext.of(source)
+    ctx.admit()
+    with ctx.open() as image:
+        yield from _frames(image, ctx.timings, stride, sample, max_frames, keyframes)
+
+
+def _frame_summary(size, accumulator, small):
+    """Resumo de um quadro a partir do acumulador e de uma versão reduzida (para os hashes)"""
+    pixel_stats = accumulator.result()
+    luminance = pixel_stats['luminance']
+    channels = pixel_stats['channels']
+    return {
+        'size': list(size),
+        'hashes': perceptual.hash_image(small),
+        'luminance_mean': luminance['mean'],
+        'luminance_std': luminance['std'],
+        'entropy': pixel_stats['entropy'],
+        'sharpness': pixel_stats['sharpness'],
+        'mean_rgb': [channels[name]['mean'] for name in ('R', 'G', 'B')],
+        'blank': luminance['std'] < BLANK_STD,
+    }
+
+
+def analyze_frame(frame):
+    """
+    Resumo de um quadro: hashes perceptuais e estatísticas de pixels.
+
+    Returns:
+        Tupla (resumo, acumulador): o resumo tem dimensões, hashes, média
+        e desvio da luminância, entropia, nitidez e médias RGB; o
+        acumulador de estatísticas pode ser somado ao de outros quadros
+    """
+    accumulator = stats.accumulate_pixel_stats(np.asarray(frame), np.asarray(frame.convert('L')))
+    small = frame
+    factor = min(frame.width // FRAME_HASH_SIZE, frame.height // FRAME_HASH_SIZE)
+    if factor >= 2:
+        small = frame.reduce(factor)
+    return _frame_summary(frame.size, accumulator, small), accumulator
+
+
+def analyze_frame_strips(source):
+    """
+    Resumo de um quadro lido em faixas, sem decodificá-lo por inteiro.
+
+    Args:
+        source: tiling.StripSource posicionado no quadro
+
+    Returns:
+        Tupla (resumo, acumulador), como em analyze_frame
+    """
+    accumulator, thumbnail = tiling.accumulate_strips(source, channels=3,
+                                                      thumbnail_size=FRAME_THUMBNAIL_SIZE)
+    return _frame_summary(source.source_size, accumulator, thumbnail.image()), accumulator
+
+
+def _range(values):
+    """Mínimo, máximo e média de uma lista de números"""
+    if not values:
+        return None
+    return {'min': min(values), 'max': max(values), 'mean': sum(values) / len(values)}
+
+
+def summarize_frames(frames, count, accumulator=None):
+    """
+    Agrega os resumos dos quadros em um resumo do arquivo.
+
+    Args:
+        frames: Resumos de analyze_frame, com 'index' e 'duration'
+        count: Número total de quadros do arquivo
+        accumulator: Soma dos acumuladores dos quadros (opcional); vira
+            'pixel_stats', as estatísticas de todos os quadros juntos
+    """
+    durations = [frame['duration'] for frame in frames if frame['duration'] is not None]
+    summary = {
+        'frame_count': count,
+        'analyzed': len(frames),
+        'duration_ms': sum(durations) if durations else None,
+        'sizes': sorted({tuple(frame['size']) for frame in frames}),
+        'unique_ahash': len({frame['hashes']['ahash'] for frame in frames}),
+        'blank_frames': [frame['index'] for frame in frames if frame['blank']],
+        'luminance': _range([frame['luminance_mean'] for frame in frames]),
+        'entropy': _range([frame['entropy'] for frame in frames]),
+        'sharpness': _range([frame['sharpness'] for frame in frames]),
+    }
+    if accumulator is not None:
+        pixel_stats = accumulator.result()
+        pixel_stats.pop('histograms')
+        summary['pixel_stats'] = pixel_stats
+    return summary
+
+
+def analyze_frames(source, stride=1, sample=None, max_frames=DEFAULT_MAX_FRAMES, keyframes=False):
+    """
+    Analisa os quadros selecionados de um arquivo e agrega os resultados.
+
+    Só um quadro decodificado fica em memória por vez, e os quadros
+    grandes que podem ser lidos em faixas ficam dentro de memory_limit;
+    o que sobra de cada um é o resumo e o acumulador de estatísticas,
+    somado ao total.
+
+    Args:
+        source: Caminho da imagem ou ImageContext
+        stride, sample, max_frames, keyframes: Amostragem (ver iter_frames)
+
+    Returns:
+        Dicionário com a amostragem usada, o resumo de cada quadro
+        analisado e o resumo agregado do arquivo, ou None se o arquivo
+        tiver um único quadro (já coberto pelas demais etapas)
+    """
+    ctx = ImageContext.of(source)
+    frames = []
+    total = stats.PixelStatsAccumulator(3)
+    with ctx.open() as image:
+        count = frame_count(image)
+        if count < 2:
+            return None
+        ctx.admit()
+        threshold = ctx.large_threshold or tiling.LARGE_IMAGE_PIXELS
+        for index in _select(image, stride, sample, max_frames, keyframes):
+            duration = image.info.get('duration')
+            if tiling.needs_tiling(image, threshold) and tiling.can_stream(image, ctx.memory_limit):
+                with ctx.timings.measure('frame_stats'):
+                    source = tiling.StripSource(ctx.path, ctx.memory_limit, frame=index)
+                    summary, accumulator = analyze_frame_strips(source)
+            else:
+                with ctx.timings.measure('frame_decode'):
+                    frame = image.convert('RGB')
+                with ctx.timings.measure('frame_stats'):
+                    summary, accumulator = analyze_frame(frame)
+                frame.close()
+            total.merge(accumulator)
+            summary['index'] = index
+            summary['duration'] = duration
+            frames.append(summary)
+    return {
+        'sampling': {'stride': stride, 'sample': sample, 'max_frames': max_frames,
+                     'keyframes': keyframes},
+        'frames': frames,
+        'summary': summarize_frames(frames, count, total),
+    }
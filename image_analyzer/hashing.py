@@ -0,0 +1,90 @@
+"""
+Cálculo de vários digests criptográficos em uma única leitura.
+
+Todos os algoritmos pedidos são alimentados com os mesmos blocos de
+dados. Para arquivos grandes, cada algoritmo roda em sua própria thread
+(o hashlib libera o GIL em blocos grandes) e a leitura do próximo bloco
+acontece enquanto o anterior é processado, com dois buffers alternados.
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ALGORITHMS = ('md5', 'sha256', 'blake2b')
+# Tamanho de cada bloco lido do disco
+BUFFER_SIZE = 8 * 1024 * 1024
+# Abaixo deste tamanho, o custo das threads não compensa
+THREADED_MIN_SIZE = 16 * 1024 * 1024
+
+
+def _new_hashers(algorithms):
+    return {name: hashlib.new(name) for name in algorithms}
+
+
+def _update_all(hashers, chunk, executor):
+    """Atualiza todos os digests com o mesmo bloco (em paralelo se houver executor)"""
+    if executor is None:
+        for hasher in hashers.values():
+            hasher.update(chunk)
+        return
+    futures = [executor.submit(hasher.update, chunk) for hasher in hashers.values()]
+    for future in futures:
+        future.result()
+
+
+def digest_bytes(data, algorithms=DEFAULT_ALGORITHMS):
+    """
+    Calcula os digests de um buffer já em memória.
+
+    Returns:
+        Dicionário algoritmo -> digest hexadecimal
+    """
+    hashers = _new_hashers(algorithms)
+    if len(hashers) > 1 and len(data) >= THREADED_MIN_SIZE:
+        with ThreadPoolExecutor(len(hashers), thread_name_prefix="digest") as executor:
+            _update_all(hashers, memoryview(data), executor)
+    else:
+        _update_all(hashers, data, None)
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+def digest_file(path, algorithms=DEFAULT_ALGORITHMS, buffer_size=BUFFER_SIZE):
+    """
+    Calcula os digests de um arquivo com uma única leitura em blocos grandes.
+
+    Em arquivos grandes, o bloco seguinte é lido enquanto as threads
+    processam o bloco atual.
+
+    Returns:
+        Dicionário algoritmo -> digest hexadecimal
+    """
+    hashers = _new_hashers(algorithms)
+    buffers = [bytearray(buffer_size), bytearray(buffer_size)]
+
+    with open(path, 'rb', buffering=0) as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        threaded = len(hashers) > 1 and size >= THREADED_MIN_SIZE
+        executor = ThreadPoolExecutor(len(hashers), thread_name_prefix="digest") if threaded else None
+        try:
+            pending = []
+            index = 0
+            while True:
+                buffer = buffers[index % 2]
+                count = f.readinto(buffer)
+                # O bloco anterior precisa terminar antes de o seu buffer ser reutilizado
+                for future in pending:
+                    future.result()
+                if not count:
+                    break
+                chunk = memoryview(buffer)[:count]
+                if executor is None:
+                    _update_all(hashers, chunk, None)
+                    pending = []
+                else:
+                    pending = [executor.submit(hasher.update, chunk) for hasher in hashers.values()]
+                index += 1
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
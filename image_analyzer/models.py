@@ -0,0 +1,230 @@
+"""
+Carregamento do modelo de IA usado para descrever o conteúdo das imagens.
+
+A importação de transformers (e, por consequência, torch) é feita apenas
+dentro das funções, para que quem não precisa de legendas não pague o
+custo de carregá-los. CaptionModelLoader aquece o pipeline em uma thread
+de fundo; somente a etapa de legenda espera o modelo ficar pronto.
+
+O modo rápido para CPU (fast=True) quantiza as camadas lineares do BLIP
+para int8 (quantização dinâmica), executa a inferência em
+torch.inference_mode e, se pedido e instalado, exporta o modelo para o
+ONNX Runtime. O número de threads do PyTorch pode ser fixado para não
+disputar CPU com outros processos.
+"""
+import sys
+import time
+import threading
+from concurrent.futures import Future
+
+CAPTION_MODEL = "Salesforce/blip-image-captioning-base"
+
+# Runtimes alternativos aceitos em create_captioner(runtime=...)
+RUNTIMES = ('onnx',)
+
+
+def configure_threads(threads=None, interop_threads=None):
+    """
+    Fixa o número de threads do PyTorch neste processo.
+
+    Args:
+        threads: Threads usadas dentro de cada operação (intra-op)
+        interop_threads: Threads usadas entre operações independentes (inter-op);
+            só pode ser definido antes da primeira operação paralela
+    """
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            print(f"Não foi possível ajustar as threads inter-op: {e}", file=sys.stderr)
+
+
+def quantize_linear(model):
+    """Quantização dinâmica int8 das camadas nn.Linear (pesos int8, ativações em float)"""
+    import torch
+    try:
+        from torch.ao.quantization import quantize_dynamic
+    except ImportError:
+        from torch.quantization import quantize_dynamic
+
+    # Sem o fbgemm (x86), usa o backend para ARM
+    engines = torch.backends.quantized.supported_engines
+    if 'fbgemm' not in engines and 'qnnpack' in engines:
+        torch.backends.quantized.engine = 'qnnpack'
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class InferenceModePipeline:
+    """Executa o pipeline dentro de torch.inference_mode (sem registro de autograd)"""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def __call__(self, *args, **kwargs):
+        import torch
+
+        with torch.inference_mode():
+            return self.pipeline(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+
+def _runtime_pipeline(model, max_new_tokens, runtime):
+    """
+    Pipeline sobre um runtime alternativo, ou None se ele não estiver
+    instalado ou não suportar o modelo.
+    """
+    from transformers import pipeline
+
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Runtime desconhecido: {runtime}")
+    try:
+        from optimum.onnxruntime import ORTModelForVision2Seq
+    except ImportError:
+        print("optimum[onnxruntime] não instalado; usando o PyTorch.", file=sys.stderr)
+        return None
+    try:
+        exported = ORTModelForVision2Seq.from_pretrained(model, export=True)
+        return pipeline(
+            task="image-to-text",
+            model=exported,
+            tokenizer=model,
+            image_processor=model,
+            max_new_tokens=max_new_tokens
+        )
+    except Exception as e:
+        print(f"Falha ao exportar {model} para {runtime}: {e}; usando o PyTorch.", file=sys.stderr)
+        return None
+
+
+def create_captioner(model=CAPTION_MODEL, max_new_tokens=50, fast=False,
+                     threads=None, interop_threads=None, runtime=None):
+    """
+    Cria o pipeline image-to-text do BLIP.
+
+    Args:
+        model: Identificador do modelo no Hugging Face Hub
+        max_new_tokens: Tamanho máximo da legenda gerada
+        fast: Modo rápido para CPU: camadas lineares em int8 e inferência
+            em torch.inference_mode
+        threads: Threads intra-op do PyTorch (padrão: as do PyTorch)
+        interop_threads: Threads inter-op do PyTorch
+        runtime: 'onnx' para exportar ao ONNX Runtime, se instalado
+            (se falhar, segue com o PyTorch)
+    """
+    from transformers import pipeline
+
+    if threads or interop_threads:
+        configure_threads(threads, interop_threads)
+
+    if runtime is not None:
+        captioner = _runtime_pipeline(model, max_new_tokens, runtime)
+        if captioner is not None:
+            return captioner
+
+    captioner = pipeline(
+        task="image-to-text",
+        model=model,
+        max_new_tokens=max_new_tokens
+    )
+    if not fast:
+        return captioner
+
+    captioner.model = quantize_linear(captioner.model.eval())
+    return InferenceModePipeline(captioner)
+
+
+def captioner_id(model=CAPTION_MODEL, fast=False, runtime=None):
+    """
+    Identificador da configuração do modelo, usado na chave do cache:
+    legendas quantizadas ou de outro runtime podem diferir das em fp32.
+    """
+    if runtime is not None:
+        return f"{model}+{runtime}"
+    if fast:
+        return f"{model}+int8"
+    return model
+
+
+class CaptionModelLoader:
+    """
+    Carrega o pipeline de legendas em segundo plano.
+
+    A instância pode ser usada diretamente como captioner: a chamada
+    espera o modelo ficar pronto e repassa a imagem ao pipeline.
+    Com enabled=False o modelo nunca é carregado e qualquer chamada
+    falha imediatamente.
+    """
+
+    def __init__(self, model=CAPTION_MODEL, max_new_tokens=50, enabled=True, factory=None,
+                 options=None):
+        """
+        Args:
+            model: Identificador do modelo no Hugging Face Hub
+            max_new_tokens: Tamanho máximo da legenda gerada
+            enabled: Se False, o modelo nunca é carregado
+            factory: Função que cria o pipeline (padrão: create_captioner)
+            options: Argumentos extras da factory (fast, threads,
+                interop_threads, runtime)
+        """
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.options = options or {}
+        self.enabled = enabled
+        self.factory = factory or create_captioner
+        self.future = Future()
+        # Duração do carregamento (segundos), conhecida depois que ele termina
+        self.load_seconds = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Inicia o carregamento em uma thread de fundo (apenas na primeira chamada)"""
+        with self._lock:
+            if self._thread is not None or not self.enabled:
+                return self.future
+            self._thread = threading.Thread(target=self._load, name="caption-model-loader")
+            self._thread.daemon = True
+            self._thread.start()
+        return self.future
+
+    def _load(self):
+        """Carrega o modelo e resolve o future de prontidão"""
+        if not self.future.set_running_or_notify_cancel():
+            return
+        try:
+            print("Carregando modelo de IA em segundo plano...", file=sys.stderr)
+            start = time.perf_counter()
+            captioner = self.factory(model=self.model, max_new_tokens=self.max_new_tokens,
+                                     **self.options)
+            self.load_seconds = time.perf_counter() - start
+            print(f"Modelo de IA carregado com sucesso em {self.load_seconds:.1f} s!", file=sys.stderr)
+            self.future.set_result(captioner)
+        except BaseException as e:
+            print(f"Erro ao carregar modelo: {e}", file=sys.stderr)
+            self.future.set_exception(e)
+
+    @property
+    def ready(self):
+        """Indica se o modelo já terminou de carregar com sucesso"""
+        return self.future.done() and self.future.exception() is None
+
+    def get(self, timeout=None):
+        """
+        Retorna o pipeline, esperando o carregamento terminar.
+
+        Inicia o carregamento se ainda não tiver sido iniciado.
+        """
+        if not self.enabled:
+            raise RuntimeError("Modelo de IA desativado")
+        self.start()
+        return self.future.result(timeout)
+
+    def __call__(self, image):
+        """Gera a legenda de uma imagem (espera o modelo, se necessário)"""
+        return self.get()(image)
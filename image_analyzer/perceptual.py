@@ -0,0 +1,197 @@
+"""
+Hashes perceptuais vetorizados com NumPy.
+
+Os cinco hashes (médio, de diferença, DCT, wavelet e de cor) são
+derivados de uma única redução da imagem: ela é convertida uma vez para
+tons de cinza, e as miniaturas de cada algoritmo (8x8, 8x9, 32x32 e
+64x64) saem dessa conversão. O cálculo dos bits é feito sobre pilhas
+de miniaturas, de modo que N imagens custam algumas operações NumPy
+em vez de N chamadas ao imagehash.
+
+Os resultados são compatíveis com o imagehash (mesmas strings
+hexadecimais): average_hash, dhash e phash com os parâmetros padrão,
+whash com image_scale=64 e colorhash calculado sobre uma miniatura
+64x64.
+"""
+import numpy as np
+from PIL import Image
+
+ALGORITHMS = ('ahash', 'dhash', 'phash', 'whash', 'colorhash')
+
+HASH_SIZE = 8
+# O pHash aplica a DCT em 32x32 e mantém as 8x8 frequências mais baixas
+PHASH_SIZE = HASH_SIZE * 4
+# Escala do wHash e lado da miniatura usada no hash de cor
+WHASH_SIZE = 64
+COLOR_SIZE = 64
+COLOR_BITS = 3
+
+
+def _dct_matrix(size, rows):
+    """Primeiras rows linhas da matriz da DCT-II (sem normalização) de tamanho size"""
+    k = np.arange(rows)[:, np.newaxis]
+    n = np.arange(size)[np.newaxis, :]
+    return 2 * np.cos(np.pi * k * (2 * n + 1) / (2 * size))
+
+
+_DCT = _dct_matrix(PHASH_SIZE, HASH_SIZE)
+# Limites das 6 faixas de matiz do hash de cor (como no imagehash)
+_HUE_BINS = np.linspace(0, 255, 6 + 1)
+
+
+def prepare(image):
+    """
+    Miniaturas usadas pelos hashes, todas a partir de uma única conversão.
+
+    Args:
+        image: Imagem PIL (de preferência já reduzida, ver ImageContext.reduced)
+
+    Returns:
+        Dicionário de arrays uint8: 'ahash' (8x8), 'dhash' (8x9),
+        'phash' (32x32), 'whash' (64x64) e 'color' (64x64x3, HSV) mais
+        'intensity' (64x64, tons de cinza da miniatura colorida)
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    gray = image.convert('L')
+    color = image.resize((COLOR_SIZE, COLOR_SIZE), Image.LANCZOS)
+    return {
+        'ahash': np.asarray(gray.resize((HASH_SIZE, HASH_SIZE), Image.LANCZOS)),
+        'dhash': np.asarray(gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)),
+        'phash': np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS)),
+        'whash': np.asarray(gray.resize((WHASH_SIZE, WHASH_SIZE), Image.LANCZOS)),
+        'color': np.asarray(color.convert('HSV')),
+        'intensity': np.asarray(color.convert('L')),
+    }
+
+
+def stack(prepared):
+    """Empilha as miniaturas de várias imagens (saídas de prepare) em arrays (N, ...)"""
+    return {key: np.stack([item[key] for item in prepared]) for key in prepared[0]}
+
+
+def _above_median(values):
+    """Bits das posições acima da mediana de cada imagem; values tem forma (N, h, w)"""
+    flat = values.reshape(len(values), -1)
+    return flat > np.median(flat, axis=1, keepdims=True)
+
+
+def average_bits(pixels):
+    """aHash: pixels da miniatura 8x8 acima da média"""
+    flat = pixels.reshape(len(pixels), -1).astype(np.float64)
+    return flat > flat.mean(axis=1, keepdims=True)
+
+
+def difference_bits(pixels):
+    """dHash: cada pixel da miniatura 8x9 comparado com o vizinho à esquerda"""
+    pixels = pixels.astype(np.int16)
+    return (pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(len(pixels), -1)
+
+
+def dct_bits(pixels):
+    """pHash: frequências 8x8 mais baixas da DCT 2D acima da mediana"""
+    low = _DCT @ pixels.astype(np.float64) @ _DCT.T
+    # Coeficientes nulos em imagens com padrões regulares não podem
+    # depender do erro de arredondamento do produto de matrizes
+    return _above_median(np.round(low, 6))
+
+
+def wavelet_bits(pixels):
+    """
+    wHash (Haar): médias dos blocos da miniatura acima da mediana.
+
+    O coeficiente LL da transformada de Haar no nível k é proporcional
+    à média de cada bloco 2^k x 2^k, e remover o LL do nível máximo só
+    subtrai a média global; nenhum dos dois muda a comparação com a
+    mediana, então a transformada não precisa ser calculada.
+    """
+    n, size = len(pixels), pixels.shape[1]
+    block = size // HASH_SIZE
+    means = pixels.reshape(n, HASH_SIZE, block, HASH_SIZE, block).mean(axis=(2, 4))
+    return _above_median(means)
+
+
+def color_bits(hsv, intensity, binbits=COLOR_BITS):
+    """
+    Hash de cor: frações de pixels pretos, cinzentos e de cada faixa de
+    matiz (cores fracas e fortes), com binbits bits por fração.
+    """
+    n = len(hsv)
+    hue = hsv[..., 0].reshape(n, -1)
+    saturation = hsv[..., 1].reshape(n, -1)
+    intensity = intensity.reshape(n, -1)
+
+    black = intensity < 256 // 8
+    gray = saturation < 256 // 3
+    colors = ~black & ~gray
+    faint = colors & (saturation < 256 * 2 // 3)
+    bright = colors & (saturation > 256 * 2 // 3)
+
+    # Faixa de matiz de cada pixel; a última faixa inclui o limite superior
+    bins = np.clip(np.searchsorted(_HUE_BINS, hue, side='right') - 1, 0, 5)
+    counts = np.stack([
+        ((bins == b) & mask).sum(axis=1)
+        for mask in (faint, bright) for b in range(6)
+    ], axis=1)
+
+    maxvalue = 2 ** binbits
+    total = np.maximum(1, colors.sum(axis=1))[:, np.newaxis]
+    values = np.concatenate([
+        (black.mean(axis=1) * maxvalue).astype(np.int64)[:, np.newaxis],
+        ((~black & gray).mean(axis=1) * maxvalue).astype(np.int64)[:, np.newaxis],
+        (counts * maxvalue / total).astype(np.int64),
+    ], axis=1)
+    values = np.minimum(maxvalue - 1, values)[:, :, np.newaxis]
+    # Mesma codificação do imagehash: o bit i é (v >> (binbits-1-i)) % 2^(binbits-i) > 0
+    shifts = np.arange(binbits - 1, -1, -1)
+    return (((values >> shifts) % (2 << shifts)) > 0).reshape(n, -1)
+
+
+def bits_to_hex(bits):
+    """Converte uma linha de bits na string hexadecimal do imagehash"""
+    width = -(-len(bits) // 4)
+    padding = -len(bits) % 8
+    value = int.from_bytes(np.packbits(bits).tobytes(), 'big') >> padding
+    return f"{value:0{width}x}"
+
+
+def hash_arrays(arrays, algorithms=ALGORITHMS):
+    """
+    Calcula os bits dos hashes sobre miniaturas empilhadas (ver stack).
+
+    Returns:
+        Dicionário algoritmo -> array booleano (N, bits)
+    """
+    compute = {
+        'ahash': lambda: average_bits(arrays['ahash']),
+        'dhash': lambda: difference_bits(arrays['dhash']),
+        'phash': lambda: dct_bits(arrays['phash']),
+        'whash': lambda: wavelet_bits(arrays['whash']),
+        'colorhash': lambda: color_bits(arrays['color'], arrays['intensity']),
+    }
+    return {name: compute[name]() for name in algorithms}
+
+
+def hash_images(images, algorithms=ALGORITHMS):
+    """
+    Calcula os hashes perceptuais de várias imagens de uma vez.
+
+    Args:
+        images: Imagens PIL (de preferência já reduzidas)
+        algorithms: Algoritmos a calcular (subconjunto de ALGORITHMS)
+
+    Returns:
+        Lista (na ordem das imagens) de dicionários algoritmo -> hash hexadecimal
+    """
+    if not images:
+        return []
+    bits = hash_arrays(stack([prepare(image) for image in images]), algorithms)
+    return [
+        {name: bits_to_hex(bits[name][i]) for name in algorithms}
+        for i in range(len(images))
+    ]
+
+
+def hash_image(image, algorithms=ALGORITHMS):
+    """Hashes perceptuais de uma imagem (ver hash_images)"""
+    return hash_images([image], algorithms)[0]
@@ -0,0 +1,236 @@
+"""
+Índice persistente de hashes perceptuais para busca de quase-duplicatas.
+
+Usa multi-index hashing: cada hash de 64 bits é dividido em 4 faixas
+de 16 bits, indexadas separadamente no SQLite. Pelo princípio da casa
+dos pombos, duas imagens a distância de Hamming até k têm pelo menos
+uma faixa a distância até k // 4; basta então consultar as faixas
+vizinhas e verificar a distância completa só dos candidatos.
+
+Uso:
+    python -m image_analyzer.phash_index indice.db query imagem.jpg -k 6
+    python -m image_analyzer.phash_index indice.db duplicates -k 4
+"""
+import os
+import sys
+import sqlite3
+import argparse
+import threading
+from itertools import combinations
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    key TEXT PRIMARY KEY,
+    hash INTEGER NOT NULL,
+    b0 INTEGER NOT NULL,
+    b1 INTEGER NOT NULL,
+    b2 INTEGER NOT NULL,
+    b3 INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS hashes_b0 ON hashes (b0);
+CREATE INDEX IF NOT EXISTS hashes_b1 ON hashes (b1);
+CREATE INDEX IF NOT EXISTS hashes_b2 ON hashes (b2);
+CREATE INDEX IF NOT EXISTS hashes_b3 ON hashes (b3);
+"""
+
+
+def hash_to_int(value):
+    """Converte um hash perceptual (string hexadecimal ou ImageHash) em inteiro de 64 bits"""
+    if isinstance(value, int):
+        return value
+    return int(str(value), 16)
+
+
+def int_to_hash(value):
+    """Converte um inteiro de 64 bits na string hexadecimal usada pelo imagehash"""
+    return f"{value:016x}"
+
+
+def hamming(a, b):
+    """Distância de Hamming entre dois hashes inteiros"""
+    return bin(a ^ b).count("1")
+
+
+def _to_signed(value):
+    """O SQLite armazena inteiros de 64 bits com sinal"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def _split(value):
+    """Divide o hash nas faixas de BAND_BITS bits"""
+    return [(value >> (i * BAND_BITS)) & BAND_MASK for i in range(BANDS)]
+
+
+def _neighbors(band, radius):
+    """Gera todos os valores de uma faixa a distância de Hamming até radius"""
+    values = [band]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), distance):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+class PerceptualHashIndex:
+    """
+    Índice SQLite de hashes perceptuais de 64 bits.
+
+    As chaves costumam ser caminhos de arquivo ou digests do conteúdo;
+    inserir de novo uma chave existente atualiza o hash dela.
+    """
+
+    def __init__(self, path=":memory:"):
+        """
+        Args:
+            path: Arquivo do banco SQLite (padrão: em memória)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    @staticmethod
+    def _row(key, phash):
+        value = hash_to_int(phash)
+        return (key, _to_signed(value), *_split(value))
+
+    def add(self, key, phash):
+        """Insere ou atualiza o hash de uma chave"""
+        self.add_many([(key, phash)])
+
+    def add_many(self, items):
+        """Insere ou atualiza vários pares (chave, hash) em uma única transação"""
+        rows = [self._row(key, phash) for key, phash in items]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hashes (key, hash, b0, b1, b2, b3) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def remove(self, key):
+        """Remove uma chave do índice"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM hashes WHERE key = ?", (key,))
+
+    def get(self, key):
+        """Retorna o hash (inteiro) de uma chave, ou None"""
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM hashes WHERE key = ?", (key,)).fetchone()
+        return _to_unsigned(row[0]) if row else None
+
+    def search(self, phash, max_distance):
+        """
+        Busca todas as chaves a distância de Hamming até max_distance.
+
+        Returns:
+            Lista de tuplas (chave, distância) ordenada pela distância
+        """
+        query = hash_to_int(phash)
+        radius = max_distance // BANDS
+        candidates = {}
+        with self._lock:
+            for i, band in enumerate(_split(query)):
+                values = _neighbors(band, radius)
+                # Limite de parâmetros do SQLite: consulta em blocos
+                for start in range(0, len(values), 500):
+                    block = values[start:start + 500]
+                    placeholders = ",".join("?" * len(block))
+                    rows = self._conn.execute(
+                        f"SELECT key, hash FROM hashes WHERE b{i} IN ({placeholders})", block
+                    )
+                    for key, value in rows:
+                        candidates[key] = _to_unsigned(value)
+
+        matches = []
+        for key, value in candidates.items():
+            distance = hamming(query, value)
+            if distance <= max_distance:
+                matches.append((key, distance))
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+    def duplicates(self, max_distance):
+        """
+        Gera os pares de chaves quase-duplicadas (chave_a, chave_b, distância).
+
+        Cada par é gerado uma única vez, com chave_a < chave_b.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, hash FROM hashes ORDER BY key").fetchall()
+        for key, value in rows:
+            for other, distance in self.search(_to_unsigned(value), max_distance):
+                if other > key:
+                    yield key, other, distance
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.phash_index",
+        description="Consulta o índice de hashes perceptuais."
+    )
+    parser.add_argument("database", help="Banco SQLite do índice")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    query = commands.add_parser("query", help="Busca imagens parecidas com uma imagem ou hash")
+    query.add_argument("target", help="Caminho da imagem ou hash hexadecimal")
+    query.add_argument("-k", "--distance", type=int, default=6,
+                       help="Distância de Hamming máxima")
+
+    duplicates = commands.add_parser("duplicates", help="Lista os pares de quase-duplicatas")
+    duplicates.add_argument("-k", "--distance", type=int, default=4,
+                            help="Distância de Hamming máxima")
+    return parser
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+
+    with PerceptualHashIndex(args.database) as index:
+        if args.command == "query":
+            if os.path.exists(args.target):
+                from .engine import calculate_hashes
+                target = calculate_hashes(args.target)['perceptual_hash']
+                if target is None:
+                    print(f"Não foi possível calcular o hash de {args.target}", file=sys.stderr)
+                    return 1
+            else:
+                target = args.target
+            for key, distance in index.search(target, args.distance):
+                print(f"{distance}\t{key}")
+        else:
+            for key, other, distance in index.duplicates(args.distance):
+                print(f"{distance}\t{key}\t{other}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Pirâmide de pré-visualizações para exibição da imagem na interface.
+
+A imagem é decodificada uma única vez, já reduzida (modo draft do
+JPEG quando possível), e mantida em memória em vários níveis de
+resolução. Cada pré-visualização é gerada a partir do menor nível que
+ainda cobre o tamanho pedido, em vez de reabrir o arquivo original.
+"""
+from PIL import Image
+
+# Maior lado do nível base da pirâmide (suficiente para telas comuns)
+MAX_PREVIEW_SIZE = 2048
+# Menor lado abaixo do qual não se gera mais níveis
+MIN_LEVEL_SIZE = 64
+
+
+class PreviewPyramid:
+    """
+    Níveis de resolução decrescente de uma imagem, do base (até
+    MAX_PREVIEW_SIZE) até MIN_LEVEL_SIZE, cada um com metade do anterior.
+    """
+
+    def __init__(self, path, max_size=MAX_PREVIEW_SIZE):
+        """
+        Args:
+            path: Caminho da imagem
+            max_size: Maior lado do nível base
+        """
+        image = Image.open(path)
+        self.source_size = image.size
+
+        # JPEG: decodifica direto em escala reduzida (1/2, 1/4 ou 1/8)
+        image.draft('RGB', (max_size, max_size))
+        image.load()
+
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        # Demais formatos: redução inteira rápida antes do ajuste fino
+        factor = max(image.width, image.height) // max_size
+        if factor >= 2:
+            image = image.reduce(factor)
+        if max(image.size) > max_size:
+            image.thumbnail((max_size, max_size), Image.Resampling.BILINEAR)
+
+        self.levels = [image]
+        while min(self.levels[-1].size) >= 2 * MIN_LEVEL_SIZE:
+            self.levels.append(self.levels[-1].reduce(2))
+
+    def fit_size(self, width, height):
+        """Calcula as dimensões que cabem em width x height mantendo a proporção"""
+        source_width, source_height = self.source_size
+        ratio = min(width / source_width, height / source_height)
+        return max(1, int(source_width * ratio)), max(1, int(source_height * ratio))
+
+    def level_for(self, width, height):
+        """Retorna o menor nível que ainda cobre width x height"""
+        for level in reversed(self.levels):
+            if level.width >= width and level.height >= height:
+                return level
+        return self.levels[0]
+
+    def render(self, width, height, final=True):
+        """
+        Gera a pré-visualização que cabe em width x height.
+
+        Args:
+            final: Se True usa LANCZOS (alta qualidade); senão BILINEAR,
+                adequado para quadros intermediários durante o redimensionamento
+        """
+        size = self.fit_size(width, height)
+        level = self.level_for(*size)
+        if level.size == size:
+            return level
+        resample = Image.Resampling.LANCZOS if final else Image.Resampling.BILINEAR
+        return level.resize(size, resample)
@@ -0,0 +1,78 @@
+"""
+Perfil detalhado (cProfile) de uma única análise.
+
+Complementa os tempos por etapa de timing.StageTimings com o custo de
+cada função chamada.
+
+Uso:
+    python -m image_analyzer.profiling imagem.jpg -o analise.prof
+"""
+import sys
+import pstats
+import argparse
+import cProfile
+import tracemalloc
+
+from .engine import analyze_file
+from .formatting import format_timings
+
+
+def profile_call(func, *args, output=None, sort='cumulative', limit=25, **kwargs):
+    """
+    Executa func(*args, **kwargs) sob o cProfile.
+
+    Args:
+        output: Arquivo onde as estatísticas são gravadas (formato pstats);
+            se None, as limit funções mais caras são impressas na saída de erro
+        sort: Critério de ordenação do relatório impresso
+
+    Returns:
+        O retorno de func
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        if output is not None:
+            profiler.dump_stats(output)
+        else:
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats(sort).print_stats(limit)
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.profiling",
+        description="Executa uma análise completa sob o cProfile e exibe os tempos por etapa."
+    )
+    parser.add_argument("image", help="Caminho da imagem")
+    parser.add_argument("-o", "--output",
+                        help="Arquivo .prof para as estatísticas (padrão: resumo na saída de erro)")
+    parser.add_argument("--caption", action="store_true",
+                        help="Inclui a legenda (carrega o modelo de IA antes da medição)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Mede o pico de memória alocada em cada etapa com o tracemalloc")
+    return parser
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+
+    captioner = None
+    if args.caption:
+        from .models import CaptionModelLoader
+        captioner = CaptionModelLoader()
+        captioner.get()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    result = profile_call(analyze_file, args.image, captioner=captioner, output=args.output)
+    print(format_timings(result['timings']))
+    for stage, error in result['errors'].items():
+        print(f"Erro na etapa {stage}: {error}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Varredura de metadados de diretórios inteiros, sem decodificar pixels.
+
+Cada arquivo tem apenas o cabeçalho lido (formato, modo, dimensões,
+info, EXIF e tipo MIME), então a varredura é limitada pela E/S e roda
+em um pool de threads. Os caminhos são consumidos à medida que o
+diretório é percorrido e só um número limitado de arquivos fica em
+andamento, permitindo inventariar milhões de arquivos com memória
+constante.
+
+Uso:
+    python -m image_analyzer.scan /caminho/das/imagens -o inventario.jsonl -w 32
+"""
+import os
+import sys
+import json
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .engine import scan_metadata
+from .batch import iter_image_files
+
+
+def default_workers():
+    """Número padrão de threads: a varredura passa a maior parte do tempo esperando o disco"""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def _scan_path(path):
+    """Lê os metadados de um arquivo, registrando o erro em vez de propagá-lo"""
+    try:
+        return scan_metadata(path)
+    except Exception as e:
+        return {'path': path, 'error': str(e)}
+
+
+def iter_scan(paths, workers=None, max_pending=None):
+    """
+    Gera os metadados de cada caminho, na ordem recebida.
+
+    Args:
+        paths: Iterável de caminhos (pode ser um gerador preguiçoso)
+        workers: Número de threads (padrão: default_workers())
+        max_pending: Máximo de arquivos em andamento (padrão: 4 por thread)
+    """
+    workers = workers or default_workers()
+    max_pending = max_pending or workers * 4
+    with ThreadPoolExecutor(workers, thread_name_prefix="scan") as executor:
+        pending = deque()
+        for path in paths:
+            pending.append(executor.submit(_scan_path, path))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_scan(root, output, workers=None):
+    """
+    Varre um diretório e grava os metadados de cada imagem em JSON Lines.
+
+    Returns:
+        Tupla (total de arquivos, arquivos com erro)
+    """
+    total = 0
+    failed = 0
+    for result in iter_scan(iter_image_files(root), workers):
+        total += 1
+        if 'error' in result:
+            failed += 1
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return total, failed
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.scan",
+        description="Lê os metadados (sem decodificar pixels) de todas as imagens de um diretório."
+    )
+    parser.add_argument("root", help="Diretório com as imagens")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Arquivo de saída JSON Lines (padrão: saída padrão)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Número de threads (padrão: 4 por CPU, até 32)")
+    return parser
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+
+    if not os.path.isdir(args.root):
+        print(f"Diretório não encontrado: {args.root}", file=sys.stderr)
+        return 2
+
+    if args.output == "-":
+        total, failed = run_scan(args.root, sys.stdout, args.workers)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            total, failed = run_scan(args.root, output, args.workers)
+
+    print(f"{total} imagens lidas, {failed} com erros.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Execução das etapas de uma análise como um grafo de dependências.
+
+Cada etapa é submetida a um pool de threads assim que as etapas de que
+depende terminam; etapas independentes rodam em paralelo sobre o mesmo
+ImageContext, e o resultado de cada uma é entregue assim que fica
+pronto. Uma execução pode ser cancelada (por exemplo, quando outra
+imagem é selecionada): etapas ainda não iniciadas não rodam mais, e os
+resultados das que estiverem em andamento são descartados.
+"""
+import threading
+from collections import namedtuple
+
+Stage = namedtuple('Stage', ['name', 'func', 'requires'], defaults=((),))
+Stage.__doc__ = """
+Etapa do grafo.
+
+func é chamada sem argumentos; requires lista os nomes das etapas que
+precisam terminar antes (com ou sem erro), em geral porque preparam
+algo no contexto que a etapa reaproveita.
+"""
+
+
+class StageCancelled(Exception):
+    """Levantada por etapas que desistem ao perceber o cancelamento da execução"""
+
+
+def topological_order(stages):
+    """
+    Ordena as etapas de modo que cada uma venha depois das que ela requer.
+
+    Mantém a ordem original entre etapas independentes.
+
+    Raises:
+        ValueError: nomes repetidos, dependência desconhecida ou ciclo
+    """
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Etapa repetida: {stage.name}")
+        by_name[stage.name] = stage
+    for stage in stages:
+        for name in stage.requires:
+            if name not in by_name:
+                raise ValueError(f"Etapa {stage.name} requer etapa desconhecida: {name}")
+
+    order = []
+    visiting = set()
+    placed = set()
+
+    def visit(stage):
+        if stage.name in placed:
+            return
+        if stage.name in visiting:
+            raise ValueError(f"Ciclo de dependências envolvendo a etapa {stage.name}")
+        visiting.add(stage.name)
+        for name in stage.requires:
+            visit(by_name[name])
+        visiting.discard(stage.name)
+        placed.add(stage.name)
+        order.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return order
+
+
+class StageRun:
+    """
+    Uma execução do grafo de etapas.
+
+    Os callbacks são chamados nas threads do pool; a interface gráfica
+    deve repassá-los para a sua própria thread (por exemplo, com
+    root.after).
+    """
+
+    def __init__(self, stages, executor=None, on_result=None, on_finish=None):
+        """
+        Args:
+            stages: Lista de Stage
+            executor: Pool de threads (concurrent.futures); sem pool, start()
+                executa as etapas em sequência na thread atual
+            on_result: Chamada como on_result(nome, resultado, exceção) ao
+                término de cada etapa, exceto depois do cancelamento
+            on_finish: Chamada como on_finish(execução) uma única vez, quando
+                nenhuma etapa está mais em andamento (concluída ou cancelada)
+        """
+        self.stages = topological_order(stages)
+        self.executor = executor
+        self.on_result = on_result
+        self.on_finish = on_finish
+        self.results = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._waiting = {stage.name: set(stage.requires) for stage in self.stages}
+        self._dependents = {stage.name: [] for stage in self.stages}
+        for stage in self.stages:
+            for name in stage.requires:
+                self._dependents[name].append(stage)
+        self._futures = {}
+        self._active = 0
+        self._unstarted = len(self.stages)
+
+    @property
+    def cancelled(self):
+        """Indica se a execução foi cancelada"""
+        return self._cancelled.is_set()
+
+    def done(self):
+        """Indica se nenhuma etapa está mais em andamento"""
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """Espera o fim da execução; retorna False se o tempo acabar antes"""
+        return self._finished.wait(timeout)
+
+    def start(self):
+        """Inicia as etapas sem dependências (ou todas, em sequência, sem pool)"""
+        if self.executor is None:
+            for stage in self.stages:
+                if self.cancelled:
+                    break
+                with self._lock:
+                    self._unstarted -= 1
+                    self._active += 1
+                self._run(stage)
+            self._finish()
+            return self
+
+        ready = [stage for stage in self.stages if not stage.requires]
+        with self._lock:
+            self._unstarted -= len(ready)
+            self._active += len(ready)
+        for stage in ready:
+            self._submit(stage)
+        return self
+
+    def cancel(self):
+        """
+        Cancela a execução.
+
+        Etapas na fila do pool são removidas; as que já começaram vão até
+        o fim (ou até perceberem o cancelamento), mas seus resultados são
+        descartados.
+        """
+        self._cancelled.set()
+        with self._lock:
+            futures = list(self._futures.values())
+        for future in futures:
+            # O callback de término libera a etapa se ela ainda não começou
+            future.cancel()
+        self._finish()
+
+    def _submit(self, stage):
+        future = self.executor.submit(self._run, stage)
+        with self._lock:
+            self._futures[stage.name] = future
+        future.add_done_callback(lambda f: f.cancelled() and self._settle(stage))
+
+    def _run(self, stage):
+        """Executa uma etapa e libera as que dependem dela"""
+        result = error = None
+        if not self.cancelled:
+            try:
+                result = stage.func()
+            except Exception as e:
+                error = e
+        if not self.cancelled:
+            with self._lock:
+                if error is None:
+                    self.results[stage.name] = result
+                else:
+                    self.errors[stage.name] = error
+            if self.on_result is not None:
+                self.on_result(stage.name, result, error)
+        self._settle(stage)
+
+    def _settle(self, stage):
+        """Marca a etapa como encerrada e submete as dependentes que ficaram prontas"""
+        ready = []
+        with self._lock:
+            self._active -= 1
+            self._futures.pop(stage.name, None)
+            for dependent in self._dependents[stage.name]:
+                waiting = self._waiting[dependent.name]
+                waiting.discard(stage.name)
+                if not waiting and self.executor is not None and not self.cancelled:
+                    ready.append(dependent)
+            self._unstarted -= len(ready)
+            self._active += len(ready)
+        for dependent in ready:
+            self._submit(dependent)
+        self._finish()
+
+    def _finish(self):
+        """Chama on_finish (uma vez) quando não há mais etapas em andamento"""
+        with self._lock:
+            if self._active or (self._unstarted and not self.cancelled) or self._finished.is_set():
+                return
+            self._finished.set()
+        if self.on_finish is not None:
+            self.on_finish(self)
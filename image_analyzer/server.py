@@ -0,0 +1,513 @@
+"""
+Serviço HTTP local de análise (asyncio, sem dependências extras).
+
+Outros processos enviam uma imagem (corpo da requisição) ou um caminho
+local e recebem os resultados de cada etapa à medida que ficam prontos,
+em JSON Lines (uma linha por etapa). O modelo de IA é carregado uma
+única vez e compartilhado por todos os pedidos, com as legendas
+agrupadas em micro-lotes pelo CaptionService.
+
+As etapas rodam em um pool de threads de tamanho fixo. Pedidos que
+excedem a capacidade (em execução + fila) recebem 429 imediatamente.
+Cada pedido tem um prazo; ao estourar o prazo, ou se o cliente
+desconectar, as etapas restantes são descartadas e a legenda pendente
+é cancelada.
+
+Uso:
+    python -m image_analyzer.server --port 8080 --workers 4 --queue 16
+    curl --data-binary @foto.jpg http://127.0.0.1:8080/analyze
+    curl -d '{"path": "/fotos/a.jpg"}' -H 'Content-Type: application/json' \\
+        http://127.0.0.1:8080/analyze        (requer --allow-root /fotos)
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from . import engine
+from .admission import PixelBudget
+from .context import ImageContext
+from .models import RUNTIMES, CaptionModelLoader
+from .captioning import CaptionService
+
+# Etapas disponíveis, na ordem em que são executadas
+STAGES = {
+    'initial': lambda ctx, captioner: engine.analyze_initial(ctx, captioner),
+    'basic_info': lambda ctx, captioner: engine.analyze_basic_info(ctx),
+    'advanced_tags': lambda ctx, captioner: engine.analyze_advanced_tags(ctx),
+    'metadata': lambda ctx, captioner: engine.analyze_metadata(ctx),
+}
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_UPLOAD = 100 * 1024 * 1024
+# Tempo máximo para receber a linha de requisição e os cabeçalhos
+HEADER_TIMEOUT = 10.0
+# Intervalo com que uma legenda em espera verifica se o pedido foi cancelado
+CANCEL_POLL = 0.1
+# Nome do arquivo enviado quando o cliente não informa um
+DEFAULT_UPLOAD_NAME = "upload"
+# Maior nome de arquivo aceito, em bytes UTF-8 (limite comum dos sistemas de arquivos)
+MAX_FILENAME_BYTES = 255
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 429: "Too Many Requests",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """Erro que vira uma resposta HTTP com o status indicado"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class RequestCaptioner:
+    """
+    Captioner de um único pedido sobre o CaptionService compartilhado.
+
+    Desiste da legenda (cancelando o pedido ao serviço, se ainda não
+    tiver entrado em um lote) quando o pedido é cancelado.
+    """
+
+    def __init__(self, service, cancelled):
+        self.service = service
+        self.cancelled = cancelled
+
+    def __call__(self, image):
+        future = self.service.submit(image)
+        while True:
+            if self.cancelled.is_set():
+                future.cancel()
+                raise RuntimeError("Pedido cancelado")
+            try:
+                return future.result(timeout=CANCEL_POLL)
+            except FutureTimeoutError:
+                continue
+
+
+class AnalysisServer:
+    """
+    Servidor HTTP de análise.
+
+    Rotas:
+        POST /analyze  corpo com a imagem, ou JSON {"path": ...}; parâmetros
+                       opcionais (query ou JSON): stages, timeout e filename
+                       (ou cabeçalho X-Filename) para a imagem enviada
+        GET /health    estado do servidor e do modelo
+    """
+
+    def __init__(self, caption=True, workers=4, max_queue=16, timeout=DEFAULT_TIMEOUT,
+                 allowed_roots=(), max_upload=DEFAULT_MAX_UPLOAD,
+                 caption_batch_size=8, caption_max_wait=0.05, caption_options=None,
+                 memory_budget=None):
+        """
+        Args:
+            caption: Se True, carrega o modelo de IA (uma vez) em segundo plano
+            workers: Pedidos analisados ao mesmo tempo (threads do pool)
+            max_queue: Pedidos aceitos à espera de uma thread; além disso, 429
+            timeout: Prazo padrão (segundos) de cada pedido, incluindo a espera
+            allowed_roots: Diretórios cujos arquivos podem ser pedidos por caminho
+            max_upload: Tamanho máximo (bytes) de uma imagem enviada
+            caption_options: Opções do modelo de legenda (ver models.create_captioner)
+            memory_budget: Memória (bytes) para os pixels decodificados ao
+                mesmo tempo por todos os pedidos (ver admission.PixelBudget);
+                None para não limitar
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots]
+        self.max_upload = max_upload
+        self.loader = CaptionModelLoader(enabled=caption, options=caption_options)
+        self.captions = CaptionService(self.loader, caption_batch_size, caption_max_wait) if caption else None
+        self.budget = PixelBudget(memory_budget) if memory_budget else None
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="analysis")
+        self._slots = None
+        self._active = 0
+        self._server = None
+        self.served = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self):
+        """Pedidos admitidos ao mesmo tempo (em execução + na fila)"""
+        return self.workers + self.max_queue
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Começa a aceitar conexões (e a carregar o modelo)"""
+        self._slots = asyncio.Semaphore(self.workers)
+        if self.captions is not None:
+            self.loader.start()
+            self.captions.start()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def close(self):
+        """Para de aceitar conexões e libera o pool e o serviço de legendas"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.captions is not None:
+            self.captions.close(wait=False)
+
+    # HTTP
+
+    async def _read_request(self, reader):
+        """Lê a linha de requisição, os cabeçalhos e o corpo"""
+        line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, "Linha de requisição inválida")
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Content-Length inválido")
+        if length > self.max_upload:
+            raise HTTPError(413, f"Imagem maior que {self.max_upload} bytes")
+        body = await asyncio.wait_for(reader.readexactly(length), self.timeout) if length else b''
+        return method, target, headers, body
+
+    @staticmethod
+    async def _send_head(writer, status, content_type, headers=None):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                 f"Content-Type: {content_type}",
+                 "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+        await writer.drain()
+
+    async def _send_json(self, writer, status, payload, headers=None):
+        await self._send_head(writer, status, "application/json; charset=utf-8", headers)
+        writer.write(json.dumps(payload, ensure_ascii=False).encode() + b"\n")
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        """Atende uma conexão (um pedido por conexão)"""
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, target, headers, body = request
+            url = urlsplit(target)
+            if url.path == "/health":
+                if method != "GET":
+                    raise HTTPError(405, "Use GET")
+                await self._send_json(writer, 200, self.health())
+            elif url.path == "/analyze":
+                if method != "POST":
+                    raise HTTPError(405, "Use POST")
+                await self._analyze(reader, writer, url, headers, body)
+            else:
+                raise HTTPError(404, "Rota não encontrada")
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {'error': str(e)}, e.headers)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"Erro no servidor: {e}", file=sys.stderr)
+            try:
+                await self._send_json(writer, 500, {'error': str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    def health(self):
+        """Estado atual do servidor"""
+        return {
+            'status': 'ok',
+            'active': self._active,
+            'capacity': self.capacity,
+            'workers': self.workers,
+            'served': self.served,
+            'rejected': self.rejected,
+            'caption': self.captions is not None,
+            'model_ready': self.loader.ready,
+            'memory': self.budget.snapshot() if self.budget is not None else None,
+        }
+
+    # Análise
+
+    def _parse_options(self, url, headers, body):
+        """
+        Extrai a origem da imagem e as opções do pedido.
+
+        Returns:
+            Tupla (caminho local ou None, bytes enviados ou None, nome do
+            arquivo enviado, etapas, prazo)
+        """
+        query = parse_qs(url.query)
+        options = {key: values[-1] for key, values in query.items()}
+        path = None
+        data = body
+        if headers.get('content-type', '').startswith('application/json'):
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                raise HTTPError(400, "JSON inválido")
+            options.update({key: value for key, value in payload.items() if key != 'path'})
+            path = payload.get('path')
+            data = None
+            if not path:
+                raise HTTPError(400, "Informe 'path' ou envie a imagem no corpo")
+            path = self._check_path(path)
+        elif not body:
+            raise HTTPError(400, "Corpo vazio: envie a imagem ou um JSON com 'path'")
+
+        stages = options.get('stages') or list(STAGES)
+        if isinstance(stages, str):
+            stages = [stage for stage in stages.split(',') if stage]
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if unknown:
+            raise HTTPError(400, f"Etapas desconhecidas: {', '.join(unknown)}")
+        try:
+            timeout = min(float(options.get('timeout', self.timeout)), self.timeout)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "timeout inválido")
+        filename = _upload_name(options.get('filename') or headers.get('x-filename', ''))
+        return path, data, filename, stages, timeout
+
+    def _check_path(self, path):
+        """Só aceita caminhos dentro de um dos diretórios permitidos"""
+        if not self.allowed_roots:
+            raise HTTPError(403, "Análise por caminho desativada (use --allow-root)")
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([real, root]) == root for root in self.allowed_roots):
+            raise HTTPError(403, "Caminho fora dos diretórios permitidos")
+        if not os.path.isfile(real):
+            raise HTTPError(404, "Arquivo não encontrado")
+        return real
+
+    async def _analyze(self, reader, writer, url, headers, body):
+        """Admite o pedido, executa as etapas e transmite cada resultado"""
+        path, data, filename, stages, timeout = self._parse_options(url, headers, body)
+
+        # Contrapressão: além da capacidade, o pedido é recusado sem esperar
+        if self._active >= self.capacity:
+            self.rejected += 1
+            raise HTTPError(429, "Servidor ocupado, tente novamente", {'Retry-After': '1'})
+
+        self._active += 1
+        deadline = time.monotonic() + timeout
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        # Cliente desconectou: as etapas restantes são abandonadas
+        watcher = loop.create_task(self._watch_disconnect(reader, cancelled, task))
+        pending = None
+        slot = False
+        temp_path = None
+        ctx = None
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+            slot = True
+
+            if data is not None:
+                temp_path = await loop.run_in_executor(self._executor, _write_temp, data, filename)
+            ctx = ImageContext(path or temp_path, budget=self.budget,
+                               admission_timeout=max(0.0, deadline - time.monotonic()))
+            captioner = RequestCaptioner(self.captions, cancelled) if self.captions else None
+
+            await self._send_head(writer, 200, "application/x-ndjson; charset=utf-8")
+            errors = {}
+            for name in stages:
+                start = time.perf_counter()
+                pending = loop.run_in_executor(self._executor, STAGES[name], ctx, captioner)
+                try:
+                    result = await asyncio.wait_for(
+                        asyncio.shield(pending), max(0.0, deadline - time.monotonic())
+                    )
+                    line = {'stage': name, 'result': result}
+                except asyncio.TimeoutError:
+                    errors[name] = "Tempo esgotado"
+                    await self._send_line(writer, {'stage': name, 'error': errors[name]})
+                    break
+                except Exception as e:
+                    errors[name] = str(e)
+                    line = {'stage': name, 'error': str(e)}
+                pending = None
+                line['seconds'] = time.perf_counter() - start
+                await self._send_line(writer, line)
+
+            await self._send_line(writer, {
+                'stage': 'done',
+                'errors': errors,
+                'timings': ctx.timings.as_dict(),
+            })
+            self.served += 1
+        except asyncio.TimeoutError:
+            # Prazo esgotado ainda na fila
+            raise HTTPError(503, "Tempo esgotado na fila", {'Retry-After': '1'})
+        except asyncio.CancelledError:
+            # Cancelado pelo _watch_disconnect: não há a quem responder
+            if not cancelled.is_set():
+                raise
+        finally:
+            cancelled.set()
+            watcher.cancel()
+            self._active -= 1
+            release = self._release_callback(slot, temp_path, ctx)
+            # A thread não pode ser interrompida: a vaga só é devolvida quando a etapa termina
+            if pending is not None and not pending.done():
+                pending.add_done_callback(lambda _: loop.call_soon_threadsafe(release))
+            else:
+                release()
+
+    def _release_callback(self, slot, temp_path, ctx):
+        def release():
+            if ctx is not None:
+                ctx.release()
+            if slot:
+                self._slots.release()
+            if temp_path is not None:
+                try:
+                    os.unlink(temp_path)
+                    os.rmdir(os.path.dirname(temp_path))
+                except OSError:
+                    pass
+        return release
+
+    @staticmethod
+    async def _send_line(writer, payload):
+        writer.write(json.dumps(payload, ensure_ascii=False).encode() + b"\n")
+        await writer.drain()
+
+    @staticmethod
+    async def _watch_disconnect(reader, cancelled, task):
+        """Cancela o pedido se o cliente fechar a conexão"""
+        try:
+            # Bytes extras do cliente são ignorados; só o fim da conexão importa
+            while await reader.read(4096):
+                pass
+        except (ConnectionError, asyncio.CancelledError):
+            return
+        if not cancelled.is_set():
+            cancelled.set()
+            task.cancel()
+
+
+def _upload_name(name):
+    """
+    Nome seguro para gravar a imagem enviada: só o último componente do
+    caminho informado pelo cliente (com / ou \\ como separador), ou
+    DEFAULT_UPLOAD_NAME se não houver nome.
+
+    Raises:
+        HTTPError: 400 se o nome não puder ser usado como nome de arquivo
+    """
+    if not isinstance(name, str):
+        raise HTTPError(400, "filename inválido")
+    name = os.path.basename(name.replace('\\', '/'))
+    if not name:
+        return DEFAULT_UPLOAD_NAME
+    if name in ('.', '..') or '\0' in name or len(name.encode('utf-8', 'surrogatepass')) > MAX_FILENAME_BYTES:
+        raise HTTPError(400, "filename inválido")
+    return name
+
+
+def _write_temp(data, filename):
+    """Grava a imagem enviada em um diretório temporário, com o nome informado pelo cliente"""
+    path = os.path.join(tempfile.mkdtemp(prefix="image_analyzer_"), filename)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.server",
+        description="Serviço HTTP local de análise de imagens."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço de escuta")
+    parser.add_argument("--port", type=int, default=8080, help="Porta de escuta")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+                        help="Pedidos analisados ao mesmo tempo")
+    parser.add_argument("--queue", type=int, default=16,
+                        help="Pedidos à espera além dos em execução (depois disso, 429)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Prazo máximo (segundos) de cada pedido")
+    parser.add_argument("--max-upload-mb", type=float, default=DEFAULT_MAX_UPLOAD / 1024 ** 2,
+                        help="Tamanho máximo (MB) de uma imagem enviada")
+    parser.add_argument("--memory-budget", type=float, default=None,
+                        help="Memória (MB) para pixels decodificados ao mesmo tempo por todos os "
+                             "pedidos; imagens que não cabem esperam (pequenas passam à frente)")
+    parser.add_argument("--allow-root", action="append", default=[],
+                        help="Diretório cujos arquivos podem ser analisados por caminho (repetível)")
+    parser.add_argument("--no-caption", action="store_true",
+                        help="Não carrega o modelo de IA (sem legendas)")
+    parser.add_argument("--fast-cpu", action="store_true",
+                        help="Modelo de legenda quantizado em int8 (mais rápido em CPU)")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="Threads do PyTorch para a inferência")
+    parser.add_argument("--caption-runtime", choices=RUNTIMES, default=None,
+                        help="Exporta o modelo de legenda para outro runtime, se instalado")
+    parser.add_argument("--caption-batch-size", type=int, default=8,
+                        help="Número máximo de imagens por lote de legendas")
+    parser.add_argument("--caption-max-wait", type=float, default=0.05,
+                        help="Espera máxima (segundos) para completar um lote de legendas")
+    return parser
+
+
+async def serve(args):
+    """Executa o servidor até ser interrompido"""
+    server = AnalysisServer(
+        caption=not args.no_caption,
+        workers=args.workers,
+        max_queue=args.queue,
+        timeout=args.timeout,
+        allowed_roots=args.allow_root,
+        max_upload=int(args.max_upload_mb * 1024 * 1024),
+        caption_batch_size=args.caption_batch_size,
+        caption_max_wait=args.caption_max_wait,
+        memory_budget=int(args.memory_budget * 1024 * 1024) if args.memory_budget else None,
+        caption_options={
+            'fast': args.fast_cpu,
+            'threads': args.torch_threads,
+            'runtime': args.caption_runtime,
+        },
+    )
+    listener = await server.start(args.host, args.port)
+    print(f"Servindo em http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Estatísticas de pixels calculadas de forma vetorizada com NumPy.
+
+Os histogramas de cada canal são obtidos com uma única passada
+(np.bincount) sobre o buffer de pixels; mínimo, máximo, média, desvio
+padrão, entropia e recorte de exposição são derivados dos histogramas,
+sem percorrer os pixels novamente. A nitidez é a variância do
+Laplaciano da imagem em tons de cinza.
+
+O buffer é percorrido em blocos de linhas: os temporários ficam
+pequenos (e no cache do processador) e os acumuladores podem ser
+alimentados aos poucos, inclusive por leitura em faixas de arquivos
+que não cabem em memória.
+"""
+import numpy as np
+
+CHANNEL_NAMES = {
+    1: ('L',),
+    3: ('R', 'G', 'B'),
+    4: ('R', 'G', 'B', 'A'),
+}
+
+# Quantidade aproximada de pixels processados por bloco
+BLOCK_PIXELS = 1 << 20
+
+_LEVELS = np.arange(256, dtype=np.float64)
+
+
+def histogram(channel):
+    """Histograma de 256 posições de um canal uint8"""
+    return np.bincount(channel.ravel(), minlength=256)
+
+
+def histogram_stats(hist):
+    """
+    Deriva as estatísticas de um canal a partir do seu histograma.
+
+    Returns:
+        Dicionário com min, max, mean, std, entropy (bits) e os
+        percentuais de pixels recortados em 0 e em 255
+    """
+    total = hist.sum()
+    if total == 0:
+        return None
+    present = np.flatnonzero(hist)
+    probabilities = hist / total
+    mean = float((probabilities * _LEVELS).sum())
+    variance = float((probabilities * _LEVELS ** 2).sum()) - mean ** 2
+    nonzero = probabilities[present]
+    return {
+        'min': int(present[0]),
+        'max': int(present[-1]),
+        'mean': mean,
+        'std': float(np.sqrt(max(variance, 0.0))),
+        'entropy': float(-(nonzero * np.log2(nonzero)).sum()),
+        'clipped_low': float(probabilities[0] * 100),
+        'clipped_high': float(probabilities[255] * 100),
+    }
+
+
+def to_gray(pixels):
+    """
+    Luminância ITU-R 601 com a aritmética inteira do Pillow, idêntica a
+    convert('L'): (R * 19595 + G * 38470 + B * 7471 + 0x8000) >> 16
+    """
+    if pixels.ndim == 2:
+        return pixels
+    if pixels.shape[2] < 3:
+        return pixels[:, :, 0]
+    gray = np.multiply(pixels[:, :, 0], 19595, dtype=np.uint32)
+    gray += np.multiply(pixels[:, :, 1], 38470, dtype=np.uint32)
+    gray += np.multiply(pixels[:, :, 2], 7471, dtype=np.uint32)
+    gray += 0x8000
+    gray >>= 16
+    return gray.astype(np.uint8)
+
+
+class PixelStatsAccumulator:
+    """
+    Acumula histogramas e momentos do Laplaciano bloco a bloco.
+
+    Todas as estatísticas finais são deriváveis desses acumuladores,
+    então blocos de origens diferentes (faixas, ladrilhos, quadros)
+    podem ser somados sem manter os pixels em memória.
+    """
+
+    def __init__(self, channels):
+        """
+        Args:
+            channels: Número de canais das matrizes de pixels recebidas
+        """
+        self.channels = channels
+        self.names = CHANNEL_NAMES.get(channels, tuple(str(i) for i in range(channels)))
+        self.histograms = np.zeros((channels, 256), dtype=np.int64)
+        self.luminance = np.zeros(256, dtype=np.int64)
+        self.laplacian_count = 0
+        self.laplacian_sum = 0.0
+        self.laplacian_sumsq = 0.0
+
+    def add_pixels(self, pixels):
+        """Soma aos histogramas de canal um bloco (linhas x largura [x canais])"""
+        if pixels.dtype != np.uint8:
+            raise ValueError(f"Tipo de pixel não suportado: {pixels.dtype}")
+        if pixels.ndim == 2:
+            pixels = pixels[:, :, np.newaxis]
+        for index in range(self.channels):
+            self.histograms[index] += histogram(pixels[:, :, index])
+
+    def add_gray(self, gray, top_halo=0, bottom_halo=0):
+        """
+        Soma um bloco em tons de cinza ao histograma de luminância e ao Laplaciano.
+
+        Args:
+            gray: Linhas em tons de cinza (uint8)
+            top_halo: Linhas extras no topo, apenas como vizinhança do Laplaciano
+            bottom_halo: Linhas extras na base, apenas como vizinhança do Laplaciano
+        """
+        rows = gray.shape[0]
+        self.luminance += histogram(gray[top_halo:rows - bottom_halo])
+        if rows < 3 or gray.shape[1] < 3:
+            return
+        # Laplaciano de 4 vizinhos; cabe em int16 (-1020..1020)
+        g = gray.astype(np.int16)
+        laplacian = g[:-2, 1:-1] + g[2:, 1:-1] + g[1:-1, :-2] + g[1:-1, 2:]
+        laplacian -= 4 * g[1:-1, 1:-1]
+        # float64 representa exatamente as somas de um bloco (< 2**53)
+        values = laplacian.ravel().astype(np.float64)
+        self.laplacian_count += values.size
+        self.laplacian_sum += float(values.sum())
+        self.laplacian_sumsq += float(np.dot(values, values))
+
+    def merge(self, other):
+        """Soma os acumuladores de outro PixelStatsAccumulator"""
+        self.histograms += other.histograms
+        self.luminance += other.luminance
+        self.laplacian_count += other.laplacian_count
+        self.laplacian_sum += other.laplacian_sum
+        self.laplacian_sumsq += other.laplacian_sumsq
+
+    def sharpness(self):
+        """Variância do Laplaciano acumulado"""
+        if self.laplacian_count == 0:
+            return 0.0
+        mean = self.laplacian_sum / self.laplacian_count
+        return float(self.laplacian_sumsq / self.laplacian_count - mean ** 2)
+
+    def result(self):
+        """Monta o dicionário final de estatísticas"""
+        result = {'channels': {}, 'histograms': {}}
+        for name, hist in zip(self.names, self.histograms):
+            result['histograms'][name] = hist.tolist()
+            result['channels'][name] = histogram_stats(hist)
+
+        luminance = histogram_stats(self.luminance)
+        result['histograms']['luminance'] = self.luminance.tolist()
+        result['luminance'] = luminance
+        result['entropy'] = luminance['entropy'] if luminance else 0.0
+        result['sharpness'] = self.sharpness()
+        result['clipping'] = {
+            'shadows': luminance['clipped_low'] if luminance else 0.0,
+            'highlights': luminance['clipped_high'] if luminance else 0.0,
+        }
+        return result
+
+
+def accumulate_pixel_stats(pixels, gray=None, accumulator=None):
+    """
+    Alimenta um PixelStatsAccumulator com uma imagem inteira, em blocos de linhas.
+
+    Args:
+        pixels: Matriz uint8 (altura x largura) ou (altura x largura x canais)
+        gray: Versão em tons de cinza (opcional; calculada se ausente)
+        accumulator: Acumulador a alimentar (padrão: um novo)
+
+    Returns:
+        O acumulador
+    """
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, np.newaxis]
+    height, width, channels = pixels.shape
+    if accumulator is None:
+        accumulator = PixelStatsAccumulator(channels)
+
+    block_rows = max(1, BLOCK_PIXELS // max(1, width))
+    for start in range(0, height, block_rows):
+        end = min(height, start + block_rows)
+        accumulator.add_pixels(pixels[start:end])
+
+        # Uma linha de vizinhança em cada lado para o Laplaciano ser exato
+        top = 1 if start > 0 else 0
+        bottom = 1 if end < height else 0
+        if gray is None:
+            block_gray = to_gray(pixels[start - top:end + bottom])
+        else:
+            block_gray = gray[start - top:end + bottom]
+        accumulator.add_gray(block_gray, top, bottom)
+
+    return accumulator
+
+
+def compute_pixel_stats(pixels, gray=None):
+    """
+    Calcula as estatísticas de qualidade de uma imagem.
+
+    Args:
+        pixels: Matriz uint8 (altura x largura) ou (altura x largura x canais)
+        gray: Versão em tons de cinza (opcional; calculada se ausente)
+
+    Returns:
+        Dicionário com estatísticas e histogramas por canal, entropia,
+        nitidez e recorte de exposição da luminância
+    """
+    return accumulate_pixel_stats(pixels, gray).result()
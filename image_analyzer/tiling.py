@@ -0,0 +1,331 @@
+"""
+Análise em faixas com teto de memória para imagens gigantes.
+
+Em vez de decodificar o raster inteiro, a imagem é percorrida em
+faixas horizontais cujo tamanho respeita um limite de memória.
+Estatísticas de pixels e uma miniatura (usada para o hash perceptual
+e para a legenda) são agregadas incrementalmente, faixa a faixa.
+
+Dados sem compressão (TIFF em faixas ou em blocos e BMP 'raw') são
+mapeados em memória com np.memmap, então só as páginas da faixa atual
+são lidas do disco. JPEG é decodificado em escala reduzida (modo draft)
+até caber no limite, produzindo estatísticas aproximadas. Os demais
+formatos (PNG, TIFF com compressão LZW/Deflate etc.) não permitem
+decodificação parcial no Pillow e são decodificados por inteiro: nesse
+caso o teto não é respeitado, o resultado traz bounded=False e um aviso
+é emitido quando o tamanho declarado passa do teto.
+"""
+import warnings
+
+import numpy as np
+from PIL import Image
+
+from .stats import PixelStatsAccumulator, to_gray
+
+# Acima deste número de pixels (declarado no cabeçalho) a análise em faixas é usada
+LARGE_IMAGE_PIXELS = 100_000_000
+# Teto de memória padrão para a análise em faixas
+DEFAULT_MEMORY_LIMIT = 512 * 1024 * 1024
+# Memória de trabalho estimada por pixel de uma faixa (pixels, cinza e temporários)
+WORKING_BYTES_PER_PIXEL = 24
+# Maior lado da miniatura agregada durante a varredura
+THUMBNAIL_SIZE = 1024
+# Pixels somados à miniatura de cada vez (a soma usa float64)
+THUMBNAIL_BLOCK_PIXELS = 1 << 14
+
+# rawmode do Pillow -> (canais, ordem invertida)
+RAW_LAYOUTS = {
+    'RGB': (3, False),
+    'BGR': (3, True),
+    'RGBA': (4, False),
+    'L': (1, False),
+}
+
+
+def declared_pixels(image):
+    """Número de pixels declarado no cabeçalho"""
+    return image.width * image.height
+
+
+def needs_tiling(image, threshold=LARGE_IMAGE_PIXELS):
+    """Indica se a imagem deve ser analisada em faixas"""
+    return declared_pixels(image) > threshold
+
+
+def strip_rows(width, memory_limit):
+    """Número de linhas por faixa que respeita o teto de memória"""
+    return max(1, memory_limit // (max(1, width) * WORKING_BYTES_PER_PIXEL))
+
+
+def raw_layout(image):
+    """
+    Descreve os blocos sem compressão da imagem, agrupados em faixas de
+    blocos que cobrem a largura inteira, ou None se algum bloco não puder
+    ser mapeado diretamente.
+
+    Returns:
+        Lista de faixas, cada uma com as tuplas (offset, caixa, stride,
+        orientação, canais, invertido) dos seus blocos, da esquerda para
+        a direita
+    """
+    bands = []
+    for tile in image.tile:
+        codec, box, offset, args = tile[0], tile[1], tile[2], tile[3]
+        if codec != 'raw' or not isinstance(args, tuple) or args[0] not in RAW_LAYOUTS:
+            return None
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        orientation = args[2] if len(args) > 2 else 1
+        channels, reverse = RAW_LAYOUTS[rawmode]
+        entry = (offset, box, stride or (box[2] - box[0]) * channels, orientation, channels, reverse)
+        if box[0] == 0:
+            bands.append([entry])
+        elif not bands or bands[-1][-1][1][2] != box[0] or bands[-1][-1][1][1:4:2] != box[1:4:2]:
+            # Bloco que não continua a faixa atual (TIFF planar, por exemplo)
+            return None
+        else:
+            bands[-1].append(entry)
+    for band in bands:
+        if band[-1][1][2] != image.width:
+            return None
+    return bands or None
+
+
+def can_stream(image, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Indica se StripSource percorre a imagem sem decodificá-la por
+    inteiro, ou seja, com memória limitada a memory_limit.
+
+    Vale para dados sem compressão, em faixas ou em blocos (mapeados em
+    memória), e para JPEG cuja escala de draft de 1/8 cabe no teto.
+    """
+    if raw_layout(image) is not None:
+        return True
+    if image.format == 'JPEG':
+        return (image.width // 8) * (image.height // 8) * WORKING_BYTES_PER_PIXEL <= memory_limit
+    return False
+
+
+class StripSource:
+    """
+    Fonte de faixas de pixels (uint8, linhas x largura x canais).
+
+    Atributos:
+        width, height: Dimensões das faixas produzidas
+        scale: Fator entre as dimensões produzidas e as originais
+        bounded: False se o raster decodificado passa do teto de memória
+            (formato sem decodificação parcial, ou JPEG grande demais
+            mesmo em 1/8); nesse caso um aviso é emitido
+    """
+
+    def __init__(self, path, memory_limit=DEFAULT_MEMORY_LIMIT, frame=0):
+        """
+        Args:
+            path: Caminho da imagem
+            memory_limit: Teto de memória (bytes) das faixas
+            frame: Quadro (página) percorrido, em arquivos com vários quadros
+        """
+        self.path = path
+        self.memory_limit = memory_limit
+        image = Image.open(path)
+        if frame:
+            image.seek(frame)
+        self.source_size = image.size
+        self._layout = raw_layout(image)
+        self._image = None
+
+        if self._layout is not None:
+            self.width, self.height = image.size
+            self.scale = 1.0
+            self.bounded = True
+            self.method = 'memmap'
+            # Os pixels vêm do mapeamento; o arquivo aberto pelo Pillow não é mais usado
+            image.close()
+            return
+
+        if image.format == 'JPEG':
+            # Escala de draft cujo raster cabe no teto de memória
+            budget = memory_limit // WORKING_BYTES_PER_PIXEL
+            scale = 1
+            while scale < 8 and (image.width // scale) * (image.height // scale) > budget:
+                scale *= 2
+            image.draft('RGB', (image.width // scale, image.height // scale))
+            self.method = 'draft'
+        else:
+            self.method = 'full'
+
+        # Decidido pelo tamanho declarado, antes de decodificar
+        self.bounded = image.width * image.height * WORKING_BYTES_PER_PIXEL <= memory_limit
+        if not self.bounded:
+            warnings.warn(
+                f"{path}: a imagem não pode ser lida em faixas e será decodificada "
+                f"acima do teto de memória ({memory_limit} bytes)",
+                RuntimeWarning, stacklevel=3)
+
+        image.load()
+        if image.mode not in ('RGB', 'L', 'RGBA'):
+            image = image.convert('RGB')
+        self._image = image
+        self.width, self.height = image.size
+        self.scale = self.width / self.source_size[0]
+
+    @property
+    def rows_per_strip(self):
+        return strip_rows(self.width, self.memory_limit)
+
+    def strips(self):
+        """Gera tuplas (linha inicial, faixa)"""
+        if self._layout is not None:
+            yield from self._memmap_strips()
+        else:
+            pixels = np.asarray(self._image)
+            rows = self.rows_per_strip
+            for top in range(0, self.height, rows):
+                yield top, pixels[top:top + rows]
+
+    def _memmap_strips(self):
+        """
+        Faixas lidas diretamente do arquivo mapeado em memória.
+
+        Cada faixa tem o seu próprio mapeamento, desfeito antes da
+        seguinte, para que as páginas lidas não se acumulem no processo.
+        Em TIFF em blocos, a faixa junta as mesmas linhas de cada bloco
+        da fileira.
+        """
+        rows_per_strip = self.rows_per_strip
+        for band in self._layout:
+            box = band[0][1]
+            tile_rows = box[3] - box[1]
+            for start in range(0, tile_rows, rows_per_strip):
+                end = min(tile_rows, start + rows_per_strip)
+                blocks = [self._memmap_block(tile, tile_rows, start, end) for tile in band]
+                yield box[1] + start, blocks[0] if len(blocks) == 1 else np.concatenate(blocks, axis=1)
+
+    def _memmap_block(self, tile, tile_rows, start, end):
+        """Linhas start:end de um bloco, como matriz linhas x largura x canais"""
+        offset, box, stride, orientation, channels, reverse = tile
+        width = box[2] - box[0]
+        # Linhas gravadas de baixo para cima (BMP): a faixa fica no fim do bloco
+        first = tile_rows - end if orientation < 0 else start
+        data = np.memmap(self.path, dtype=np.uint8, mode='r',
+                         offset=offset + first * stride, shape=(end - start, stride))
+        block = np.array(data[:, :width * channels])
+        del data
+        if orientation < 0:
+            block = block[::-1]
+        block = block.reshape(end - start, width, channels)
+        if reverse:
+            block = block[:, :, ::-1]
+        return block
+
+
+class ThumbnailAccumulator:
+    """Miniatura por média de área, montada faixa a faixa"""
+
+    def __init__(self, width, height, channels, size=THUMBNAIL_SIZE):
+        ratio = min(1.0, size / max(width, height))
+        self.width = width
+        self.height = height
+        self.thumb_width = max(1, round(width * ratio))
+        self.thumb_height = max(1, round(height * ratio))
+        self.sums = np.zeros((self.thumb_height, self.thumb_width, channels), dtype=np.float64)
+        self.counts = np.zeros(self.thumb_height, dtype=np.float64)
+        # Início de cada coluna da miniatura na imagem original
+        self.column_starts = (np.arange(self.thumb_width) * width) // self.thumb_width
+        self.column_sizes = np.diff(np.append(self.column_starts, width))
+
+    def add(self, top, strip):
+        """Soma uma faixa que começa na linha top"""
+        if strip.ndim == 2:
+            strip = strip[:, :, np.newaxis]
+        # Em blocos de linhas: a conversão para float64 não cresce com a faixa
+        block_rows = max(1, THUMBNAIL_BLOCK_PIXELS // self.width)
+        for start in range(0, strip.shape[0], block_rows):
+            block = strip[start:start + block_rows]
+            columns = np.add.reduceat(block, self.column_starts, axis=1, dtype=np.float64)
+            targets = ((np.arange(block.shape[0]) + top + start) * self.thumb_height) // self.height
+            np.add.at(self.sums, targets, columns)
+            np.add.at(self.counts, targets, 1)
+
+    def image(self):
+        """Miniatura final como imagem PIL RGB"""
+        counts = self.counts[:, np.newaxis, np.newaxis] * self.column_sizes[np.newaxis, :, np.newaxis]
+        pixels = (self.sums / np.maximum(counts, 1)).round().astype(np.uint8)
+        if pixels.shape[2] == 1:
+            return Image.fromarray(pixels[:, :, 0], 'L').convert('RGB')
+        return Image.fromarray(pixels[:, :, :3], 'RGB')
+
+
+def _to_channels(strip, channels):
+    """Converte uma faixa para 1 ou 3 canais (cinza repetido, alfa descartado)"""
+    count = strip.shape[2] if strip.ndim > 2 else 1
+    if channels is None or count == channels:
+        return strip
+    if channels == 1:
+        return to_gray(strip)
+    if count == 1:
+        gray = strip if strip.ndim == 2 else strip[:, :, 0]
+        return np.repeat(gray[:, :, np.newaxis], channels, axis=2)
+    return strip[:, :, :channels]
+
+
+def accumulate_strips(source, channels=None, thumbnail_size=THUMBNAIL_SIZE):
+    """
+    Percorre as faixas de um StripSource agregando estatísticas e miniatura.
+
+    Args:
+        source: StripSource
+        channels: Se informado (1 ou 3), as faixas são convertidas para
+            esse número de canais, para somar com outras imagens
+        thumbnail_size: Maior lado da miniatura
+
+    Returns:
+        Tupla (PixelStatsAccumulator, ThumbnailAccumulator)
+    """
+    accumulator = None
+    thumbnail = None
+    halo = None
+
+    for top, strip in source.strips():
+        strip = _to_channels(strip, channels)
+        if accumulator is None:
+            count = strip.shape[2] if strip.ndim > 2 else 1
+            accumulator = PixelStatsAccumulator(count)
+            thumbnail = ThumbnailAccumulator(source.width, source.height, count, thumbnail_size)
+
+        accumulator.add_pixels(strip)
+        thumbnail.add(top, strip)
+
+        # As duas últimas linhas já vistas entram como vizinhança: o
+        # Laplaciano fica exato também nas fronteiras entre faixas
+        gray = to_gray(strip)
+        if halo is not None:
+            gray = np.concatenate([halo, gray])
+        accumulator.add_gray(gray, top_halo=0 if halo is None else len(halo))
+        halo = gray[-2:]
+
+    if accumulator is None:
+        raise ValueError("Imagem sem pixels")
+    return accumulator, thumbnail
+
+
+def analyze_strips(path, memory_limit=DEFAULT_MEMORY_LIMIT):
+    """
+    Percorre a imagem em faixas agregando estatísticas e miniatura.
+
+    Returns:
+        Dicionário com 'stats' (mesmo formato de compute_pixel_stats),
+        'thumbnail' (imagem PIL), 'channels', 'scale', 'bounded',
+        'method' e 'strip_rows'
+    """
+    source = StripSource(path, memory_limit)
+    accumulator, thumbnail = accumulate_strips(source)
+    return {
+        'stats': accumulator.result(),
+        'thumbnail': thumbnail.image(),
+        'channels': accumulator.channels,
+        'scale': source.scale,
+        'bounded': source.bounded,
+        'method': source.method,
+        'strip_rows': source.rows_per_strip,
+    }
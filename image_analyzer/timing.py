@@ -0,0 +1,228 @@
+"""
+Instrumentação das etapas de análise.
+
+Cada etapa registra tempo de relógio, tempo de CPU (da thread) e
+memória: quanto a etapa elevou o pico de memória residente do processo
+(ru_maxrss, quando o sistema o oferece) e, com o tracemalloc ativo
+(--trace-memory), o pico de memória alocada durante a etapa, que é
+mais preciso mas deixa a análise mais lenta.
+
+As duas medidas de memória valem para o processo inteiro, então só são
+registradas quando a etapa roda sem etapas de outras threads ao mesmo
+tempo (as threads de etapas da GUI e de legendas do modo em lote, por
+exemplo); do contrário, ficam ausentes e apenas os tempos são somados.
+
+Os tempos de um arquivo ficam em ImageContext.timings; o
+MetricsCollector agrega os de vários arquivos e os exporta em JSON ou
+no formato de texto do Prometheus.
+"""
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows: pico de memória do processo indisponível
+    resource = None
+
+METRICS_PREFIX = "image_analyzer"
+
+# Threads com etapas em andamento, em qualquer StageTimings do processo,
+# e quantas vezes duas ou mais delas se sobrepuseram
+_active_lock = threading.Lock()
+_active_threads = 0
+_overlaps = 0
+_thread_state = threading.local()
+
+
+def peak_rss():
+    """Pico de memória residente do processo em bytes, ou None se indisponível"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageTimings:
+    """
+    Tempos e memória das etapas de uma análise.
+
+    Etapas podem ser aninhadas (os tempos são inclusivos) e medidas
+    várias vezes; nesse caso os tempos são somados e, para a memória,
+    fica a maior medição.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def _frames(self):
+        """Pilha de etapas em andamento na thread atual"""
+        frames = getattr(_thread_state, 'frames', None)
+        if frames is None:
+            frames = _thread_state.frames = []
+        return frames
+
+    @contextmanager
+    def measure(self, name):
+        """Mede o bloco como a etapa name"""
+        global _active_threads, _overlaps
+        frames = self._frames()
+        with _active_lock:
+            if not frames:
+                _active_threads += 1
+                if _active_threads > 1:
+                    _overlaps += 1
+            # A memória só é atribuída à etapa se nenhuma outra thread
+            # medir etapas do início ao fim dela
+            exclusive = _active_threads == 1
+            overlaps = _overlaps
+        frame = {'start': None, 'peak': None, 'rss': peak_rss() if exclusive else None}
+        if exclusive and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # O pico é zerado para esta etapa; as externas guardam o que já viram
+            for outer in frames:
+                if outer['peak'] is not None:
+                    outer['peak'] = max(outer['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['start'] = frame['peak'] = current
+        frames.append(frame)
+
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            # Por identidade: medições diferentes podem ter o mesmo conteúdo
+            del frames[next(i for i, f in enumerate(frames) if f is frame)]
+            with _active_lock:
+                exclusive = exclusive and _overlaps == overlaps
+                if not frames:
+                    _active_threads -= 1
+            traced = rss_growth = None
+            if exclusive:
+                if frame['start'] is not None and tracemalloc.is_tracing():
+                    peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+                    for outer in frames:
+                        if outer['peak'] is not None:
+                            outer['peak'] = max(outer['peak'], peak)
+                    traced = max(0, peak - frame['start'])
+                if frame['rss'] is not None:
+                    rss_growth = peak_rss() - frame['rss']
+            self.record(name, wall, cpu, traced, rss_growth)
+
+    def record(self, name, wall, cpu, traced=None, rss_growth=None):
+        """Soma uma medição à etapa name"""
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {
+                    'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'rss_growth': None, 'peak_traced': None,
+                }
+            stage['calls'] += 1
+            stage['wall'] += wall
+            stage['cpu'] += cpu
+            stage['rss_growth'] = _max(stage['rss_growth'], rss_growth)
+            stage['peak_traced'] = _max(stage['peak_traced'], traced)
+
+    def as_dict(self):
+        """Cópia serializável dos tempos, indexada pelo nome da etapa"""
+        with self._lock:
+            return {name: dict(stage) for name, stage in self.stages.items()}
+
+
+def _max(a, b):
+    """Máximo que ignora valores ausentes"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+
+class MetricsCollector:
+    """Agrega os tempos por etapa de vários arquivos"""
+
+    def __init__(self):
+        self.files = 0
+        self.failed = 0
+        self.stages = {}
+
+    def add(self, timings, failed=False):
+        """
+        Soma os tempos de um arquivo.
+
+        Args:
+            timings: Dicionário de StageTimings.as_dict() (ou None)
+            failed: Se o arquivo teve erros
+        """
+        self.files += 1
+        if failed:
+            self.failed += 1
+        for name, stage in (timings or {}).items():
+            total = self.stages.get(name)
+            if total is None:
+                total = self.stages[name] = {
+                    'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'wall_max': 0.0,
+                    'rss_growth': None, 'peak_traced': None,
+                }
+            total['calls'] += stage['calls']
+            total['wall'] += stage['wall']
+            total['cpu'] += stage['cpu']
+            total['wall_max'] = max(total['wall_max'], stage['wall'])
+            total['rss_growth'] = _max(total['rss_growth'], stage.get('rss_growth'))
+            total['peak_traced'] = _max(total['peak_traced'], stage.get('peak_traced'))
+
+    def as_dict(self):
+        """Resumo serializável, com a média de tempo por arquivo de cada etapa"""
+        stages = {}
+        for name, total in self.stages.items():
+            stages[name] = dict(total, wall_mean=total['wall'] / self.files if self.files else 0.0)
+        return {'files': self.files, 'failed': self.failed, 'stages': stages}
+
+    def write_json(self, path):
+        """Grava o resumo em JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix=METRICS_PREFIX):
+        """Resumo no formato de texto do Prometheus (para o textfile collector)"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                if value is not None:
+                    lines.append(f"{prefix}_{name}{labels} {value}")
+
+        stages = sorted(self.stages.items())
+        metric("files_total", "counter", "Arquivos analisados", [("", self.files)])
+        metric("files_failed_total", "counter", "Arquivos com erros", [("", self.failed)])
+        metric("stage_calls_total", "counter", "Execuções de cada etapa",
+               [(f'{{stage="{name}"}}', s['calls']) for name, s in stages])
+        metric("stage_wall_seconds_total", "counter", "Tempo de relógio acumulado por etapa",
+               [(f'{{stage="{name}"}}', s['wall']) for name, s in stages])
+        metric("stage_cpu_seconds_total", "counter", "Tempo de CPU acumulado por etapa",
+               [(f'{{stage="{name}"}}', s['cpu']) for name, s in stages])
+        metric("stage_wall_seconds_max", "gauge", "Maior tempo de relógio de uma etapa em um arquivo",
+               [(f'{{stage="{name}"}}', s['wall_max']) for name, s in stages])
+        metric("stage_rss_growth_bytes", "gauge",
+               "Maior aumento do pico de memória residente do processo durante a etapa",
+               [(f'{{stage="{name}"}}', s['rss_growth']) for name, s in stages])
+        metric("stage_peak_traced_bytes", "gauge",
+               "Pico de memória alocada durante a etapa, sem etapas concorrentes (tracemalloc)",
+               [(f'{{stage="{name}"}}', s['peak_traced']) for name, s in stages])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, prefix=METRICS_PREFIX):
+        """Grava o resumo no formato de texto do Prometheus"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
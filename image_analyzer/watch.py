@@ -0,0 +1,486 @@
+"""
+Indexação incremental de pastas monitoradas.
+
+Um banco SQLite guarda, para cada arquivo já analisado, o resultado e a
+identidade do arquivo no momento da análise (tamanho, data de
+modificação em nanossegundos, dispositivo e inode). Cada sincronização
+percorre a árvore comparando só os metadados do sistema de arquivos:
+arquivos inalterados nunca são lidos de novo, arquivos novos ou
+modificados são analisados, arquivos removidos saem do índice e
+arquivos renomeados ou movidos (mesmo inode, tamanho e data)
+reaproveitam o resultado anterior.
+
+As mudanças encontradas na varredura vão para um diário (journal)
+antes de qualquer análise, e cada grupo de resultados é gravado na
+mesma transação que marca suas entradas como concluídas. Se o processo
+for interrompido, a próxima sincronização retoma o diário pendente sem
+repetir o que já foi gravado.
+
+Uso:
+    python -m image_analyzer.watch indice.db sync /fotos -w 8
+    python -m image_analyzer.watch indice.db watch /fotos --interval 300
+    python -m image_analyzer.watch indice.db export -o resultados.jsonl
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+from . import engine
+from .batch import iter_image_files, iter_chunks, create_pool, _analyze_chunk, _perceptual_hash
+from .cache import cache_version
+from .models import captioner_id
+from .phash_index import PerceptualHashIndex
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    file_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    failed INTEGER NOT NULL,
+    indexed_at REAL NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_file_id ON files (file_id);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    root TEXT NOT NULL,
+    state TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS journal (
+    scan_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    action TEXT NOT NULL,
+    source TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    file_id TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scan_id, path)
+);
+"""
+
+# Ações do diário
+ADD = 'add'
+UPDATE = 'update'
+MOVE = 'move'
+DELETE = 'delete'
+
+
+def file_identity(stats):
+    """
+    Identidade do arquivo no sistema de arquivos: (tamanho, mtime_ns, dispositivo:inode).
+
+    O inode muda quando um programa grava o arquivo novo ao lado e o
+    renomeia por cima do antigo, mesmo que o tamanho e a data coincidam.
+    """
+    return stats.st_size, stats.st_mtime_ns, f"{stats.st_dev}:{stats.st_ino}"
+
+
+def _prefix_range(root):
+    """Limites (inclusivo, exclusivo) dos caminhos dentro de root, para consultas por intervalo"""
+    prefix = root if root.endswith(os.sep) else root + os.sep
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class FolderIndex:
+    """
+    Índice SQLite de resultados por caminho, com diário de sincronização.
+
+    Vários diretórios raiz podem compartilhar o mesmo banco; cada
+    sincronização só considera os caminhos dentro da sua raiz.
+    """
+
+    def __init__(self, path, model=None):
+        """
+        Args:
+            path: Arquivo do banco SQLite
+            model: Identificador do modelo de legendas, ou None sem legendas;
+                resultados de outra versão do analisador ou do modelo são refeitos
+        """
+        self.path = path
+        self.version = cache_version(model)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get(self, path):
+        """Retorna o resultado armazenado para o caminho, ou None"""
+        with self._lock:
+            row = self._conn.execute("SELECT result FROM files WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_results(self, root=None):
+        """Gera os resultados armazenados (apenas os de dentro de root, se informado)"""
+        query = "SELECT result FROM files"
+        params = ()
+        if root is not None:
+            query += " WHERE path >= ? AND path < ?"
+            params = _prefix_range(os.path.abspath(root))
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY path", params).fetchall()
+        for (result,) in rows:
+            yield json.loads(result)
+
+    def unfinished_scan(self, root):
+        """Id da sincronização interrompida de root (com diário pendente), ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM scans WHERE root = ? AND state = 'processing' ORDER BY id DESC LIMIT 1",
+                (root,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def plan(self, root, retry_failed=False):
+        """
+        Percorre root e registra no diário as mudanças em relação ao índice.
+
+        A varredura inteira é uma única transação: se for interrompida,
+        nada é registrado e a próxima sincronização começa de novo (o
+        custo é só o de listar os arquivos, nenhum é lido).
+
+        Args:
+            root: Diretório raiz (caminho absoluto)
+            retry_failed: Se True, arquivos inalterados cuja análise falhou são refeitos
+
+        Returns:
+            Tupla (id da sincronização, número de arquivos inalterados)
+        """
+        unchanged = 0
+        with self._lock, self._conn:
+            conn = self._conn
+            scan_id = conn.execute(
+                "INSERT INTO scans (root, state, started_at) VALUES (?, 'walking', ?)",
+                (root, time.time())
+            ).lastrowid
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (path TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM seen")
+
+            for paths in iter_chunks(iter_image_files(root), 1000):
+                entries = []
+                for path in paths:
+                    try:
+                        identity = file_identity(os.stat(path))
+                    except OSError:
+                        # Removido durante a varredura: tratado como ausente
+                        continue
+                    row = conn.execute(
+                        "SELECT size, mtime_ns, file_id, version, failed FROM files WHERE path = ?",
+                        (path,)
+                    ).fetchone()
+                    if row is None:
+                        entries.append((scan_id, path, ADD, *identity))
+                    elif row[:3] != identity or row[3] != self.version or (retry_failed and row[4]):
+                        entries.append((scan_id, path, UPDATE, *identity))
+                    else:
+                        unchanged += 1
+                conn.executemany("INSERT OR IGNORE INTO seen (path) VALUES (?)",
+                                 ((path,) for path in paths))
+                conn.executemany(
+                    "INSERT INTO journal (scan_id, path, action, size, mtime_ns, file_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    entries
+                )
+
+            conn.execute(
+                "INSERT INTO journal (scan_id, path, action) "
+                "SELECT ?, path, 'delete' FROM files "
+                "WHERE path >= ? AND path < ? AND path NOT IN (SELECT path FROM seen)",
+                (scan_id, *_prefix_range(root))
+            )
+            # Arquivo novo com a mesma identidade de um removido: renomeação ou movimentação
+            moves = conn.execute(
+                "SELECT j.path, f.path FROM journal j "
+                "JOIN files f ON f.file_id = j.file_id AND f.size = j.size "
+                " AND f.mtime_ns = j.mtime_ns AND f.version = ? AND f.failed = 0 "
+                "JOIN journal d ON d.scan_id = j.scan_id AND d.path = f.path AND d.action = 'delete' "
+                "WHERE j.scan_id = ? AND j.action = 'add'",
+                (self.version, scan_id)
+            ).fetchall()
+            sources = set()
+            for path, source in moves:
+                if source in sources:
+                    continue
+                sources.add(source)
+                conn.execute("UPDATE journal SET action = 'move', source = ? WHERE scan_id = ? AND path = ?",
+                             (source, scan_id, path))
+                conn.execute("DELETE FROM journal WHERE scan_id = ? AND path = ?", (scan_id, source))
+
+            conn.execute("UPDATE scans SET state = 'processing' WHERE id = ?", (scan_id,))
+            conn.execute("DELETE FROM seen")
+        return scan_id, unchanged
+
+    def pending(self, scan_id, actions):
+        """
+        Entradas ainda não concluídas do diário.
+
+        Returns:
+            Lista de tuplas (caminho, ação, origem, tamanho, mtime_ns, file_id)
+        """
+        placeholders = ",".join("?" * len(actions))
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, action, source, size, mtime_ns, file_id FROM journal "
+                f"WHERE scan_id = ? AND done = 0 AND action IN ({placeholders}) ORDER BY path",
+                (scan_id, *actions)
+            ).fetchall()
+
+    def apply_deletes(self, scan_id, paths):
+        """Remove os caminhos do índice e conclui as entradas do diário"""
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in paths))
+            self._conn.executemany("UPDATE journal SET done = 1 WHERE scan_id = ? AND path = ?",
+                                   ((scan_id, path) for path in paths))
+
+    def apply_move(self, scan_id, path, source, identity):
+        """
+        Transfere o resultado de source para path sem analisar o arquivo.
+
+        Returns:
+            O resultado transferido, ou None se source não estiver mais no
+            índice (a entrada vira uma análise normal)
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT result FROM files WHERE path = ?", (source,)).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "UPDATE journal SET action = 'add', source = NULL WHERE scan_id = ? AND path = ?",
+                    (scan_id, path)
+                )
+                return None
+        try:
+            result = engine.update_file_fields(json.loads(row[0]), path)
+        except OSError:
+            # Removido depois da varredura: a próxima sincronização limpa o índice
+            result = json.loads(row[0])
+            result['path'] = path
+        with self._lock, self._conn:
+            self._store(path, identity, result)
+            self._conn.execute("DELETE FROM files WHERE path = ?", (source,))
+            self._conn.execute("UPDATE journal SET done = 1 WHERE scan_id = ? AND path = ?",
+                               (scan_id, path))
+        return result
+
+    def store_results(self, scan_id, items):
+        """
+        Grava resultados e conclui as entradas do diário na mesma transação.
+
+        Args:
+            items: Lista de pares (identidade do arquivo, resultado)
+        """
+        with self._lock, self._conn:
+            for identity, result in items:
+                self._store(result['path'], identity, result)
+            self._conn.executemany("UPDATE journal SET done = 1 WHERE scan_id = ? AND path = ?",
+                                   ((scan_id, result['path']) for _, result in items))
+
+    def _store(self, path, identity, result):
+        size, mtime_ns, file_id = identity
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files "
+            "(path, size, mtime_ns, file_id, version, failed, indexed_at, result) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, file_id, self.version, int(bool(result['errors'])),
+             time.time(), json.dumps(result, ensure_ascii=False))
+        )
+
+    def finish(self, scan_id):
+        """Marca a sincronização como concluída e descarta o diário dela"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE scans SET state = 'done', finished_at = ? WHERE id = ?",
+                               (time.time(), scan_id))
+            self._conn.execute("DELETE FROM journal WHERE scan_id = ?", (scan_id,))
+
+
+def _process(index, scan_id, pool_factory, chunksize, phash_index, summary):
+    """Aplica as entradas pendentes do diário: remoções, movimentações e análises"""
+    deletes = [path for path, *_ in index.pending(scan_id, (DELETE,))]
+    for paths in iter_chunks(deletes, 1000):
+        index.apply_deletes(scan_id, paths)
+        if phash_index is not None:
+            for path in paths:
+                phash_index.remove(path)
+    summary['deleted'] += len(deletes)
+
+    for path, _, source, *identity in index.pending(scan_id, (MOVE,)):
+        result = index.apply_move(scan_id, path, source, tuple(identity))
+        if result is not None:
+            summary['moved'] += 1
+            if phash_index is not None:
+                phash_index.remove(source)
+                phash = _perceptual_hash(result)
+                if phash is not None:
+                    phash_index.add(path, phash)
+
+    entries = index.pending(scan_id, (ADD, UPDATE))
+    if not entries:
+        return
+    identities = {path: tuple(identity) for path, _, _, *identity in entries}
+    actions = {path: action for path, action, *_ in entries}
+    # O pool (e o modelo de legendas) só é criado se houver algo a analisar
+    with pool_factory() as pool:
+        chunks = iter_chunks([path for path, *_ in entries], chunksize)
+        for results in pool.imap_unordered(_analyze_chunk, chunks):
+            for result in results:
+                result.pop('timings', None)
+                result.pop('cache', None)
+                summary['added' if actions[result['path']] == ADD else 'updated'] += 1
+                if result['errors']:
+                    summary['failed'] += 1
+            index.store_results(scan_id, [(identities[result['path']], result) for result in results])
+            if phash_index is not None:
+                hashes = [(result['path'], _perceptual_hash(result)) for result in results]
+                phash_index.add_many([(path, phash) for path, phash in hashes if phash is not None])
+
+
+def sync(index, root, pool_factory=create_pool, chunksize=16, phash_index=None, retry_failed=False):
+    """
+    Sincroniza o índice com o conteúdo atual de root.
+
+    Uma sincronização anterior interrompida é concluída primeiro; em
+    seguida a árvore é percorrida de novo para encontrar o que mudou.
+
+    Args:
+        index: FolderIndex
+        root: Diretório raiz
+        pool_factory: Função sem argumentos que cria o pool de análise
+            (ver batch.create_pool)
+        chunksize: Quantidade de arquivos enviada a cada processo por vez
+        phash_index: PerceptualHashIndex mantido em sincronia com o índice
+        retry_failed: Se True, refaz as análises que falharam mesmo sem mudanças
+
+    Returns:
+        Dicionário com o número de arquivos adicionados, atualizados,
+        movidos, removidos, inalterados e com erros, e se uma
+        sincronização interrompida foi retomada
+    """
+    root = os.path.abspath(root)
+    summary = {'added': 0, 'updated': 0, 'moved': 0, 'deleted': 0, 'unchanged': 0,
+               'failed': 0, 'resumed': False}
+
+    scan_id = index.unfinished_scan(root)
+    if scan_id is not None:
+        summary['resumed'] = True
+        _process(index, scan_id, pool_factory, chunksize, phash_index, summary)
+        index.finish(scan_id)
+
+    scan_id, summary['unchanged'] = index.plan(root, retry_failed)
+    _process(index, scan_id, pool_factory, chunksize, phash_index, summary)
+    index.finish(scan_id)
+    return summary
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.watch",
+        description="Mantém um índice incremental dos resultados de uma pasta."
+    )
+    parser.add_argument("database", help="Banco SQLite do índice")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("sync", "Sincroniza o índice uma vez"),
+                            ("watch", "Sincroniza o índice periodicamente")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("root", help="Diretório monitorado")
+        command.add_argument("-w", "--workers", type=int, default=None,
+                             help="Número de processos (padrão: número de CPUs)")
+        command.add_argument("--chunksize", type=int, default=16,
+                             help="Arquivos enviados a cada processo por vez")
+        command.add_argument("--caption", action="store_true",
+                             help="Gera legendas com o modelo de IA (carregado em cada processo)")
+        command.add_argument("--fast-cpu", action="store_true",
+                             help="Modelo de legenda quantizado em int8 (mais rápido em CPU)")
+        command.add_argument("--retry-failed", action="store_true",
+                             help="Refaz as análises que falharam, mesmo sem mudanças no arquivo")
+        command.add_argument("--phash-index",
+                             help="Banco SQLite de hashes perceptuais mantido em sincronia")
+        if name == "watch":
+            command.add_argument("--interval", type=float, default=60,
+                                 help="Segundos entre duas sincronizações")
+
+    export = commands.add_parser("export", help="Grava os resultados do índice em JSON Lines")
+    export.add_argument("-o", "--output", default="-",
+                        help="Arquivo de saída JSON Lines (padrão: saída padrão)")
+    export.add_argument("--root", default=None, help="Exporta só os arquivos deste diretório")
+    return parser
+
+
+def _report(summary):
+    resumed = " (sincronização interrompida retomada)" if summary['resumed'] else ""
+    print(f"{summary['added']} novos, {summary['updated']} modificados, {summary['moved']} movidos, "
+          f"{summary['deleted']} removidos, {summary['unchanged']} inalterados, "
+          f"{summary['failed']} com erros{resumed}.", file=sys.stderr)
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+
+    if args.command == "export":
+        with FolderIndex(args.database) as index:
+            output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+            try:
+                for result in index.iter_results(args.root):
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+        return 0
+
+    if not os.path.isdir(args.root):
+        print(f"Diretório não encontrado: {args.root}", file=sys.stderr)
+        return 2
+
+    model = captioner_id(fast=args.fast_cpu) if args.caption else None
+
+    def pool_factory():
+        return create_pool(args.workers, caption=args.caption,
+                           caption_options={'fast': args.fast_cpu})
+
+    phash_index = PerceptualHashIndex(args.phash_index) if args.phash_index else None
+    try:
+        with FolderIndex(args.database, model=model) as index:
+            while True:
+                summary = sync(index, args.root, pool_factory, args.chunksize, phash_index,
+                               args.retry_failed)
+                _report(summary)
+                if args.command == "sync":
+                    break
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        # O diário pendente é retomado na próxima sincronização
+        print("Interrompido.", file=sys.stderr)
+        return 130
+    finally:
+        if phash_index is not None:
+            phash_index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
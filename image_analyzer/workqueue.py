@@ -0,0 +1,712 @@
+"""
+Fila de trabalho compartilhada, com arrendamentos (leases), para vários workers.
+
+A fila fica em um diretório com alguns bancos SQLite (shards); os
+arquivos são distribuídos entre eles pelo caminho, e cada worker começa
+pelo seu próprio shard e passa aos outros quando ele esvazia, de modo
+que workers diferentes raramente disputam o mesmo banco. Não há
+servidor: qualquer número de processos, na mesma máquina ou em várias
+máquinas sobre um armazenamento compartilhado, esvazia a mesma fila.
+
+Cada worker arrenda um grupo de arquivos por um prazo e renova o
+arrendamento com heartbeats enquanto analisa. Se o worker morrer, o
+prazo vence e os arquivos voltam a ser arrendados por outro; um arquivo
+cujo arrendamento vence max_attempts vezes (por exemplo, uma imagem que
+derruba o decodificador) é marcado como falho. A gravação do resultado
+é idempotente: o primeiro resultado de um arquivo vence e gravações
+repetidas (de um worker lento cujo arrendamento já tinha vencido) são
+ignoradas.
+
+Em sistemas de arquivos de rede, use network=True (--network-fs): o
+modo WAL do SQLite depende de memória compartilhada local.
+
+Uso:
+    python -m image_analyzer.workqueue fila/ add /fotos --shards 8
+    python -m image_analyzer.workqueue fila/ work -w 8      (em cada máquina)
+    python -m image_analyzer.workqueue fila/ status
+    python -m image_analyzer.workqueue fila/ export -o resultados.jsonl
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import zlib
+import socket
+import sqlite3
+import argparse
+import threading
+from collections import namedtuple, deque
+from contextlib import contextmanager
+
+from .batch import iter_image_files, iter_chunks, create_pool, _analyze_chunk
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    token TEXT,
+    lease_expires REAL,
+    enqueued_at REAL NOT NULL,
+    leased_at REAL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_expires);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    lease_seconds REAL NOT NULL,
+    stopped_at REAL
+);
+"""
+
+# Estados de um arquivo na fila
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_SHARDS = 4
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Intervalo com que o worker verifica os grupos em análise no pool
+POLL_SECONDS = 0.5
+
+Lease = namedtuple('Lease', ['shard', 'id', 'path', 'token', 'attempt'])
+Lease.__doc__ = """
+Arrendamento de um arquivo: shard, id na tabela jobs, caminho, token e
+número da tentativa (1 no primeiro arrendamento)
+"""
+
+
+def worker_name():
+    """Identificador padrão de um worker: máquina e PID"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Fila de análise em um diretório de shards SQLite.
+
+    Pode ser compartilhada por várias threads; cada processo (e cada
+    máquina) abre a sua própria instância sobre o mesmo diretório.
+    """
+
+    def __init__(self, path, shards=None, max_attempts=DEFAULT_MAX_ATTEMPTS, network=False):
+        """
+        Args:
+            path: Diretório da fila (criado se não existir)
+            shards: Número de shards de uma fila nova (padrão: DEFAULT_SHARDS);
+                uma fila existente mantém o número com que foi criada
+            max_attempts: Vencimentos de arrendamento tolerados por arquivo
+            network: Se True, usa o diário de rollback do SQLite em vez do
+                WAL, para filas em sistemas de arquivos de rede
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(path, exist_ok=True)
+        existing = sorted(name for name in os.listdir(path)
+                          if name.startswith('shard-') and name.endswith('.db'))
+        if existing and shards is not None and shards != len(existing):
+            raise ValueError(f"A fila já existe com {len(existing)} shards")
+        if not existing:
+            existing = [f"shard-{i:03d}.db" for i in range(shards or DEFAULT_SHARDS)]
+
+        self._lock = threading.Lock()
+        self._conns = []
+        for name in existing:
+            conn = sqlite3.connect(os.path.join(path, name), timeout=60,
+                                   check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=DELETE" if network else "PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conns.append(conn)
+
+    @property
+    def shards(self):
+        """Número de shards"""
+        return len(self._conns)
+
+    def close(self):
+        """Fecha as conexões com os bancos"""
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def _transaction(self, shard):
+        """
+        Transação de escrita em um shard.
+
+        BEGIN IMMEDIATE reserva o banco já no início, então dois workers
+        nunca leem os mesmos arquivos livres para depois disputarem a
+        escrita.
+        """
+        conn = self._conns[shard]
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def shard_of(self, path):
+        """Shard em que um caminho fica"""
+        return zlib.crc32(path.encode('utf-8', 'surrogateescape')) % self.shards
+
+    def add(self, paths):
+        """
+        Enfileira arquivos; caminhos já presentes na fila são ignorados.
+
+        Returns:
+            Número de arquivos novos
+        """
+        by_shard = {}
+        for path in paths:
+            by_shard.setdefault(self.shard_of(path), []).append(path)
+        now = time.time()
+        added = 0
+        for shard, shard_paths in by_shard.items():
+            with self._transaction(shard) as conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (path, state, enqueued_at) VALUES (?, ?, ?)",
+                    ((path, PENDING, now) for path in shard_paths)
+                )
+                added += conn.total_changes - before
+        return added
+
+    def lease(self, worker, count, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Arrenda até count arquivos livres ou com arrendamento vencido.
+
+        Os shards são percorridos a partir de um que depende do worker.
+
+        Returns:
+            Lista de Lease (vazia se não houver nada disponível)
+        """
+        leases = []
+        first = zlib.crc32(worker.encode()) % self.shards
+        for offset in range(self.shards):
+            if len(leases) >= count:
+                break
+            shard = (first + offset) % self.shards
+            leases.extend(self._lease_shard(shard, worker, count - len(leases), lease_seconds))
+        return leases
+
+    def _lease_shard(self, shard, worker, count, lease_seconds):
+        now = time.time()
+        with self._transaction(shard) as conn:
+            # Arrendamentos vencidos vezes demais: o arquivo provavelmente derruba o worker
+            conn.execute(
+                "UPDATE jobs SET state = ?, token = NULL, finished_at = ?, error = ? "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, f"Arrendamento vencido {self.max_attempts} vezes",
+                 LEASED, now, self.max_attempts)
+            )
+            rows = conn.execute(
+                "SELECT id, path, attempts FROM jobs WHERE state = ? AND lease_expires < ? "
+                "ORDER BY id LIMIT ?",
+                (LEASED, now, count)
+            ).fetchall()
+            if len(rows) < count:
+                rows += conn.execute(
+                    "SELECT id, path, attempts FROM jobs WHERE state = ? ORDER BY id LIMIT ?",
+                    (PENDING, count - len(rows))
+                ).fetchall()
+            leases = [Lease(shard, job_id, path, uuid.uuid4().hex, attempts + 1)
+                      for job_id, path, attempts in rows]
+            conn.executemany(
+                "UPDATE jobs SET state = ?, worker = ?, token = ?, lease_expires = ?, "
+                "leased_at = ?, attempts = attempts + 1 WHERE id = ?",
+                ((LEASED, worker, lease.token, now + lease_seconds, now, lease.id)
+                 for lease in leases)
+            )
+        return leases
+
+    def heartbeat(self, worker, leases=(), lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        Renova os arrendamentos ainda em andamento e registra que o worker está vivo.
+
+        Returns:
+            Arrendamentos perdidos (vencidos e arrendados por outro worker,
+            ou já concluídos); os resultados deles ainda podem ser gravados
+        """
+        now = time.time()
+        lost = []
+        for shard, shard_leases in self._by_shard(leases).items():
+            with self._transaction(shard) as conn:
+                for lease in shard_leases:
+                    cursor = conn.execute(
+                        "UPDATE jobs SET lease_expires = ? WHERE id = ? AND token = ? AND state = ?",
+                        (now + lease_seconds, lease.id, lease.token, LEASED)
+                    )
+                    if cursor.rowcount == 0:
+                        lost.append(lease)
+        with self._transaction(0) as conn:
+            conn.execute("UPDATE workers SET heartbeat_at = ? WHERE id = ?", (now, worker))
+        return lost
+
+    def complete(self, worker, items):
+        """
+        Grava resultados de forma idempotente.
+
+        Um resultado só é gravado se o arquivo ainda não tiver um; o
+        arrendamento pode até ter vencido e passado a outro worker, cujo
+        resultado posterior será ignorado.
+
+        Args:
+            worker: Identificador do worker
+            items: Pares (Lease, resultado)
+
+        Returns:
+            Número de resultados gravados
+        """
+        now = time.time()
+        stored = 0
+        for shard, shard_items in self._by_shard(items, key=lambda item: item[0]).items():
+            with self._transaction(shard) as conn:
+                for lease, result in shard_items:
+                    cursor = conn.execute(
+                        "UPDATE jobs SET state = ?, worker = ?, token = NULL, finished_at = ?, "
+                        "error = NULL, result = ? WHERE id = ? AND state != ?",
+                        (DONE, worker, now, json.dumps(result, ensure_ascii=False), lease.id, DONE)
+                    )
+                    stored += cursor.rowcount
+        return stored
+
+    def abandon(self, leases):
+        """Devolve à fila arrendamentos não concluídos, sem contar a tentativa"""
+        for shard, shard_leases in self._by_shard(leases).items():
+            with self._transaction(shard) as conn:
+                conn.executemany(
+                    "UPDATE jobs SET state = ?, token = NULL, attempts = attempts - 1 "
+                    "WHERE id = ? AND token = ? AND state = ?",
+                    ((PENDING, lease.id, lease.token, LEASED) for lease in shard_leases)
+                )
+
+    def expire(self, leases):
+        """
+        Vence arrendamentos cuja análise não terminou (processo travado ou morto).
+
+        Os arquivos voltam a ser arrendados e a tentativa conta para
+        max_attempts, de modo que um arquivo que sempre derruba o worker
+        acaba marcado como falho.
+        """
+        for shard, shard_leases in self._by_shard(leases).items():
+            with self._transaction(shard) as conn:
+                conn.executemany(
+                    "UPDATE jobs SET lease_expires = 0 WHERE id = ? AND token = ? AND state = ?",
+                    ((lease.id, lease.token, LEASED) for lease in shard_leases)
+                )
+
+    def retry_failed(self):
+        """
+        Devolve à fila os arquivos marcados como falhos.
+
+        Returns:
+            Número de arquivos devolvidos
+        """
+        count = 0
+        for shard in range(self.shards):
+            with self._transaction(shard) as conn:
+                count += conn.execute(
+                    "UPDATE jobs SET state = ?, attempts = 0, error = NULL WHERE state = ?",
+                    (PENDING, FAILED)
+                ).rowcount
+        return count
+
+    def register(self, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Registra o início de um worker e o prazo dos arrendamentos que ele usa"""
+        host, _, pid = worker.rpartition(':')
+        now = time.time()
+        with self._transaction(0) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workers "
+                "(id, host, pid, started_at, heartbeat_at, lease_seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                (worker, host or worker, int(pid) if pid.isdigit() else 0, now, now, lease_seconds)
+            )
+
+    def unregister(self, worker):
+        """Registra o fim de um worker"""
+        now = time.time()
+        with self._transaction(0) as conn:
+            conn.execute("UPDATE workers SET heartbeat_at = ?, stopped_at = ? WHERE id = ?",
+                         (now, now, worker))
+
+    def counts(self):
+        """Número de arquivos em cada estado, somado entre os shards"""
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            for conn in self._conns:
+                for state, count in conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"):
+                    counts[state] += count
+        return counts
+
+    def stats(self):
+        """
+        Situação da fila e de cada worker.
+
+        Returns:
+            Dicionário com 'jobs' (contagem por estado), 'backlog_lag'
+            (idade em segundos do arquivo pendente mais antigo) e
+            'workers': para cada worker, arquivos concluídos e falhos,
+            vazão (arquivos por segundo desde o início), atraso do último
+            heartbeat, latência média entre enfileirar e concluir e se
+            está ativo (não parou e mandou heartbeat dentro do prazo dos
+            seus arrendamentos)
+        """
+        now = time.time()
+        oldest = None
+        per_worker = {}
+        with self._lock:
+            for conn in self._conns:
+                row = conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE state = ?",
+                                   (PENDING,)).fetchone()
+                if row[0] is not None:
+                    oldest = row[0] if oldest is None else min(oldest, row[0])
+                for worker, state, count, latency in conn.execute(
+                        "SELECT worker, state, COUNT(*), SUM(finished_at - enqueued_at) FROM jobs "
+                        "WHERE state IN (?, ?) AND worker IS NOT NULL GROUP BY worker, state",
+                        (DONE, FAILED)):
+                    entry = per_worker.setdefault(worker, {DONE: 0, FAILED: 0, 'latency': 0.0})
+                    entry[state] += count
+                    if state == DONE:
+                        entry['latency'] += latency or 0.0
+            registered = self._conns[0].execute(
+                "SELECT id, host, pid, started_at, heartbeat_at, lease_seconds, stopped_at FROM workers "
+                "ORDER BY started_at"
+            ).fetchall()
+
+        workers = []
+        for worker, host, pid, started_at, heartbeat_at, lease_seconds, stopped_at in registered:
+            entry = per_worker.get(worker, {DONE: 0, FAILED: 0, 'latency': 0.0})
+            elapsed = max(1e-9, (stopped_at or heartbeat_at) - started_at)
+            workers.append({
+                'id': worker,
+                'host': host,
+                'pid': pid,
+                'active': stopped_at is None and now - heartbeat_at < lease_seconds,
+                'done': entry[DONE],
+                'failed': entry[FAILED],
+                'throughput': entry[DONE] / elapsed,
+                'heartbeat_lag': now - heartbeat_at,
+                'mean_latency': entry['latency'] / entry[DONE] if entry[DONE] else None,
+            })
+        return {
+            'jobs': self.counts(),
+            'backlog_lag': now - oldest if oldest is not None else 0.0,
+            'workers': workers,
+        }
+
+    def iter_results(self):
+        """Gera os resultados gravados, shard a shard"""
+        for shard in range(self.shards):
+            with self._lock:
+                rows = self._conns[shard].execute(
+                    "SELECT result FROM jobs WHERE state = ? ORDER BY id", (DONE,)
+                ).fetchall()
+            for (result,) in rows:
+                yield json.loads(result)
+
+    @staticmethod
+    def _by_shard(items, key=lambda lease: lease):
+        """Agrupa arrendamentos (ou itens que os contêm) por shard"""
+        groups = {}
+        for item in items:
+            groups.setdefault(key(item).shard, []).append(item)
+        return groups
+
+
+class _Heartbeat(threading.Thread):
+    """Renova periodicamente os arrendamentos em andamento de um worker"""
+
+    def __init__(self, queue, worker, lease_seconds):
+        super().__init__(daemon=True, name="heartbeat")
+        self.queue = queue
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self.held = {}
+        self._held_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def hold(self, leases):
+        with self._held_lock:
+            self.held.update((lease.id, lease) for lease in leases)
+
+    def drop(self, leases):
+        with self._held_lock:
+            for lease in leases:
+                self.held.pop(lease.id, None)
+
+    def run(self):
+        # Três renovações por prazo: um heartbeat atrasado não faz perder o arrendamento
+        while not self._stopping.wait(self.lease_seconds / 3):
+            with self._held_lock:
+                leases = list(self.held.values())
+            try:
+                lost = self.queue.heartbeat(self.worker, leases, self.lease_seconds)
+            except sqlite3.Error as e:
+                print(f"Erro no heartbeat: {e}", file=sys.stderr)
+                continue
+            if lost:
+                # O resultado ainda pode ser gravado; só não há mais o que renovar
+                self.drop(lost)
+
+    def stop(self):
+        self._stopping.set()
+        self.join()
+
+
+def work(queue, worker=None, pool_factory=create_pool, lease_size=64, chunksize=16,
+         lease_seconds=DEFAULT_LEASE_SECONDS, follow=False, idle_wait=5.0, processes=None,
+         task_timeout=None):
+    """
+    Esvazia a fila: arrenda arquivos, analisa no pool e grava os resultados.
+
+    Cada grupo enviado ao pool tem um prazo. Um processo que morre (ou
+    trava) no meio de um grupo nunca devolve o resultado: ao fim do
+    prazo, os arrendamentos do grupo deixam de ser renovados e são
+    vencidos na hora, e o pool é recriado.
+
+    Args:
+        queue: WorkQueue
+        worker: Identificador do worker (padrão: máquina e PID)
+        pool_factory: Função sem argumentos que cria o pool de análise
+            (ver batch.create_pool); chamada só se houver o que analisar
+        lease_size: Arquivos arrendados de cada vez
+        chunksize: Arquivos enviados a cada processo do pool por vez
+        lease_seconds: Prazo de cada arrendamento, renovado por heartbeats
+        follow: Se True, continua esperando novos arquivos quando a fila esvazia
+        idle_wait: Espera (segundos) entre tentativas quando não há nada livre
+        processes: Número de processos do pool (padrão: número de CPUs); no
+            máximo esse número de grupos fica em análise ao mesmo tempo, para
+            que o prazo conte a partir do início da análise
+        task_timeout: Prazo (segundos) de cada grupo (padrão: lease_seconds)
+
+    Returns:
+        Dicionário com o número de resultados gravados, de resultados com
+        erros, de resultados descartados (o arquivo já tinha resultado) e
+        de arrendamentos vencidos por estourar o prazo
+    """
+    worker = worker or worker_name()
+    processes = processes or os.cpu_count() or 1
+    task_timeout = task_timeout or lease_seconds
+    summary = {'done': 0, 'failed': 0, 'duplicates': 0, 'expired': 0}
+    queue.register(worker, lease_seconds)
+    heartbeat = _Heartbeat(queue, worker, lease_seconds)
+    heartbeat.start()
+    pool = None
+    try:
+        while True:
+            leases = queue.lease(worker, lease_size, lease_seconds)
+            if not leases:
+                counts = queue.counts()
+                # Arquivos arrendados por outros ainda podem voltar (se o worker morrer)
+                if not follow and not counts[PENDING] and not counts[LEASED]:
+                    break
+                time.sleep(idle_wait)
+                continue
+
+            heartbeat.hold(leases)
+            # Arquivos em nova tentativa vão sozinhos: se um deles derrubar o
+            # processo, os outros arquivos do grupo não perdem tentativas
+            retries = [lease for lease in leases if lease.attempt > 1]
+            chunks = deque(iter_chunks([lease for lease in leases if lease.attempt == 1], chunksize))
+            chunks.extend([lease] for lease in retries)
+            running = []
+            while chunks or running:
+                if pool is None:
+                    pool = pool_factory()
+                while chunks and len(running) < processes:
+                    chunk = chunks.popleft()
+                    task = pool.apply_async(_analyze_chunk, ([lease.path for lease in chunk],))
+                    running.append((task, chunk, time.monotonic() + task_timeout))
+                running[0][0].wait(POLL_SECONDS)
+
+                now = time.monotonic()
+                waiting = []
+                stuck = []
+                for task, chunk, deadline in running:
+                    if task.ready():
+                        try:
+                            results = task.get()
+                        except Exception as e:
+                            print(f"Erro ao analisar um grupo: {e}", file=sys.stderr)
+                            heartbeat.drop(chunk)
+                            queue.expire(chunk)
+                            summary['expired'] += len(chunk)
+                            continue
+                        _store_chunk(queue, worker, heartbeat, chunk, results, summary)
+                    elif now >= deadline:
+                        stuck.extend(chunk)
+                    else:
+                        waiting.append((task, chunk, deadline))
+                running = waiting
+                if stuck:
+                    print(f"Prazo de análise esgotado para {len(stuck)} arquivos; "
+                          "recriando o pool.", file=sys.stderr)
+                    heartbeat.drop(stuck)
+                    queue.expire(stuck)
+                    summary['expired'] += len(stuck)
+                    # Um processo travado ocuparia o pool para sempre; os demais
+                    # grupos em andamento são reenviados ao pool novo
+                    pool.terminate()
+                    pool.join()
+                    pool = None
+                    chunks.extendleft(reversed([chunk for _, chunk, _ in running]))
+                    running = []
+    finally:
+        heartbeat.stop()
+        # Interrompido no meio de um grupo: o que não terminou volta para a fila
+        queue.abandon(list(heartbeat.held.values()))
+        queue.unregister(worker)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return summary
+
+
+def _store_chunk(queue, worker, heartbeat, chunk, results, summary):
+    """Grava os resultados de um grupo e solta os arrendamentos dele"""
+    by_path = {lease.path: lease for lease in chunk}
+    items = []
+    for result in results:
+        result.pop('timings', None)
+        result.pop('cache', None)
+        items.append((by_path[result['path']], result))
+        if result['errors']:
+            summary['failed'] += 1
+    stored = queue.complete(worker, items)
+    summary['done'] += stored
+    summary['duplicates'] += len(items) - stored
+    heartbeat.drop(chunk)
+
+
+def build_parser():
+    """Cria o parser de argumentos da linha de comando"""
+    parser = argparse.ArgumentParser(
+        prog="python -m image_analyzer.workqueue",
+        description="Fila de análise compartilhada por vários workers, sem servidor."
+    )
+    parser.add_argument("queue", help="Diretório da fila (shards SQLite)")
+    parser.add_argument("--network-fs", action="store_true",
+                        help="A fila está em um sistema de arquivos de rede (desativa o WAL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Enfileira as imagens de um diretório")
+    add.add_argument("root", help="Diretório com as imagens")
+    add.add_argument("--shards", type=int, default=None,
+                     help=f"Número de shards de uma fila nova (padrão: {DEFAULT_SHARDS})")
+
+    worker = commands.add_parser("work", help="Analisa arquivos da fila até ela esvaziar")
+    worker.add_argument("-w", "--workers", type=int, default=None,
+                        help="Número de processos (padrão: número de CPUs)")
+    worker.add_argument("--id", default=None, help="Identificador do worker (padrão: máquina:PID)")
+    worker.add_argument("--lease-size", type=int, default=64,
+                        help="Arquivos arrendados de cada vez")
+    worker.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="Prazo de cada arrendamento, renovado por heartbeats")
+    worker.add_argument("--chunksize", type=int, default=16,
+                        help="Arquivos enviados a cada processo por vez")
+    worker.add_argument("--task-timeout", type=float, default=None,
+                        help="Prazo (segundos) para o pool analisar um grupo; depois disso os "
+                             "arrendamentos do grupo vencem (padrão: --lease-seconds)")
+    worker.add_argument("--follow", action="store_true",
+                        help="Continua esperando novos arquivos quando a fila esvazia")
+    worker.add_argument("--caption", action="store_true",
+                        help="Gera legendas com o modelo de IA (carregado em cada processo)")
+    worker.add_argument("--fast-cpu", action="store_true",
+                        help="Modelo de legenda quantizado em int8 (mais rápido em CPU)")
+
+    status = commands.add_parser("status", help="Mostra a fila e a vazão e o atraso de cada worker")
+    status.add_argument("--json", action="store_true", help="Saída em JSON")
+
+    commands.add_parser("retry", help="Devolve à fila os arquivos marcados como falhos")
+
+    export = commands.add_parser("export", help="Grava os resultados em JSON Lines")
+    export.add_argument("-o", "--output", default="-",
+                        help="Arquivo de saída JSON Lines (padrão: saída padrão)")
+    return parser
+
+
+def _print_status(stats):
+    jobs = stats['jobs']
+    print(f"{jobs[PENDING]} pendentes, {jobs[LEASED]} arrendados, {jobs[DONE]} concluídos, "
+          f"{jobs[FAILED]} falhos; pendente mais antigo há {stats['backlog_lag']:.1f} s")
+    for worker in stats['workers']:
+        latency = worker['mean_latency']
+        print(f"  {worker['id']:<32} {'ativo' if worker['active'] else 'parado':<7} "
+              f"{worker['done']:>8} concluídos {worker['failed']:>5} falhos "
+              f"{worker['throughput']:>8.2f} arq/s  heartbeat há {worker['heartbeat_lag']:.1f} s"
+              + (f"  latência média {latency:.1f} s" if latency is not None else ""))
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando"""
+    args = build_parser().parse_args(argv)
+
+    if args.command == "add":
+        if not os.path.isdir(args.root):
+            print(f"Diretório não encontrado: {args.root}", file=sys.stderr)
+            return 2
+        with WorkQueue(args.queue, shards=args.shards, network=args.network_fs) as queue:
+            root = os.path.abspath(args.root)
+            added = sum(queue.add(paths) for paths in iter_chunks(iter_image_files(root), 10000))
+        print(f"{added} arquivos enfileirados.", file=sys.stderr)
+        return 0
+
+    with WorkQueue(args.queue, network=args.network_fs) as queue:
+        if args.command == "status":
+            stats = queue.stats()
+            if args.json:
+                print(json.dumps(stats, indent=2))
+            else:
+                _print_status(stats)
+        elif args.command == "retry":
+            print(f"{queue.retry_failed()} arquivos devolvidos à fila.", file=sys.stderr)
+        elif args.command == "export":
+            output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+            try:
+                for result in queue.iter_results():
+                    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            finally:
+                if output is not sys.stdout:
+                    output.close()
+        else:
+            def pool_factory():
+                return create_pool(args.workers, caption=args.caption,
+                                   caption_options={'fast': args.fast_cpu})
+
+            try:
+                summary = work(queue, args.id, pool_factory, args.lease_size, args.chunksize,
+                               args.lease_seconds, args.follow, processes=args.workers,
+                               task_timeout=args.task_timeout)
+            except KeyboardInterrupt:
+                # Os arrendamentos em andamento já foram devolvidos à fila
+                print("Interrompido.", file=sys.stderr)
+                return 130
+            print(f"{summary['done']} resultados gravados, {summary['failed']} com erros, "
+                  f"{summary['duplicates']} descartados (já concluídos), "
+                  f"{summary['expired']} arrendamentos vencidos por prazo.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,25 @@
 # Importação das bibliotecas necessárias
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext
-from PIL import Image, ImageTk
-from PIL.ExifTags import TAGS
-import os
-from datetime import datetime
-import hashlib
+from PIL import ImageTk
+import time
 import threading
-from transformers import pipeline
-import torch
-
-# Importações opcionais com tratamento de erro
-try:
-    import magic
-except ImportError:
-    print("python-magic não instalado. Algumas funcionalidades podem estar indisponíveis.")
-    magic = None
-
-try:
-    import imagehash
-except ImportError:
-    print("imagehash não instalado. Hash perceptual estará indisponível.")
-    imagehash = None
-
-try:
-    import cv2
-    import numpy as np
-except ImportError:
-    print("OpenCV não instalado. Algumas análises avançadas estarão indisponíveis.")
-    cv2 = None
+import argparse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from image_analyzer import engine, formatting
+from image_analyzer.context import ImageContext
+from image_analyzer.models import CaptionModelLoader
+from image_analyzer.preview import PreviewPyramid
+from image_analyzer.profiling import profile_call
+from image_analyzer.scheduler import Stage, StageRun, StageCancelled
+
+# Tempo (ms) sem novos eventos de redimensionamento antes da renderização final
+RESIZE_SETTLE_MS = 200
+# Threads para as etapas da análise (etapas independentes rodam em paralelo)
+ANALYSIS_WORKERS = 4
+# Intervalo (s) em que a etapa de legenda verifica o cancelamento enquanto espera o modelo
+CANCEL_POLL_SECONDS = 0.2
 
 class ImageAnalyzer:
     """
@@ -36,12 +27,15 @@ class ImageAnalyzer:
     Fornece uma interface gráfica para análise detalhada de imagens,
     incluindo informações básicas, tags avançadas e metadados.
     """
-    def __init__(self, root):
+    def __init__(self, root, load_model=True, profile_output=None, caption_options=None):
         """
         Inicializa a aplicação.
         
         Args:
             root: Janela principal do Tkinter
+            load_model: Se False, o modelo de IA nunca é carregado
+            profile_output: Arquivo onde o cProfile de cada análise é gravado (opcional)
+            caption_options: Opções do modelo de IA (ver models.create_captioner)
         """
         # Configuração da janela principal
         self.root = root
@@ -51,10 +45,21 @@ class ImageAnalyzer:
         # Variáveis de controle
         self.current_image = None
         self.current_image_path = None
+        self.preview = None
+        self.preview_size = None
+        self._resize_job = None
         self.analysis_results = {}
+        self.analysis_context = None
         self.analysis_done = False
+        self.current_run = None
+        self._cancel_event = None
+        self._stages_total = 0
+        self.executor = ThreadPoolExecutor(ANALYSIS_WORKERS, thread_name_prefix="analise")
+        self.load_model = load_model
+        self.profile_output = profile_output
+        self.caption_options = caption_options
         
-        # Inicializar modelo de IA
+        # Inicializar modelo de IA (em segundo plano)
         self.setup_image_analyzer()
         
         # Criar o layout principal
@@ -67,19 +72,27 @@ class ImageAnalyzer:
         self.root.bind('<Configure>', self.on_window_resize)
 
     def setup_image_analyzer(self):
-        """Inicializa o modelo de análise de imagem"""
-        try:
-            print("Carregando modelo de IA... Por favor, aguarde...")
-            self.image_captioner = pipeline(
-                task="image-to-text",
-                model="Salesforce/blip-image-captioning-base",
-                max_new_tokens=50
-            )
-            print("Modelo de IA carregado com sucesso!")
-        except Exception as e:
-            print(f"Erro ao carregar modelo: {e}")
-            if hasattr(self, 'status_label'):
-                self.status_label.config(text="Erro ao carregar modelo de IA")
+        """
+        Inicia o carregamento do modelo de análise de imagem em segundo plano.
+        
+        A janela é exibida imediatamente; apenas a etapa de legenda
+        espera o modelo ficar pronto.
+        """
+        self.image_captioner = CaptionModelLoader(enabled=self.load_model, options=self.caption_options)
+        if self.load_model:
+            self.image_captioner.start().add_done_callback(self._on_model_loaded)
+
+    def _on_model_loaded(self, future):
+        """Callback (na thread de carregamento) ao término do carregamento do modelo"""
+        if future.exception() is not None:
+            self.root.after(0, self._set_status_if_idle, "Erro ao carregar modelo de IA")
+        else:
+            self.root.after(0, self._set_status_if_idle, "Modelo de IA carregado")
+
+    def _set_status_if_idle(self, text):
+        """Atualiza o status apenas se não houver mensagem mais importante exibida"""
+        if not self.status_label.cget('text'):
+            self.status_label.config(text=text)
 
     def setup_styles(self):
         """Configura os estilos visuais dos widgets"""
@@ -128,6 +141,15 @@ class ImageAnalyzer:
         )
         self.analyze_button.pack(side=tk.LEFT, padx=5)
 
+        # Botão para cancelar a análise em andamento
+        self.cancel_button = ttk.Button(
+            self.button_frame,
+            text="Cancelar",
+            command=self.cancel_analysis,
+            state=tk.DISABLED
+        )
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+
         # Status label
         self.status_label = ttk.Label(
             self.button_frame,
@@ -159,18 +181,21 @@ class ImageAnalyzer:
         self.basic_info_frame = ttk.Frame(self.notebook)
         self.advanced_tags_frame = ttk.Frame(self.notebook)
         self.metadata_frame = ttk.Frame(self.notebook)
+        self.performance_frame = ttk.Frame(self.notebook)
 
         # Adicionar abas ao notebook
         self.notebook.add(self.initial_analysis_frame, text="Análise Inicial")
         self.notebook.add(self.basic_info_frame, text="Informações Básicas")
         self.notebook.add(self.advanced_tags_frame, text="Tags Avançadas")
         self.notebook.add(self.metadata_frame, text="Metadados")
+        self.notebook.add(self.performance_frame, text="Desempenho")
 
         # Configurar conteúdo das abas
         self.setup_initial_analysis_tab()
         self.setup_basic_info_tab()
         self.setup_advanced_tags_tab()
         self.setup_metadata_tab()
+        self.setup_performance_tab()
 
     def setup_initial_analysis_tab(self):
         """Configura a aba de análise inicial"""
@@ -216,6 +241,17 @@ class ImageAnalyzer:
         )
         self.metadata_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+    def setup_performance_tab(self):
+        """Configura a aba com os tempos de cada etapa da análise"""
+        self.performance_text = scrolledtext.ScrolledText(
+            self.performance_frame,
+            wrap=tk.NONE,
+            width=50,
+            height=30,
+            font=('Consolas', 10)
+        )
+        self.performance_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
     def select_image(self):
         """Abre diálogo para seleção de imagem e prepara para análise"""
         file_path = filedialog.askopenfilename(
@@ -226,6 +262,8 @@ class ImageAnalyzer:
         )
         
         if file_path:
+            # Uma nova imagem substitui a análise em andamento
+            self.cancel_analysis()
             self.current_image_path = file_path
             self.status_label.config(text="Carregando imagem...")
             self.load_and_display_image()
@@ -234,343 +272,294 @@ class ImageAnalyzer:
             self.status_label.config(text="Imagem carregada. Pronto para análise.")
 
     def load_and_display_image(self):
-        """Carrega e exibe a imagem selecionada no canvas"""
+        """Carrega a imagem selecionada (uma única vez) e a exibe no canvas"""
         try:
             if self.current_image_path:
-                # Carregar imagem com PIL
-                image = Image.open(self.current_image_path)
-                
-                # Obter dimensões do canvas
-                canvas_width = self.canvas.winfo_width()
-                canvas_height = self.canvas.winfo_height()
-                
-                if canvas_width <= 1:
-                    canvas_width = 400
-                if canvas_height <= 1:
-                    canvas_height = 400
-                
-                # Calcular nova dimensão
-                ratio = min(canvas_width/image.width, canvas_height/image.height)
-                new_width = int(image.width * ratio)
-                new_height = int(image.height * ratio)
-                
-                # Redimensionar
-                image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                
-                # Converter para PhotoImage
-                self.current_image = ImageTk.PhotoImage(image)
-                
-                # Limpar canvas e exibir nova imagem
-                self.canvas.delete("all")
-                x = canvas_width/2
-                y = canvas_height/2
-                self.canvas.create_image(
-                    x, y,
-                    image=self.current_image,
-                    anchor='center'
-                )
+                # Decodificar uma única vez, já reduzida, em vários níveis
+                self.preview = PreviewPyramid(self.current_image_path)
+                self.preview_size = None
+                self.display_preview(final=True)
                 
         except Exception as e:
+            self.preview = None
             self.status_label.config(text=f"Erro ao carregar imagem: {str(e)}")
 
+    def display_preview(self, final=True):
+        """
+        Exibe a pré-visualização no tamanho atual do canvas.
+        
+        Args:
+            final: Se False, usa reamostragem rápida (durante o redimensionamento)
+        """
+        if self.preview is None:
+            return
+        
+        # Obter dimensões do canvas
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        
+        if canvas_width <= 1:
+            canvas_width = 400
+        if canvas_height <= 1:
+            canvas_height = 400
+        
+        # Nada a fazer se o tamanho e a qualidade não mudaram
+        size = (canvas_width, canvas_height, final)
+        if size == self.preview_size:
+            return
+        self.preview_size = size
+        
+        image = self.preview.render(canvas_width, canvas_height, final=final)
+        
+        # Converter para PhotoImage
+        self.current_image = ImageTk.PhotoImage(image)
+        
+        # Limpar canvas e exibir nova imagem
+        self.canvas.delete("all")
+        x = canvas_width/2
+        y = canvas_height/2
+        self.canvas.create_image(
+            x, y,
+            image=self.current_image,
+            anchor='center'
+        )
+
     def perform_analysis(self):
-        """Executa todas as análises quando o botão de análise é clicado"""
-        if self.current_image_path and not self.analysis_done:
+        """
+        Inicia todas as análises quando o botão de análise é clicado.
+
+        As etapas rodam como um grafo de dependências no pool de threads
+        (ver image_analyzer.scheduler); cada aba é preenchida assim que a
+        sua etapa termina, e só a legenda espera o modelo de IA.
+        """
+        if self.current_image_path and not self.analysis_done and self.current_run is None:
             self.status_label.config(text="Realizando análise...")
-            self.select_button.config(state=tk.DISABLED)
             self.analyze_button.config(state=tk.DISABLED)
-            
-            # Criar thread para análise
-            analysis_thread = threading.Thread(target=self._run_analysis)
-            analysis_thread.daemon = True
-            analysis_thread.start()
-
-    def _run_analysis(self):
-        """Executa análises em thread separada"""
+            self.cancel_button.config(state=tk.NORMAL)
+
+            # Contexto compartilhado: o arquivo é lido e decodificado uma única vez
+            ctx = ImageContext(self.current_image_path)
+            cancelled = threading.Event()
+            self.analysis_context = ctx
+            self.analysis_results = {}
+            self._cancel_event = cancelled
+            for text_widget in self._stage_views_widgets():
+                self._set_text(text_widget, "Analisando...")
+
+            started = (time.perf_counter(), time.process_time())
+            run = StageRun(
+                self._analysis_stages(ctx, cancelled),
+                # Com --profile, as etapas rodam em sequência em uma única thread (perfilada)
+                executor=None if self.profile_output else self.executor,
+                on_result=lambda name, result, error: self.root.after(
+                    0, self._stage_done, run, name, result, error),
+                on_finish=lambda run: self.root.after(0, self._run_finished, run, ctx, started),
+            )
+            self._stages_total = len(run.stages)
+            self.current_run = run
+
+            if self.profile_output:
+                analysis_thread = threading.Thread(target=self._run_profiled, args=(run,))
+                analysis_thread.daemon = True
+                analysis_thread.start()
+            else:
+                run.start()
+
+    def _run_profiled(self, run):
+        """Executa as etapas em sequência sob o cProfile (thread separada)"""
         try:
-            self.analyze_initial()
-            self.analyze_image()
-            self.analysis_done = True
-            self.root.after(0, self._analysis_complete)
+            profile_call(run.start, output=self.profile_output)
         except Exception as e:
             self.root.after(0, self._analysis_error, str(e))
 
+    def _analysis_stages(self, ctx, cancelled):
+        """
+        Grafo de etapas da análise.
+
+        As etapas que só leem o cabeçalho vêm primeiro; a legenda depende
+        da análise inicial, que prepara a redução da imagem usada por ela.
+        """
+        captioning = self.load_model
+        stages = [
+            Stage('basic_info', lambda: self._measured(ctx, 'basic_info', engine.analyze_basic_info)),
+            Stage('advanced_tags', lambda: self._measured(ctx, 'advanced_tags',
+                                                          engine.analyze_advanced_tags)),
+            Stage('initial', lambda: self._measured(
+                ctx, 'initial', engine.analyze_initial,
+                # A legenda sai da etapa 'caption'; sem ela, nada é reduzido para o modelo
+                captioner=None,
+                defer_caption=captioning)),
+            Stage('metadata', lambda: self._measured(ctx, 'metadata', engine.analyze_metadata)),
+        ]
+        if captioning:
+            stages.append(Stage('caption', lambda: self._caption(ctx, cancelled),
+                                requires=('initial',)))
+        return stages
+
+    @staticmethod
+    def _measured(ctx, name, func, **kwargs):
+        """Executa uma função do motor sobre o contexto, medindo-a como a etapa name"""
+        with ctx.timings.measure(name):
+            return func(ctx, **kwargs)
+
+    def _caption(self, ctx, cancelled):
+        """
+        Etapa de legenda.
+
+        Enquanto o modelo carrega, a espera é interrompida se a análise for
+        cancelada, para não prender uma thread do pool.
+        """
+        while True:
+            if cancelled.is_set():
+                raise StageCancelled()
+            try:
+                self.image_captioner.get(timeout=CANCEL_POLL_SECONDS)
+                break
+            except FutureTimeoutError:
+                continue
+        return engine.analyze_image_content(ctx, self.image_captioner)
+
+    def _stage_views(self):
+        """Aba, formatação e prefixo da mensagem de erro de cada etapa"""
+        return {
+            'initial': (self.initial_analysis_text, formatting.format_initial,
+                        "Erro na análise inicial"),
+            'basic_info': (self.basic_info_text, formatting.format_basic_info,
+                           "Erro na análise"),
+            'advanced_tags': (self.advanced_tags_text, formatting.format_advanced_tags,
+                              "Erro na análise de tags"),
+            'metadata': (self.metadata_text, formatting.format_metadata,
+                         "Erro na análise de metadados"),
+        }
+
+    def _stage_views_widgets(self):
+        return [view[0] for view in self._stage_views().values()] + [self.performance_text]
+
+    def _stage_done(self, run, name, result, error):
+        """Exibe o resultado de uma etapa (na thread da interface)"""
+        # Resultado de uma análise cancelada ou substituída
+        if run is not self.current_run or run.cancelled:
+            return
+
+        if name == 'caption':
+            initial = self.analysis_results.get('initial')
+            if initial is not None:
+                initial['caption'] = result
+                initial['caption_error'] = None if error is None else str(error)
+                self._set_text(self.initial_analysis_text, formatting.format_initial(initial))
+        else:
+            text_widget, formatter, error_prefix = self._stage_views()[name]
+            if error is None:
+                self.analysis_results[name] = result
+                self._set_text(text_widget, formatter(result))
+            else:
+                self._set_text(text_widget, f"{error_prefix}: {str(error)}")
+
+        finished = len(run.results) + len(run.errors)
+        self.status_label.config(
+            text=f"Realizando análise... ({finished}/{self._stages_total} etapas)")
+
+    def _run_finished(self, run, ctx, started):
+        """Encerra uma execução (concluída ou cancelada) na thread da interface"""
+        wall = time.perf_counter() - started[0]
+        cpu = time.process_time() - started[1]
+        ctx.release()
+        if run is not self.current_run or run.cancelled:
+            return
+        ctx.timings.record('total', wall, cpu)
+        self.current_run = None
+        self.show_timings()
+        self.analysis_done = True
+        self._analysis_complete()
+
+    def cancel_analysis(self, status="Análise cancelada"):
+        """Cancela a análise em andamento; os resultados já exibidos permanecem"""
+        run = self.current_run
+        if run is None:
+            return
+        self.current_run = None
+        self._cancel_event.set()
+        run.cancel()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.analyze_button.config(state=tk.NORMAL if self.current_image_path else tk.DISABLED)
+        self.status_label.config(text=status)
+
+    def shutdown(self):
+        """Cancela a análise em andamento e encerra o pool de threads"""
+        self.cancel_analysis()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def show_timings(self):
+        """Exibe na aba de desempenho os tempos das etapas da última análise"""
+        timings = self.analysis_context.timings.as_dict()
+        self.analysis_results['timings'] = timings
+        model_load = getattr(self.image_captioner, 'load_seconds', None)
+        self._set_text(self.performance_text, formatting.format_timings(timings, model_load))
+
     def _analysis_complete(self):
         """Callback para conclusão da análise"""
-        self.select_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
         self.analyze_button.config(state=tk.NORMAL)
         self.status_label.config(text="Análise concluída")
 
     def _analysis_error(self, error_msg):
         """Callback para erro na análise"""
-        self.select_button.config(state=tk.NORMAL)
+        self.current_run = None
+        self.cancel_button.config(state=tk.DISABLED)
         self.analyze_button.config(state=tk.NORMAL)
         self.status_label.config(text=f"Erro na análise: {error_msg}")
 
-    def analyze_image_content(self, image_path):
-        """Analisa o conteúdo da imagem usando IA"""
-        try:
-            image = Image.open(image_path)
-            result = self.image_captioner(image)
-            return result[0]['generated_text']
-        except Exception as e:
-            return f"Erro na análise de conteúdo: {str(e)}"
-
     def on_window_resize(self, event=None):
-        """Manipula evento de redimensionamento da janela"""
-        if hasattr(self, 'current_image_path'):
-            self.load_and_display_image()
-
-    def calculate_hashes(self, image_path):
-        """Calcula diferentes tipos de hashes da imagem"""
-        hashes = {'md5': None, 'perceptual_hash': None}
+        """
+        Manipula evento de redimensionamento da janela.
         
-        # MD5 hash
-        try:
-            md5_hash = hashlib.md5()
-            with open(image_path, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b''):
-                    md5_hash.update(chunk)
-            hashes['md5'] = md5_hash.hexdigest()
-        except Exception as e:
-            print(f"Erro ao calcular MD5: {e}")
-
-        # Hash perceptual
-        if imagehash:
-            try:
-                img = Image.open(image_path)
-                hashes['perceptual_hash'] = str(imagehash.average_hash(img))
-            except Exception as e:
-                print(f"Erro ao calcular hash perceptual: {e}")
+        Enquanto os eventos chegam, exibe uma pré-visualização rápida a
+        partir da pirâmide em memória; a renderização em alta qualidade
+        só acontece depois de RESIZE_SETTLE_MS sem novos eventos.
+        """
+        # <Configure> chega para todos os widgets; só o canvas interessa
+        if event is not None and event.widget is not self.canvas:
+            return
+        if self.preview is None:
+            return
         
-        return hashes
-
-    def get_image_description(self, image_path):
-        """Gera uma descrição detalhada da imagem"""
-        try:
-            img = Image.open(image_path)
-            mime_type = "Não disponível"
-            
-            if magic:
-                mime = magic.Magic(mime=True)
-                mime_type = mime.from_file(image_path)
-            
-            description = []
-            description.append(f"Tipo de arquivo: {mime_type}")
-            description.append(f"Formato: {img.format}")
-            description.append(f"Modo de cor: {img.mode}")
-            description.append(f"Dimensões: {img.size[0]}x{img.size[1]} pixels")
-            
-            # Calcular proporção
-            ratio = img.size[0] / img.size[1]
-            description.append(f"Proporção: {ratio:.2f}")
-            
-            # Verificar orientação
-            if img.size[0] > img.size[1]:
-                orientation = "Paisagem"
-            elif img.size[0] < img.size[1]:
-                orientation = "Retrato"
-            else:
-                orientation = "Quadrada"
-            description.append(f"Orientação: {orientation}")
-            
-            return "\n".join(description)
-        except Exception as e:
-            return f"Erro ao gerar descrição: {str(e)}"
-
-    def analyze_initial(self):
-        """Realiza a análise inicial da imagem"""
-        try:
-            # Limpar texto anterior
-            self.root.after(0, self.initial_analysis_text.delete, 1.0, tk.END)
-            
-            # Preparar informações
-            info = []
-            info.append("=== ANÁLISE INICIAL ===\n")
-            
-            # Data e hora da análise
-            current_time = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            info.append(f"Data/Hora da análise: {current_time}\n")
-            
-            # Nome do arquivo
-            filename = os.path.basename(self.current_image_path)
-            info.append(f"Nome do arquivo: {filename}\n")
-            
-            # Análise de conteúdo com IA
-            info.append("CONTEÚDO DA IMAGEM:")
-            content_description = self.analyze_image_content(self.current_image_path)
-            info.append(f"{content_description}\n")
-            
-            # Descrição da imagem
-            info.append("CARACTERÍSTICAS DA IMAGEM:")
-            description = self.get_image_description(self.current_image_path)
-            info.append(f"{description}\n")
-            
-            # Hashes
-            info.append("HASHES:")
-            hashes = self.calculate_hashes(self.current_image_path)
-            info.append(f"MD5: {hashes['md5']}")
-            info.append(f"Hash Perceptual: {hashes['perceptual_hash']}\n")
-            
-            # Informações do sistema de arquivos
-            stats = os.stat(self.current_image_path)
-            info.append("INFORMAÇÕES DO ARQUIVO:")
-            info.append(f"Tamanho: {stats.st_size/1024:.2f} KB")
-            info.append(f"Criado em: {datetime.fromtimestamp(stats.st_ctime)}")
-            info.append(f"Modificado em: {datetime.fromtimestamp(stats.st_mtime)}")
-            info.append(f"Último acesso: {datetime.fromtimestamp(stats.st_atime)}")
-            
-            # Atualizar interface
-            final_text = "\n".join(info)
-            self.root.after(0, self.initial_analysis_text.insert, tk.END, final_text)
-            
-        except Exception as e:
-            self.root.after(0, self.initial_analysis_text.insert, tk.END, 
-                          f"Erro na análise inicial: {str(e)}")
-
-    def analyze_image(self):
-        """Realiza todas as análises complementares da imagem"""
-        if self.current_image_path:
-            self.analyze_basic_info()
-            self.analyze_advanced_tags()
-            self.analyze_metadata()
-
-    def analyze_basic_info(self):
-        """Analisa e exibe informações básicas da imagem"""
-        try:
-            image = Image.open(self.current_image_path)
-            
-            info = []
-            info.append("=== INFORMAÇÕES BÁSICAS ===\n")
-            info.append(f"Nome do arquivo: {os.path.basename(self.current_image_path)}")
-            info.append(f"Dimensões: {image.size}")
-            info.append(f"Formato: {image.format}")
-            info.append(f"Modo: {image.mode}")
-            info.append(f"Tamanho do arquivo: {os.path.getsize(self.current_image_path)/1024:.2f} KB")
-            
-            # Informações específicas do formato
-            if image.format == 'JPEG':
-                info.append("\nInformações específicas JPEG:")
-                info.append(f"Subsampling: {image.info.get('subsampling', 'N/A')}")
-                info.append(f"Qualidade: {image.info.get('quality', 'N/A')}")
-            
-            elif image.format == 'PNG':
-                info.append("\nInformações específicas PNG:")
-                info.append(f"Compressão: {image.info.get('compression', 'N/A')}")
-                info.append(f"Transparência: {'Sim' if 'transparency' in image.info else 'Não'}")
-            
-            # Atualizar texto
-            final_text = "\n".join(info)
-            self.root.after(0, self.basic_info_text.delete, 1.0, tk.END)
-            self.root.after(0, self.basic_info_text.insert, tk.END, final_text)
-            
-        except Exception as e:
-            self.root.after(0, self.basic_info_text.delete, 1.0, tk.END)
-            self.root.after(0, self.basic_info_text.insert, tk.END, 
-                          f"Erro na análise: {str(e)}")
+        self.display_preview(final=False)
+        if self._resize_job is not None:
+            self.root.after_cancel(self._resize_job)
+        self._resize_job = self.root.after(RESIZE_SETTLE_MS, self._finish_resize)
 
-    def analyze_advanced_tags(self):
-        """Analisa e exibe tags avançadas (EXIF) da imagem"""
-        try:
-            image = Image.open(self.current_image_path)
-            
-            info = []
-            info.append("=== TAGS AVANÇADAS ===\n")
-            
-            # Tentar obter dados EXIF
-            if hasattr(image, '_getexif'):
-                exif = image._getexif()
-                if exif:
-                    for tag_id in exif:
-                        tag = TAGS.get(tag_id, tag_id)
-                        data = exif.get(tag_id)
-                        # Formatar dados especiais
-                        if isinstance(data, bytes):
-                            data = data.hex()
-                        info.append(f"{tag}: {data}")
-                else:
-                    info.append("Nenhuma tag EXIF encontrada.")
-            else:
-                info.append("Imagem não contém dados EXIF.")
-            
-            # Atualizar texto
-            final_text = "\n".join(info)
-            self.root.after(0, self.advanced_tags_text.delete, 1.0, tk.END)
-            self.root.after(0, self.advanced_tags_text.insert, tk.END, final_text)
-            
-        except Exception as e:
-            self.root.after(0, self.advanced_tags_text.delete, 1.0, tk.END)
-            self.root.after(0, self.advanced_tags_text.insert, tk.END, 
-                          f"Erro na análise de tags: {str(e)}")
+    def _finish_resize(self):
+        """Renderização final, depois que o redimensionamento se estabiliza"""
+        self._resize_job = None
+        self.display_preview(final=True)
 
-    def analyze_metadata(self):
-        """Analisa e exibe metadados detalhados da imagem"""
-        try:
-            image = Image.open(self.current_image_path)
-            
-            info = []
-            info.append("=== METADADOS DETALHADOS ===\n")
-            
-            # Informações do sistema de arquivos
-            stats = os.stat(self.current_image_path)
-            info.append("INFORMAÇÕES DO SISTEMA DE ARQUIVOS:")
-            info.append(f"Tamanho: {stats.st_size/1024:.2f} KB")
-            info.append(f"Data de criação: {datetime.fromtimestamp(stats.st_ctime)}")
-            info.append(f"Última modificação: {datetime.fromtimestamp(stats.st_mtime)}")
-            info.append(f"Último acesso: {datetime.fromtimestamp(stats.st_atime)}")
-            info.append("")
-            
-            # Informações da imagem
-            info.append("INFORMAÇÕES DA IMAGEM:")
-            info.append(f"Formato: {image.format_description if hasattr(image, 'format_description') else image.format}")
-            info.append(f"Modo de cor: {image.mode}")
-            info.append(f"Paleta: {'Sim' if image.palette else 'Não'}")
-            info.append(f"Dimensões: {image.size}")
-            info.append("")
-            
-            # Informações específicas do formato
-            info.append("INFORMAÇÕES ESPECÍFICAS DO FORMATO:")
-            for key, value in image.info.items():
-                if isinstance(value, bytes):
-                    value = value.hex()
-                info.append(f"{key}: {value}")
-            
-            # Informações OpenCV (se disponível)
-            if cv2 is not None:
-                try:
-                    cv_image = cv2.imread(self.current_image_path)
-                    if cv_image is not None:
-                        info.append("\nINFORMAÇÕES OPENCV:")
-                        info.append(f"Canais: {cv_image.shape[2] if len(cv_image.shape) > 2 else 1}")
-                        info.append(f"Profundidade: {cv_image.dtype}")
-                        info.append(f"Dimensões (altura x largura): {cv_image.shape[:2]}")
-                        
-                        # Análise de cores
-                        if len(cv_image.shape) > 2:
-                            means = cv2.mean(cv_image)
-                            info.append("\nMédia de cores (BGR):")
-                            info.append(f"Azul: {means[0]:.2f}")
-                            info.append(f"Verde: {means[1]:.2f}")
-                            info.append(f"Vermelho: {means[2]:.2f}")
-                except Exception as cv_err:
-                    info.append(f"\nErro ao obter informações OpenCV: {str(cv_err)}")
-            
-            # Atualizar texto
-            final_text = "\n".join(info)
-            self.root.after(0, self.metadata_text.delete, 1.0, tk.END)
-            self.root.after(0, self.metadata_text.insert, tk.END, final_text)
-            
-        except Exception as e:
-            self.root.after(0, self.metadata_text.delete, 1.0, tk.END)
-            self.root.after(0, self.metadata_text.insert, tk.END, 
-                          f"Erro na análise de metadados: {str(e)}")
+    def _set_text(self, text_widget, text):
+        """Substitui o conteúdo de uma aba (na thread da interface)"""
+        text_widget.delete(1.0, tk.END)
+        text_widget.insert(tk.END, text)
 
 def main():
     """Função principal que inicia a aplicação"""
+    parser = argparse.ArgumentParser(description="Analisador de Imagens")
+    parser.add_argument("--no-caption", action="store_true",
+                        help="Não carrega o modelo de IA (sem legendas)")
+    parser.add_argument("--fast-cpu", action="store_true",
+                        help="Modelo de IA quantizado em int8 (mais rápido em CPU)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Threads do PyTorch para a inferência")
+    parser.add_argument("--profile", metavar="ARQUIVO",
+                        help="Grava o cProfile de cada análise no arquivo (formato pstats)")
+    args = parser.parse_args()
     try:
         root = tk.Tk()
-        app = ImageAnalyzer(root)
+        app = ImageAnalyzer(
+            root,
+            load_model=not args.no_caption,
+            profile_output=args.profile,
+            caption_options={'fast': args.fast_cpu, 'threads': args.threads}
+        )
         root.mainloop()
+        app.shutdown()
     except Exception as e:
         print(f"Erro crítico: {str(e)}")
         input("Pressione Enter para sair...")
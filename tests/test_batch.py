@@ -0,0 +1,40 @@
+"""
+Modo em lote com cache de resultados.
+"""
+import json
+
+import pytest
+from PIL import Image
+
+from image_analyzer import batch
+
+
+@pytest.fixture
+def images(tmp_path):
+    root = tmp_path / "images"
+    root.mkdir()
+    Image.new('RGB', (64, 48), (200, 10, 10)).save(root / "a.png")
+    Image.new('RGB', (64, 48), (0, 10, 10)).save(root / "b.jpg")
+    return root
+
+
+def run(root, output, *args):
+    assert batch.main([str(root), "-w", "1", "-o", str(output), *args]) == 0
+    with open(output, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_wider_digest_set_is_not_served_from_cache(images, tmp_path):
+    cache = str(tmp_path / "cache.db")
+    run(images, tmp_path / "first.jsonl", "--cache", cache, "--digests", "md5")
+
+    results = run(images, tmp_path / "second.jsonl", "--cache", cache, "--digests", "md5,sha256")
+    assert len(results) == 2
+    for result in results:
+        assert result.get('cache') is None
+        assert result['initial']['hashes']['sha256']
+
+    results = run(images, tmp_path / "third.jsonl", "--cache", cache, "--digests", "md5,sha256")
+    assert [result.get('cache') for result in results] == ['path', 'path']
+    for result in results:
+        assert result['initial']['hashes']['sha256']
@@ -0,0 +1,56 @@
+"""
+Armazenamento colunar: uma linha válida por caminho.
+"""
+import pytest
+from PIL import Image
+
+from image_analyzer import batch
+from image_analyzer.columnar import ColumnStore
+
+
+@pytest.fixture
+def images(tmp_path):
+    root = tmp_path / "images"
+    root.mkdir()
+    for index in range(3):
+        Image.new('RGB', (64 + index, 48), (index * 80, 10, 10)).save(root / f"{index}.png")
+    return root
+
+
+def run(root, tmp_path, *args):
+    output = str(tmp_path / "out.jsonl")
+    assert batch.main([str(root), "-w", "1", "-o", output, *args]) == 0
+
+
+def paths(store):
+    return sorted(store.select(columns=('path',))['path'])
+
+
+def test_rerun_with_cache_does_not_duplicate_rows(images, tmp_path):
+    store_path = str(tmp_path / "store")
+    cache = str(tmp_path / "cache.db")
+    run(images, tmp_path, "--store", store_path, "--cache", cache)
+    run(images, tmp_path, "--store", store_path, "--cache", cache)
+
+    store = ColumnStore(store_path)
+    assert len(store) == 3
+    assert store.rows == 3
+    assert len(paths(store)) == 3
+
+
+def test_rerun_without_cache_keeps_last_row(images, tmp_path):
+    store_path = str(tmp_path / "store")
+    run(images, tmp_path, "--store", store_path)
+    Image.new('RGB', (300, 200)).save(images / "0.png")
+    run(images, tmp_path, "--store", store_path)
+
+    store = ColumnStore(store_path)
+    assert len(store) == 3
+    assert store.count() == 3
+    assert paths(store) == sorted(str(path) for path in images.iterdir())
+    widths = store.select(lambda cols: cols['width'] == 300, columns=('path', 'width'))
+    assert list(widths['path']) == [str(images / "0.png")]
+
+    store.compact()
+    assert store.rows == 3
+    assert paths(ColumnStore(store_path)) == paths(store)
@@ -0,0 +1,70 @@
+"""
+Análise quadro a quadro de arquivos grandes com várias páginas.
+"""
+import tracemalloc
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_analyzer import frames
+from image_analyzer.context import ImageContext
+
+MEMORY_LIMIT = 4 * 1024 * 1024
+LARGE_THRESHOLD = 500_000
+
+
+@pytest.fixture
+def pages_tiff(tmp_path):
+    """TIFF sem compressão com três páginas de 4,5 MB cada"""
+    rng = np.random.default_rng(0)
+    pages = [Image.fromarray(rng.integers(0, 256, (1000, 1500, 3), dtype=np.uint8))
+             for _ in range(3)]
+    path = tmp_path / "pages.tif"
+    pages[0].save(path, save_all=True, append_images=pages[1:])
+    return str(path), pages
+
+
+def test_large_pages_stay_under_memory_limit(pages_tiff):
+    path, pages = pages_tiff
+    # Módulos importados na primeira análise não entram na medição
+    frames.analyze_frame(pages[0].resize((64, 64)))
+    ctx = ImageContext(path, memory_limit=MEMORY_LIMIT, large_threshold=LARGE_THRESHOLD)
+    try:
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            result = frames.analyze_frames(ctx)
+            peak = tracemalloc.get_traced_memory()[1] - start
+        finally:
+            tracemalloc.stop()
+    finally:
+        ctx.release()
+
+    assert result['summary']['analyzed'] == 3
+    assert peak < MEMORY_LIMIT
+
+
+def test_large_pages_match_full_decode(pages_tiff):
+    path, pages = pages_tiff
+    ctx = ImageContext(path, memory_limit=MEMORY_LIMIT, large_threshold=LARGE_THRESHOLD)
+    try:
+        result = frames.analyze_frames(ctx)
+    finally:
+        ctx.release()
+
+    for summary, page in zip(result['frames'], pages):
+        expected, _ = frames.analyze_frame(page)
+        assert summary['size'] == expected['size']
+        assert summary['luminance_mean'] == pytest.approx(expected['luminance_mean'])
+        assert summary['sharpness'] == pytest.approx(expected['sharpness'])
+        assert summary['mean_rgb'] == pytest.approx(expected['mean_rgb'])
+
+
+def test_decode_cost_covers_one_frame(pages_tiff):
+    path, _ = pages_tiff
+    ctx = ImageContext(path, memory_limit=MEMORY_LIMIT, large_threshold=LARGE_THRESHOLD)
+    try:
+        assert ctx.decode_cost == 2 * MEMORY_LIMIT
+    finally:
+        ctx.release()